@@ -0,0 +1,82 @@
+"""
+The adaptive concurrency limit against a local stand-in IRWS that serves
+CAPACITY requests at a time and whose latency steps up and back down
+while worker threads keep it busy, next to the static MAX_POOL_SIZE
+limit.  Latencies are as the callers see them, queueing included; in
+flight is the mean number of connections checked out to the stand-in.
+
+    python benchmarks/adaptive_concurrency.py [threads] [seconds per phase]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resttools.irws import IRWS  # noqa: E402
+from resttools.dao_implementation import adaptive, live  # noqa: E402
+from resttools.test.server import StandInServer  # noqa: E402
+import resttools.test.test_settings as settings  # noqa: E402
+
+PHASES = (('fast', 0.005), ('degraded', 0.05), ('recovered', 0.005))
+CAPACITY = 8
+
+
+def run(label, conf, server, threads, seconds):
+    irws = IRWS(conf)
+    dao = irws.dao._getDAO()
+    stop = threading.Event()
+    latencies = []
+    errors = [0]
+
+    def worker():
+        while not stop.is_set():
+            started = time.time()
+            try:
+                irws.get_person(netid='wdspud867')
+                latencies.append(time.time() - started)
+            except Exception:
+                errors[0] += 1
+
+    workers = [threading.Thread(target=worker) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for phase, delay in PHASES:
+        server.delay = delay
+        del latencies[:]
+        errors[0] = 0
+        limits = []
+        in_flight = []
+        ends = time.time() + seconds
+        while time.time() < ends:
+            limits.append(dao.concurrency_limit())
+            in_flight.append(sum(p.pool.maxsize - p.pool.qsize() for p in live.get_pools().values()))
+            time.sleep(0.05)
+        done = sorted(latencies)
+        p50 = done[len(done) // 2] if done else 0
+        p99 = done[int(len(done) * 0.99)] if done else 0
+        limit = '-' if limits[0] is None else '%d..%d' % (min(limits), max(limits))
+        print('%-9s %-10s %7.0f req/s  p50 %6.1f ms  p99 %6.1f ms  errors %4d  in flight %5.1f  limit %s' %
+              (label, phase, len(done) / seconds, p50 * 1e3, p99 * 1e3, errors[0],
+               sum(in_flight) / float(len(in_flight)), limit))
+    stop.set()
+    for t in workers:
+        t.join()
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    with StandInServer('irws', settings.IRWS_CONF, capacity=CAPACITY) as server:
+        base = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=threads,
+                    SINGLE_FLIGHT=False, RETRIES=0)
+        run('static', base, server, threads, seconds)
+        live.clear_pools()
+        run('adaptive', dict(base, ADAPTIVE_CONCURRENCY={'MIN_LIMIT': 2}), server, threads, seconds)
+        live.clear_pools()
+        adaptive.clear_concurrency_limiters()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Per-call overhead of the DAO layer, with the transport DAO rebuilt on
+every call (the old _getDAO behaviour) and resolved once per service.
+
+    python benchmarks/dao_overhead.py [calls]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resttools.dao import IRWS_DAO  # noqa: E402
+from resttools.dao_implementation.irws import Live  # noqa: E402
+from resttools.mock.mock_http import MockHTTP  # noqa: E402
+
+CONF = {
+    'HOST': 'https://mango-dev.u.washington.edu:646',
+    'SERVICE_NAME': 'registry-dev',
+    'MAX_POOL_SIZE': 5,
+    'VERIFY_HOST': False,
+    'RUN_MODE': 'Live',
+}
+RESPONSE = MockHTTP()
+
+
+class NullLive(Live):
+    """Live DAO construction, without the network."""
+    def getURL(self, url, headers):
+        return RESPONSE
+
+
+class PerCallDAO(IRWS_DAO):
+    """The old behaviour: a new transport DAO for every request."""
+    def _getDAO(self):
+        if self._run_mode == 'Live':
+            return NullLive(self._conf)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    headers = {'Accept': 'application/json'}
+    for label, dao in (('per call', PerCallDAO(CONF)),
+                       ('resolved once', IRWS_DAO(CONF, dao_factory=NullLive))):
+        secs = min(timeit.repeat(lambda: dao.getURL('/registry-dev/v2/person', headers),
+                                 number=calls, repeat=3))
+        print('%-14s %7.0f ns/call' % (label, secs / calls * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Decoding time of GWS membership documents of 10, 10k and 500k members,
+and of a group document, in the v2 (XML) and v3 (JSON) encodings.
+
+    python benchmarks/gws_backends.py [sizes...]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resttools.gws_backend import JSONBackend, XMLBackend  # noqa: E402
+from gws_decode import members_document  # noqa: E402
+
+MOCK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resttools', 'mock', 'gws', 'group_sws')
+
+
+def members_json(size):
+    return json.dumps({'data': [{'type': 'uwnetid', 'id': 'user%d' % i} for i in range(size)]}).encode('utf-8')
+
+
+def timed(func, data):
+    number = max(1, int(2e5 // len(data)))
+    return min(timeit.repeat(lambda: func(data), number=number, repeat=3)) / number
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 10000, 500000]
+    xml, js = XMLBackend(), JSONBackend()
+    group = 'group/u_fox_unittest.resource'
+    cases = [('group', xml.decode_group, open(os.path.join(MOCK, 'v2', group), 'rb').read(),
+              js.decode_group, open(os.path.join(MOCK, 'v3', group), 'rb').read())]
+    cases += [('%d members' % size, xml.decode_members, members_document(size),
+               js.decode_members, members_json(size)) for size in sizes]
+    for label, v2, v2_data, v3, v3_data in cases:
+        v2_secs, v3_secs = timed(v2, v2_data), timed(v3, v3_data)
+        print('%-16s v2 xml %10.1f us %9d bytes   v3 json %10.1f us %9d bytes   %.2fx' %
+              (label, v2_secs * 1e6, len(v2_data), v3_secs * 1e6, len(v3_data), v2_secs / v3_secs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+GWS XML decoding throughput over synthetic membership documents of 10,
+10k and 500k members, and of a group document, with the old decoders (a
+find() per field, a default parser per document) and the current ones.
+
+    python benchmarks/gws_decode.py [sizes...]
+"""
+import os
+import sys
+import timeit
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resttools.gws_backend import XMLBackend  # noqa: E402
+from resttools.models.gws import Group, GroupMember, GroupUser  # noqa: E402
+
+GROUP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resttools', 'mock', 'gws',
+                     'group_sws', 'v2', 'group', 'u_fox_unittest.resource')
+
+
+def members_document(size):
+    return ('<gws class="gws" version="2">\n<group class="group">\n'
+            ' <regid class="regid">0123456789abcdef0123456789abcdef</regid>\n'
+            ' <name class="name">u_bench_%d</name>\n <members class="members">\n%s </members>\n'
+            '</group>\n</gws>\n' %
+            (size, ''.join('  <member class="member" type="uwnetid" name="user%d">user%d</member>\n' % (i, i)
+                           for i in range(size)))).encode('utf-8')
+
+
+def old_members_from_xml(data):
+    e_mbrs = etree.fromstring(data).find('group').find('members')
+    members = []
+    for member in e_mbrs.findall('member'):
+        members.append(GroupMember(name=member.text, member_type=member.get("type")))
+    return members
+
+
+def old_group_from_xml(data):
+    gr = etree.fromstring(data).find('group')
+    group = Group()
+    group.name = gr.find('name').text
+    for field in ('regid', 'title', 'description', 'contact', 'authnfactor', 'classification',
+                  'emailenabled', 'dependson', 'publishemail'):
+        setattr(group, 'uwregid' if field == 'regid' else field, gr.find(field).text)
+    try:
+        group.reporttoorig = gr.find('reporttoorig').text
+    except AttributeError:
+        group.reporttoorig = gr.find('reporttoowner').text
+    for users in ('admins', 'updaters', 'creators', 'readers', 'optins', 'optouts'):
+        for user in gr.find(users).findall(users[:-1]):
+            getattr(group, users).append(GroupUser(name=user.text, user_type=user.get('type')))
+    return group
+
+
+def rate(func, data):
+    number = max(1, int(2e5 // len(data)))
+    secs = min(timeit.repeat(lambda: func(data), number=number, repeat=3)) / number
+    return secs, len(data) / secs / 1e6
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 10000, 500000]
+    backend = XMLBackend()
+    cases = [('group', open(GROUP, 'rb').read(), old_group_from_xml, backend.decode_group)]
+    cases += [('%d members' % size, members_document(size), old_members_from_xml, backend.decode_members)
+              for size in sizes]
+    for label, data, old, new in cases:
+        before, before_mb = rate(old, data)
+        after, after_mb = rate(new, data)
+        print('%-16s before %10.1f us %6.1f MB/s   after %10.1f us %6.1f MB/s   %.2fx' %
+              (label, before * 1e6, before_mb, after * 1e6, after_mb, before / after))
+
+
+if __name__ == '__main__':
+    main()
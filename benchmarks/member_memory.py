@@ -0,0 +1,58 @@
+"""
+Memory held by a decoded effective membership of 300k members (by
+default), as a list of GroupMember objects and as a MemberList, measured
+with tracemalloc, with the decode time of each and the time of a
+difference against a copy with 1% of the members changed.
+
+    python benchmarks/member_memory.py [members]
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resttools.gws_backend import JSONBackend  # noqa: E402
+from resttools.models.gws import GroupMember, MemberList  # noqa: E402
+from gws_backends import members_json  # noqa: E402
+
+
+def as_list(data):
+    return [GroupMember(member['id'], member['type']) for member in json.loads(data)['data']]
+
+
+def measure(decode, data):
+    gc.collect()
+    tracemalloc.start()
+    started = time.time()
+    members = decode(data)
+    elapsed = time.time() - started
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return members, held, peak, elapsed
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    data = members_json(size)
+    changed = MemberList.from_pairs(('user%d' % (i + size if i % 100 == 0 else i), 'uwnetid') for i in range(size))
+    for label, decode in (('list', as_list), ('MemberList', JSONBackend().decode_members)):
+        members, held, peak, elapsed = measure(decode, data)
+        started = time.time()
+        if isinstance(members, MemberList):
+            removed = len(members - changed)
+        else:
+            current = set((m.name, m.member_type) for m in members)
+            removed = len(current - set(changed.pairs()))
+        diff = time.time() - started
+        print('%-10s %8d members  held %7.1f MB (%5.1f B/member)  peak %7.1f MB  decode %6.0f ms  '
+              'diff %6.0f ms (%d removed)' %
+              (label, len(members), held / 1e6, held / float(size), peak / 1e6, elapsed * 1e3, diff * 1e3, removed))
+        del members
+
+
+if __name__ == '__main__':
+    main()
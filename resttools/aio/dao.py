@@ -0,0 +1,162 @@
+# asyncio counterparts of the service DAOs in resttools.dao
+import asyncio
+
+from resttools.dao import DAO_BASE
+from resttools.dao_implementation import aio
+from resttools.dao_implementation.irws import File as IRWSFile
+from resttools.dao_implementation.irws import Live as IRWSLive
+from resttools.dao_implementation.nws import File as NWSFile
+from resttools.dao_implementation.nws import Live as NWSLive
+from resttools.dao_implementation.gws import File as GWSFile
+from resttools.dao_implementation.gws import Live as GWSLive
+from resttools.dao_implementation.ntfyws import File as NTFYWSFile
+from resttools.dao_implementation.ntfyws import Live as NTFYWSLive
+
+
+class AsyncDAO_BASE(DAO_BASE):
+    """
+    Base of the async service DAOs.  The transport is resolved as in
+    DAO_BASE; a dao_factory must return an object with coroutine
+    getURL/putURL/postURL/deleteURL methods.  The response cache and
+    rate limits are shared with the sync DAOs.
+    """
+
+    async def _pace(self, url):
+        if self._limiter is not None:
+            wait = self._limiter.reserve(url)
+            if wait:
+                await asyncio.sleep(wait)
+
+    async def _getURL(self, service, url, headers):
+        cache = self._cache
+        if cache is not None:
+            key = cache.key(url, headers)
+            response = cache.get(key)
+            if response is not None:
+                return response
+        await self._pace(url)
+        response = await self._getDAO().getURL(url, headers)
+        if cache is not None:
+            cache.put(key, response)
+        return response
+
+    async def _getStream(self, service, url, headers):
+        """
+        GET url without reading the body, which the caller reads with
+        iter_chunks() and then release()s.  Streams bypass the response
+        cache.
+        """
+        await self._pace(url)
+        return await self._getDAO().getStream(url, headers)
+
+    async def _getURLs(self, service, urls, headers):
+        """
+        GET many urls at once; the transport's connection limit caps the
+        concurrency.  Returns responses, or exceptions, in url order.
+        """
+        return await asyncio.gather(*[self._getURL(service, url, headers) for url in urls],
+                                    return_exceptions=True)
+
+    async def _postURL(self, service, url, headers, body=None):
+        await self._pace(url)
+        response = await self._getDAO().postURL(url, headers, body)
+        if self._cache is not None:
+            self._cache.invalidate(url)
+        return response
+
+    async def _deleteURL(self, service, url, headers):
+        await self._pace(url)
+        response = await self._getDAO().deleteURL(url, headers)
+        if self._cache is not None:
+            self._cache.invalidate(url)
+        return response
+
+    async def _putURL(self, service, url, headers, body=None):
+        await self._pace(url)
+        response = await self._getDAO().putURL(url, headers, body)
+        if self._cache is not None:
+            self._cache.invalidate(url)
+        return response
+
+    async def _putURLs(self, service, urls, headers, body=None):
+        """
+        PUT body to many urls at once, as _getURLs.
+        """
+        return await asyncio.gather(*[self._putURL(service, url, headers, body) for url in urls],
+                                    return_exceptions=True)
+
+    async def _deleteURLs(self, service, urls, headers):
+        return await asyncio.gather(*[self._deleteURL(service, url, headers) for url in urls],
+                                    return_exceptions=True)
+
+
+class IRWS_DAO(AsyncDAO_BASE):
+    _service_name = 'irws'
+    _live_class = staticmethod(lambda conf: aio.Live(IRWSLive(conf)))
+    _file_class = staticmethod(lambda conf: aio.File(IRWSFile(conf)))
+
+    async def getURL(self, url, headers):
+        return await self._getURL('irws', url, headers)
+
+    async def getURLs(self, urls, headers):
+        return await self._getURLs('irws', urls, headers)
+
+    async def putURL(self, url, headers, body):
+        return await self._putURL('irws', url, headers, body)
+
+    async def postURL(self, url, headers, body):
+        return await self._postURL('irws', url, headers, body)
+
+    async def deleteURL(self, url, headers):
+        return await self._deleteURL('irws', url, headers)
+
+
+class NWS_DAO(AsyncDAO_BASE):
+    _service_name = 'nws'
+    _live_class = staticmethod(lambda conf: aio.Live(NWSLive(conf)))
+    _file_class = staticmethod(lambda conf: aio.File(NWSFile(conf)))
+
+    async def getURL(self, url, headers):
+        return await self._getURL('nws', url, headers)
+
+    async def getURLs(self, urls, headers):
+        return await self._getURLs('nws', urls, headers)
+
+    async def postURL(self, url, headers, body):
+        return await self._postURL('nws', url, headers, body)
+
+
+class GWS_DAO(AsyncDAO_BASE):
+    _service_name = 'gws'
+    _live_class = staticmethod(lambda conf: aio.Live(GWSLive(conf)))
+    _file_class = staticmethod(lambda conf: aio.File(GWSFile(conf)))
+
+    async def getURL(self, url, headers):
+        return await self._getURL('gws', url, headers)
+
+    async def getURLs(self, urls, headers):
+        return await self._getURLs('gws', urls, headers)
+
+    async def getStream(self, url, headers):
+        return await self._getStream('gws', url, headers)
+
+    async def putURL(self, url, headers, body):
+        return await self._putURL('gws', url, headers, body)
+
+    async def putURLs(self, urls, headers, body):
+        return await self._putURLs('gws', urls, headers, body)
+
+    async def deleteURL(self, url, headers):
+        return await self._deleteURL('gws', url, headers)
+
+    async def deleteURLs(self, urls, headers):
+        return await self._deleteURLs('gws', urls, headers)
+
+
+class NTFYWS_DAO(AsyncDAO_BASE):
+    _service_name = 'ntfyws'
+    _live_class = staticmethod(lambda conf: aio.Live(NTFYWSLive(conf)))
+    _file_class = staticmethod(lambda conf: aio.File(NTFYWSFile(conf)))
+
+    async def postURL(self, url, headers, body):
+        return await self._postURL('ntfyws', url, headers, body)
@@ -0,0 +1,216 @@
+"""
+Asyncio Group Web Service interface.  Same methods, arguments and
+results as resttools.gws.GWS, as coroutines; iter_effective_members
+is an async generator.
+"""
+import re
+
+from resttools import gws
+from resttools.aio.dao import GWS_DAO
+from resttools.exceptions import InvalidGroupID
+from resttools.exceptions import DataFailureException
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class GWS(gws.GWS):
+
+    def __init__(self, conf, actas=None):
+        super(GWS, self).__init__(conf, actas=actas)
+        self.dao = GWS_DAO(conf)
+
+    async def _get_decoded(self, url, decode):
+        response = await self.dao.getURL(url, self._headers({"Accept": self._backend.content_type}))
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return decode(response.data)
+
+    async def search_groups(self, **kwargs):
+        return await self._get_decoded(self._search_url(**kwargs), self._backend.decode_groups)
+
+    async def get_group_by_id(self, group_id):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s" % (self._root, group_id)
+        return await self._get_decoded(url, self._backend.decode_group)
+
+    async def create_group(self, group):
+        body = self._backend.encode_group(group)
+
+        url = "%s/group/%s" % (self._root, group.name)
+        response = await self.dao.putURL(
+            url, self._headers({"Accept": self._backend.content_type,
+                                "Content-Type": self._backend.content_type}),
+            body)
+
+        if response.status != 201:
+            raise DataFailureException(url, response.status, response.data)
+
+        return self._backend.decode_group(response.data)
+
+    async def put_group(self, group):
+        body = self._backend.encode_group(group)
+
+        url = "%s/group/%s" % (self._root, group.name)
+        response = await self.dao.putURL(
+            url, self._headers({"Accept": self._backend.content_type,
+                                "Content-Type": self._backend.content_type, "If-Match": "*"}),
+            body)
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return self._backend.decode_group(response.data)
+
+    async def delete_group(self, group_id):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s" % (self._root, group_id)
+        response = await self.dao.deleteURL(url, self._headers({}))
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return True
+
+    async def get_members(self, group_id):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s/member" % (self._root, group_id)
+        return await self._get_decoded(url, self._backend.decode_members)
+
+    async def put_membership(self, group_id, members):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        body = self._backend.encode_members(group_id, members)
+        return await self._put_membership_body(group_id, body)
+
+    async def _put_membership_body(self, group_id, body):
+        url = "%s/group/%s/member" % (self._root, group_id)
+        response = await self.dao.putURL(
+            url, self._headers({"Content-Type": self._backend.content_type, "If-Match": "*"}),
+            body)
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return self._backend.decode_notfound(response.data)
+
+    async def sync_membership(self, group_id, desired, threshold=None):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        desired = gws._member_list(desired)
+        summary = self._sync_plan(await self.get_members(group_id), desired, threshold)
+        if summary['full']:
+            body = self._backend.encode_members(group_id, desired)
+            summary['notfound'] = await self._put_membership_body(group_id, body)
+            summary['bytes_sent'] = len(self._members_url(group_id)) + len(body.encode('utf-8'))
+            return summary
+
+        if summary['added']:
+            ids = [self._member_id(member) for member in summary['added']]
+            summary['notfound'] = await self.put_members(group_id, ids)
+            summary['bytes_sent'] += sum(len(url) for url in self._members_urls(group_id, ids))
+        if summary['removed']:
+            ids = [self._member_id(member) for member in summary['removed']]
+            await self.delete_members(group_id, ids)
+            summary['bytes_sent'] += sum(len(url) for url in self._members_urls(group_id, ids))
+        return summary
+
+    async def put_members(self, group_id, members):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        if len(members) == 0:
+            return []
+
+        urls = self._members_urls(group_id, members)
+        responses = await self.dao.putURLs(
+            urls, self._headers({"Content-Type": self._backend.content_type, "If-Match": "*"}),
+            None)
+
+        notfound = []
+        for response in gws._checked(urls, responses):
+            notfound.extend(self._backend.decode_notfound(response.data))
+        return notfound
+
+    async def delete_members(self, group_id, members):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        if len(members) == 0:
+            return True
+
+        urls = self._members_urls(group_id, members)
+        gws._checked(urls, await self.dao.deleteURLs(urls, self._headers(
+            {"Content-Type": self._backend.content_type, "If-Match": "*"})))
+
+        return True
+
+    async def get_effective_members(self, group_id):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s/effective_member" % (self._root, group_id)
+        return await self._get_decoded(url, self._backend.decode_members)
+
+    async def iter_effective_members(self, group_id):
+        """
+        Yields the group's effective members as the response arrives.  To
+        stop part way, aclose() the generator so its connection is
+        dropped at once.
+        """
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s/effective_member" % (self._root, group_id)
+        response = await self.dao.getStream(url, self._headers({"Accept": self._backend.content_type}))
+        done = False
+        try:
+            if response.status != 200:
+                raise DataFailureException(url, response.status, await response.read())
+
+            feed = self._backend.member_feed()
+            async for chunk in response.iter_chunks():
+                for member in feed.feed(chunk):
+                    yield member
+            for member in feed.close():
+                yield member
+            done = True
+        finally:
+            if not done:
+                # unread body: don't hand the connection back mid-response
+                response.close()
+            response.release()
+
+    async def get_effective_member_count(self, group_id):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        url = "%s/group/%s/effective_member?view=count" % (self._root, group_id)
+        return await self._get_decoded(url, self._backend.decode_member_count)
+
+    async def is_effective_member(self, group_id, netid):
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        # GWS doesn't accept EPPNs on effective member checks, for UW users
+        netid = re.sub('@washington.edu', '', netid)
+
+        url = "%s/group/%s/effective_member/%s" % (self._root, group_id, netid)
+        response = await self.dao.getURL(url, self._headers({"Accept": self._backend.content_type}))
+
+        if response.status == 404:
+            return False
+        elif response.status == 200:
+            return True
+        else:
+            raise DataFailureException(url, response.status, response.data)
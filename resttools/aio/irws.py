@@ -0,0 +1,169 @@
+"""
+Asyncio IRWS service interface.  Same methods, arguments and results as
+resttools.irws.IRWS, as coroutines; urls, bodies and decoding come from
+the sync class, only the transport calls are awaited here.
+"""
+import asyncio
+
+from resttools import irws
+from resttools.irws import ACCEPT_JSON, PUT_JSON, VERIFY_STATUSES
+from resttools.aio.dao import IRWS_DAO
+from resttools.exceptions import DeadlineExceeded
+
+
+async def _within(deadline, operation, what):
+    """
+    Await operation, giving up with DeadlineExceeded for what once
+    deadline seconds have passed; None waits as long as it takes.
+    """
+    if deadline is None:
+        return await operation
+    try:
+        return await asyncio.wait_for(operation, deadline)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(what)
+
+
+class IRWS(irws.IRWS):
+
+    def __init__(self, conf):
+        super(IRWS, self).__init__(conf)
+        self.dao = IRWS_DAO(conf)
+
+    async def _get_decoded(self, url, decode):
+        return self._decoded(url, await self.dao.getURL(url, ACCEPT_JSON), decode)
+
+    async def get_entity_profile(self, netid=None):
+        if netid is None:
+            return None
+        url = self._entity_profile_url(netid)
+        return await self._get_decoded(url, self._entity_profile_decoder(url))
+
+    async def put_entity_profile(self, netid=None, profile=None):
+        if profile is None:
+            return await self.get_entity_profile(netid=netid)
+        url = self._entity_profile_put_url(netid)
+        response = await self.dao.putURL(url, PUT_JSON, self._entity_profile_body(profile))
+        return self._entity_profile_decoder(url)(self._checked(url, response).data)
+
+    async def get_verify_attributes(self):
+        url = self._verify_attributes_url()
+        response = self._checked(url, await self.dao.getURL(url, ACCEPT_JSON))
+        return self._verify_attributes_from_json(url, response.data)
+
+    async def get_uwnetid(self, eid=None, regid=None, netid=None, source=None, status=None, ret_array=False):
+        url = self._uwnetid_url(eid=eid, regid=regid, netid=netid, source=source, status=status)
+        if url is None:
+            return None
+        ids = await self._get_decoded(url, lambda data: self._uwnetids_from_json(data, ret_array))
+        if ids is None and ret_array:
+            return []
+        return ids
+
+    async def get_person(self, netid=None, regid=None, eid=None):
+        url = self._person_url(netid=netid, regid=regid, eid=eid)
+        if url is None:
+            return None
+        return await self._get_decoded(url, self._person_from_json)
+
+    async def post_hr_person_by_netid(self, netid, wp_publish=None, deadline=None):
+        return await _within(deadline, self._post_hr_person_by_netid(netid, wp_publish),
+                             'post_hr_person_by_netid(%s)' % netid)
+
+    async def _post_hr_person_by_netid(self, netid, wp_publish):
+        self._check_wp_publish(wp_publish)
+        url = self._hr_url(netid, self._hr_url_from_person(await self.get_person(netid=netid)))
+        self._checked(url, await self.dao.postURL(url, ACCEPT_JSON, self._hr_body(wp_publish)))
+        return await self.get_uwhr_person(*self._hr_source_eid(url))
+
+    async def get_regid(self, netid=None, regid=None):
+        url = self._regid_url(netid=netid, regid=regid)
+        if url is None:
+            return None
+        return await self._get_decoded(url, self._regid_from_json)
+
+    async def get_pw_recover_info(self, netid):
+        return await self._get_decoded(self._profile_url(netid.lower()), self._pw_recover_from_json)
+
+    async def put_pw_recover_info(self, netid, profile):
+        url = self._profile_url(netid)
+        response = await self.dao.putURL(url, {"Content-type": "application/json"}, self._pw_recover_body(profile))
+        return self._checked(url, response, ok=range(500)).status
+
+    async def get_name_by_netid(self, netid):
+        return await self._get_decoded(self._name_url(netid), self._name_from_json)
+
+    async def put_name_by_netid(self, netid, first=None, middle=None, last=None):
+        name = self.valid_name_json(first=first, middle=middle, last=last)
+        url = self._name_url(netid)
+        return self._checked(url, await self.dao.putURL(url, ACCEPT_JSON, name)).status
+
+    async def get_uwhr_person(self, eid, source='uwhr'):
+        return await self._get_decoded(self._source_person_url(source, eid), self._uwhr_person_from_json)
+
+    async def get_sdb_person(self, sid):
+        return await self._get_decoded(self._source_person_url('sdb', sid), self._sdb_person_from_json)
+
+    async def get_cascadia_person(self, id):
+        return await self._get_decoded(self._source_person_url('cascadia', id), self._cascadia_person_from_json)
+
+    async def get_scca_person(self, id):
+        return await self._get_decoded(self._source_person_url('scca', id), self._scca_person_from_json)
+
+    async def get_supplemental_person(self, id):
+        return await self._get_decoded(self._source_person_url('supplemental', id),
+                                       self._supplemental_person_from_json)
+
+    async def get_generic_person(self, uri):
+        return await self._get_decoded(self._generic_person_url(uri), self._generic_person_from_json)
+
+    async def get_subscription(self, netid, subscription):
+        return await self._get_decoded(self._subscription_url(netid, subscription), self._subscription_from_json)
+
+    async def get_pdsentry_by_netid(self, netid):
+        return await self._get_decoded(self._pdsentry_url(netid), self._pdsentry_from_json)
+
+    async def put_pac(self, eid, source='uwhr'):
+        url = self._pac_url(eid, source)
+        return self._pac_from_json(self._checked(url, await self.dao.putURL(url, ACCEPT_JSON, '')).data)
+
+    async def verify_sdb_pac(self, sid, pac):
+        url = self._sdb_pac_url(sid, pac)
+        return self._checked(url, await self.dao.getURL(url, ACCEPT_JSON), ok=VERIFY_STATUSES).status
+
+    async def verify_sc_pin(self, netid, pin, deadline=None):
+        return await _within(deadline, self._verify_sc_pin(netid, pin), 'verify_sc_pin(%s)' % netid)
+
+    async def _verify_sc_pin(self, netid, pin):
+        # make sure there is a pin subscription
+        response = await self.dao.getURL(self._sc_subscription_url(netid), ACCEPT_JSON)
+        if response.status != 200:
+            return response.status
+        if not self._sc_pin_pending(response.data):
+            return 404
+
+        url = self._sc_pin_url(netid, pin)
+        response = await self.dao.getURL(url, ACCEPT_JSON)
+        if response.status == 200:
+            self._sc_pin_deleted(await self.dao.getURL(self._sc_pin_delete_url(netid), ACCEPT_JSON))
+        return self._checked(url, response, ok=VERIFY_STATUSES).status
+
+    async def get_qna(self, netid):
+        return await self._get_decoded(self._qna_url(netid), self._qna_from_json)
+
+    async def get_verify_qna(self, netid, answers, deadline=None):
+        return await _within(deadline, self._get_verify_qna(netid, answers), 'get_verify_qna(%s)' % netid)
+
+    async def _get_verify_qna(self, netid, answers):
+        questions = await self.get_qna(netid)
+        if len(questions) != len(answers):
+            return False
+        for index, answer in enumerate(answers, start=1):
+            url = self._qna_check_url(netid, index, answer)
+            if not self._qna_answer_ok(url, index, await self.dao.getURL(url, ACCEPT_JSON)):
+                return False
+        return True
+
+    async def verify_person_attribute(self, netid, attribute, value):
+        response = await self.dao.getURL(self._person_attribute_url(netid, attribute, value), ACCEPT_JSON)
+        return response.status == 200
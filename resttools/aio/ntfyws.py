@@ -0,0 +1,26 @@
+"""
+Asyncio Notify Web Service interface.  Same methods, arguments and
+results as resttools.ntfyws.NTFYWS, as coroutines.
+"""
+from resttools import ntfyws
+from resttools.aio.dao import NTFYWS_DAO
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class NTFYWS(ntfyws.NTFYWS):
+
+    def __init__(self, conf, actas=None):
+        super(NTFYWS, self).__init__(conf, actas=actas)
+        self.dao = NTFYWS_DAO(conf)
+
+    async def send_message(self, eppn, number, message, type='text'):
+        body = self._dispatch_json(eppn, number, message, type)
+        if body is None:
+            return 400
+
+        url = "/%s/v1/dispatch" % (self._service_name)
+        resp = await self.dao.postURL(url, {"Content-Type": "application/json"}, body)
+
+        return resp.status
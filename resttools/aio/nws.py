@@ -0,0 +1,56 @@
+"""
+Asyncio UW NetID Web Service interface.  Same methods, arguments and
+results as resttools.nws.NWS, as coroutines.
+"""
+import json
+from six.moves.urllib.parse import quote_plus
+
+from resttools import nws
+from resttools.aio.dao import NWS_DAO
+from resttools.exceptions import DataFailureException
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class NWS(nws.NWS):
+
+    def __init__(self, conf, actas=None):
+        super(NWS, self).__init__(conf, actas=actas)
+        self.dao = NWS_DAO(conf)
+
+    async def _get_json(self, url, decode):
+        response = await self.dao.getURL(url, self._headers({"Accept": "application/json"}))
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return decode(response.data)
+
+    async def get_netid_admins(self, netid):
+        url = "%s/uwnetid/%s/admin" % (self._base_url, quote_plus(netid))
+        return await self._get_json(url, self._admins_from_json)
+
+    async def get_netid_pwinfo(self, netid):
+        url = "%s/uwnetid/%s/password" % (self._base_url, quote_plus(netid))
+        return await self._get_json(url, self._pwinfo_from_json)
+
+    async def get_netid_supported(self, netid):
+        url = "%s/uwnetid/%s/supported" % (self._base_url, quote_plus(netid))
+        return await self._get_json(url, self._supportees_from_json)
+
+    async def set_netid_pw(self, netid, password, auth, action=None):
+        if action is None:
+            action = self._pw_action
+
+        url = "%s/uwnetid/%s/password" % (self._base_url, quote_plus(netid))
+        data = {'action': action, 'newPassword': password, 'uwNetID': netid, 'authMethod': auth}
+        response = await self.dao.postURL(url, {"Content-type": "application/json"}, json.dumps(data))
+
+        if response.status >= 500:
+            raise DataFailureException(url, response.status, response.data)
+        obj = json.loads(response.data)
+        if 'result' not in obj:
+            # probably a mock data issue
+            return (500, "Unable to set password.")
+        return (obj['result'], obj['message'])
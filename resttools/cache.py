@@ -0,0 +1,238 @@
+"""
+Opt-in read-through response cache for the service DAOs.
+
+Enable it per service in conf:
+
+    'CACHE_TTL': 60,                    # seconds, default for the service
+    'CACHE_TTLS': [(r'/person/', 300),  # (url regex, seconds), first match
+                   (r'/qna', 0)],       # wins; 0 means never cache
+    'CACHE_MAX_BYTES': 8 * 1024 * 1024, # LRU budget for cached bodies
+
+Only 200 responses to GET are cached.  Entries are keyed by url, Accept
+and X-UW-Act-as, and a PUT, POST or DELETE to a resource drops the
+cached entries for it and its parents.
+
+'CONDITIONAL_GET': True keeps the validators (ETag, Last-Modified) and
+parsed results of recent GWS reads in a ValidatorStore, so they can be
+revalidated instead of downloaded again.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from resttools import forksafe
+from resttools.dao_implementation.balancer import host_key
+from resttools.mock.mock_http import MockHTTP
+
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(service, conf):
+    """
+    Return the cache shared by the service DAOs with this conf's host and
+    identity, or None if caching isn't configured.
+    """
+    if 'CACHE_TTL' not in conf and 'CACHE_TTLS' not in conf:
+        return None
+    key = (service, conf.get('RUN_MODE'), host_key(conf), conf.get('CERT_FILE'))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ResponseCache(ttl=conf.get('CACHE_TTL', 0),
+                                  ttls=conf.get('CACHE_TTLS', ()),
+                                  max_bytes=conf.get('CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+            _caches[key] = cache
+    return cache
+
+
+def get_caches():
+    """
+    Return a copy of the registry of response caches and validator stores.
+    """
+    with _caches_lock:
+        return dict(_caches)
+
+
+def clear_caches():
+    with _caches_lock:
+        _caches.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    """
+    Each forked worker starts with empty caches of its own.
+    """
+    global _caches_lock
+    _caches_lock = threading.Lock()
+    for cache in _caches.values():
+        cache._after_fork()
+
+
+def get_validator_store(service, conf, actas=None):
+    """
+    Return the validator store shared by the clients with this conf's host,
+    identity and act-as user, or None unless conf['CONDITIONAL_GET'] is set.
+    """
+    if not conf.get('CONDITIONAL_GET'):
+        return None
+    key = ('validators', service, conf.get('RUN_MODE'), host_key(conf),
+           conf.get('CERT_FILE'), actas)
+    with _caches_lock:
+        store = _caches.get(key)
+        if store is None:
+            store = ValidatorStore(conf.get('CONDITIONAL_GET_MAX_ENTRIES', 256))
+            _caches[key] = store
+    return store
+
+
+def _path(url):
+    return url.split('?', 1)[0].rstrip('/')
+
+
+class ResponseCache(object):
+    """
+    A byte-budgeted LRU of responses with per-url-pattern expiry.
+    """
+
+    def __init__(self, ttl=0, ttls=(), max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.ttls = [(re.compile(pattern), seconds) for pattern, seconds in ttls]
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, url, headers):
+        headers = headers or {}
+        return (url, headers.get('Accept'), headers.get('X-UW-Act-as'))
+
+    def ttl_for(self, url):
+        for pattern, seconds in self.ttls:
+            if pattern.search(url):
+                return seconds
+        return self.ttl
+
+    def get(self, key):
+        """
+        Return a copy of the cached response for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            # pop and reinsert: py2's OrderedDict has no move_to_end
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+        expires, status, data, headers = entry
+        response = MockHTTP()
+        response.status = status
+        response.data = data
+        response.headers = dict(headers)
+        return response
+
+    def put(self, key, response):
+        """
+        Cache a 200 response for key if its url has a ttl and its body
+        fits the budget.
+        """
+        if response.status != 200:
+            return
+        ttl = self.ttl_for(key[0])
+        data = response.data
+        size = len(data or '')
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        headers = dict(response.headers or {})
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + ttl, response.status, data, headers)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, url):
+        """
+        Drop the cached entries for url's resource, its sub-resources
+        and the resources it belongs to.
+        """
+        path = _path(url)
+        with self._lock:
+            for key in list(self._entries):
+                cached = _path(key[0])
+                if (cached == path or cached.startswith(path + '/') or
+                        path.startswith(cached + '/')):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size,
+                    'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2] or '')
+
+
+class ValidatorStore(object):
+    """
+    The ETag and Last-Modified validators of recent GETs, with the parsed
+    result of each, for conditional revalidation.  Keeps the most recently
+    used max_entries urls.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Return (etag, last_modified, value) for url, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries[url] = self._entries.pop(url)
+            return entry
+
+    def put(self, url, etag, last_modified, value):
+        if etag is None and last_modified is None:
+            return
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = (etag, last_modified, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._entries.clear()
@@ -1,4 +1,10 @@
 # resttools implementation for non-django applications
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import import_module
+import six
+from resttools.cache import get_cache
+from resttools import deadline, forksafe, priority, singleflight
+from resttools.ratelimit import get_limiter
 from resttools.dao_implementation.irws import File as IRWSFile
 from resttools.dao_implementation.irws import Live as IRWSLive
 from resttools.dao_implementation.nws import File as NWSFile
@@ -9,37 +15,207 @@ from resttools.dao_implementation.ntfyws import File as NTFYWSFile
 from resttools.dao_implementation.ntfyws import Live as NTFYWSLive
 
 
+def _import_string(path):
+    module_name, attr = path.rsplit('.', 1)
+    return getattr(import_module(module_name), attr)
+
+
+def _result_or_exception(future):
+    try:
+        return future.result()
+    except Exception as ex:
+        return ex
+
+
 class DAO_BASE(object):
+    """
+    Base of the service DAOs.  The transport DAO is resolved once, on first
+    use, from conf['RUN_MODE'] ('Live' or 'File').  Another transport can
+    be injected with dao_factory (or conf['DAO_FACTORY']): a callable, or
+    the dotted path of one, that takes conf and returns an object with the
+    getURL/putURL/postURL/deleteURL methods.
+
+    GETs go through the service's response cache when conf enables one
+    (see resttools.cache); writes invalidate the resource's entries.
+    Concurrent identical GETs of the same priority share one upstream
+    request (see resttools.singleflight).  Requests sent upstream are paced by the
+    service's rate limit, if conf sets one (see resttools.ratelimit).
+    Nothing is sent once the caller's deadline (see resttools.deadline)
+    has passed.  A priority ('interactive' or 'background', see
+    resttools.priority) given here applies to every request of the DAO.
+    """
+    _live_class = None
+    _file_class = None
+    _service_name = None
 
-    def __init__(self, conf):
+    def __init__(self, conf, dao_factory=None, priority=None):
         self._conf = conf
+        self._priority = priority
         self._run_mode = conf['RUN_MODE']
+        self._dao_factory = dao_factory or conf.get('DAO_FACTORY')
+        self._dao = None
+        self._cache = get_cache(self._service_name, conf)
+        self._flights = singleflight.get_group(self._service_name, conf)
+        self._limiter = get_limiter(self._service_name, conf)
+
+    def _getDAO(self):
+        if self._dao is None:
+            self._dao = self._make_dao()
+        return self._dao
+
+    def _make_dao(self):
+        factory = self._dao_factory
+        if factory is None:
+            if self._run_mode == 'Live':
+                factory = self._live_class
+            else:
+                factory = self._file_class
+        elif isinstance(factory, six.string_types):
+            factory = _import_string(factory)
+        return factory(self._conf)
+
+    def warm_up(self, connections=None):
+        """
+        Pre-open the live transport's connections (see LiveDAO.warm_up).
+        Returns the number opened; 0 for transports without a pool.
+        """
+        dao = self._getDAO()
+        if not hasattr(dao, 'warm_up'):
+            return 0
+        return dao.warm_up(connections)
+
+    def probe(self, url='/'):
+        """
+        Time a handshake and a GET of url on a fresh live connection
+        (see LiveDAO.probe); None for transports without a pool.
+        """
+        dao = self._getDAO()
+        if not hasattr(dao, 'probe'):
+            return None
+        return dao.probe(url)
 
     def _getURL(self, service, url, headers):
+        # before the cache and single-flight, which a fork leaves stale
+        forksafe.check()
+        cache = self._cache
+        if cache is not None:
+            key = cache.key(url, headers)
+            response = cache.get(key)
+            if response is not None:
+                return response
+        if self._flights is not None:
+            # callers of different priorities each queue for the gate
+            # themselves, so an interactive one never waits on a
+            # background fetch
+            key = self._flights.key(url, headers) + (self._priority or priority.current(),)
+            return self._flights.do(key, lambda: self._fetchURL(url, headers))
+        return self._fetchURL(url, headers)
+
+    def _send(self, method, url, *args):
+        """
+        Call the transport's method for url, under the rate limit,
+        deadline and priority.
+        """
+        forksafe.check()
         dao = self._getDAO()
-        response = dao.getURL(url, headers)
+        left = deadline.check(url)
+        if self._limiter is not None:
+            # no waiting for a token past the deadline
+            self._limiter.acquire(url, left)
+            deadline.check(url)
+        with priority.Priority(self._priority):
+            return getattr(dao, method)(url, *args)
+
+    def _fetchURL(self, url, headers):
+        response = self._send('getURL', url, headers)
+        if self._cache is not None:
+            self._cache.put(self._cache.key(url, headers), response)
         return response
 
+    def _getStream(self, service, url, headers):
+        """
+        GET url without reading the body, which the caller read()s
+        incrementally and then release_conn()s.  Streams bypass the
+        response cache and single-flight.
+        """
+        return self._send('getStream', url, headers)
+
+    def _getURLs(self, service, urls, headers, ordered=True):
+        """
+        GET many urls at once on a thread pool no larger than the
+        service's MAX_POOL_SIZE.  Each result is the response, or the
+        exception raised while fetching that url.  With ordered=True a
+        list in the order of urls is returned; otherwise (url, result)
+        pairs are yielded as they complete.
+        """
+        urls = list(urls)
+        calls = [(self._getURL, (service, url, headers)) for url in urls]
+        if ordered:
+            return list(self._map_calls(calls))
+        return ((urls[i], result) for i, result in self._map_calls(calls, ordered=False))
+
+    def _map_calls(self, calls, ordered=True):
+        """
+        Run (func, args) calls concurrently, capped by the pool size.
+        Yields results (ordered) or (index, result) as completed;
+        exceptions are returned in place of results, never raised.
+        """
+        if not calls:
+            return
+        workers = min(len(calls), getattr(self._getDAO(), '_max_pool_size', 5))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(priority.bind(deadline.bind(func)), *args) for func, args in calls]
+            if ordered:
+                for future in futures:
+                    yield _result_or_exception(future)
+            else:
+                index = dict((future, i) for i, future in enumerate(futures))
+                for future in as_completed(futures):
+                    yield index[future], _result_or_exception(future)
+
     def _postURL(self, service, url, headers, body=None):
-        dao = self._getDAO()
-        response = dao.postURL(url, headers, body)
+        response = self._send('postURL', url, headers, body)
+        if self._cache is not None:
+            self._cache.invalidate(url)
         return response
 
     def _deleteURL(self, service, url, headers):
-        dao = self._getDAO()
-        response = dao.deleteURL(url, headers)
+        response = self._send('deleteURL', url, headers)
+        if self._cache is not None:
+            self._cache.invalidate(url)
         return response
 
     def _putURL(self, service, url, headers, body=None):
-        dao = self._getDAO()
-        response = dao.putURL(url, headers, body)
+        response = self._send('putURL', url, headers, body)
+        if self._cache is not None:
+            self._cache.invalidate(url)
         return response
 
+    def _putURLs(self, service, urls, headers, body=None):
+        """
+        PUT body to many urls at once, as _getURLs does GETs; returns the
+        responses, or exceptions, in url order.
+        """
+        return list(self._map_calls([(self._putURL, (service, url, headers, body)) for url in urls]))
+
+    def _deleteURLs(self, service, urls, headers):
+        """
+        DELETE many urls at once, as _putURLs.
+        """
+        return list(self._map_calls([(self._deleteURL, (service, url, headers)) for url in urls]))
+
 
 class IRWS_DAO(DAO_BASE):
+    _service_name = 'irws'
+    _live_class = IRWSLive
+    _file_class = IRWSFile
+
     def getURL(self, url, headers):
         return self._getURL('irws', url, headers)
 
+    def getURLs(self, urls, headers, ordered=True):
+        return self._getURLs('irws', urls, headers, ordered=ordered)
+
     def putURL(self, url, headers, body):
         return self._putURL('irws', url, headers, body)
 
@@ -49,46 +225,53 @@ class IRWS_DAO(DAO_BASE):
     def deleteURL(self, url, headers):
         return self._deleteURL('irws', url, headers)
 
-    def _getDAO(self):
-        if self._run_mode == 'Live':
-            return IRWSLive(self._conf)
-        return IRWSFile(self._conf)
-
 
 class NWS_DAO(DAO_BASE):
+    _service_name = 'nws'
+    _live_class = NWSLive
+    _file_class = NWSFile
+
     def getURL(self, url, headers):
         return self._getURL('nws', url, headers)
 
+    def getURLs(self, urls, headers, ordered=True):
+        return self._getURLs('nws', urls, headers, ordered=ordered)
+
     def postURL(self, url, headers, body):
         return self._postURL('nws', url, headers, body)
 
-    def _getDAO(self):
-        if self._run_mode == 'Live':
-            return NWSLive(self._conf)
-        return NWSFile(self._conf)
-
 
 class GWS_DAO(DAO_BASE):
+    _service_name = 'gws'
+    _live_class = GWSLive
+    _file_class = GWSFile
+
     def getURL(self, url, headers):
         return self._getURL('gws', url, headers)
 
+    def getURLs(self, urls, headers, ordered=True):
+        return self._getURLs('gws', urls, headers, ordered=ordered)
+
+    def getStream(self, url, headers):
+        return self._getStream('gws', url, headers)
+
     def putURL(self, url, headers, body):
         return self._putURL('gws', url, headers, body)
 
+    def putURLs(self, urls, headers, body):
+        return self._putURLs('gws', urls, headers, body)
+
     def deleteURL(self, url, headers):
         return self._deleteURL('gws', url, headers)
 
-    def _getDAO(self):
-        if self._run_mode == 'Live':
-            return GWSLive(self._conf)
-        return GWSFile(self._conf)
+    def deleteURLs(self, urls, headers):
+        return self._deleteURLs('gws', urls, headers)
 
 
 class NTFYWS_DAO(DAO_BASE):
+    _service_name = 'ntfyws'
+    _live_class = NTFYWSLive
+    _file_class = NTFYWSFile
+
     def postURL(self, url, headers, body):
         return self._postURL('ntfyws', url, headers, body)
-
-    def _getDAO(self):
-        if self._run_mode == 'Live':
-            return NTFYWSLive(self._conf)
-        return NTFYWSFile(self._conf)
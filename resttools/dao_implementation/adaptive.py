@@ -0,0 +1,186 @@
+"""
+Adaptive concurrency limits for the live DAOs, one per service and host.
+
+The limiter caps the requests in flight, and moves the cap by AIMD once
+per window of limit requests: it goes up by one if they all came back
+without error and their mean latency was within LATENCY_TOLERANCE times
+the no-load latency (the fastest of the last WINDOW responses), and is
+cut by BACKOFF otherwise.
+
+The limit stays between MIN_LIMIT and MAX_LIMIT, which defaults to the
+service's MAX_POOL_SIZE: size the pool for peak and let the limiter find
+what the upstream can take.  Requests over the limit wait for a slot, at
+most QUEUE_TIMEOUT seconds (default: as long as it takes), and then raise
+ConcurrencyLimited.  Slots are handed out in arrival order.
+
+Turn it on in a service conf with 'ADAPTIVE_CONCURRENCY': True, or a dict
+overriding any of the DEFAULTS.
+"""
+import time
+import threading
+from collections import deque
+
+from resttools import deadline, forksafe, metrics
+from resttools.exceptions import ConcurrencyLimited
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'INITIAL_LIMIT': None,
+    'MIN_LIMIT': 1,
+    'MAX_LIMIT': None,
+    'BACKOFF': 0.9,
+    'LATENCY_TOLERANCE': 2.0,
+    'WINDOW': 100,
+    'QUEUE_TIMEOUT': None,
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(service, host, settings, max_pool_size):
+    """
+    Return the limiter for service at host, or None if settings is falsy.
+    """
+    if not settings:
+        return None
+    key = (service, host)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            options = dict(DEFAULTS)
+            if isinstance(settings, dict):
+                options.update(settings)
+            options = dict((k.lower(), v) for k, v in options.items())
+            options['max_limit'] = options['max_limit'] or max_pool_size
+            options['initial_limit'] = options['initial_limit'] or options['max_limit']
+            limiter = AdaptiveLimiter(service, **options)
+            _limiters[key] = limiter
+    return limiter
+
+
+def get_concurrency_limiters():
+    """
+    Return a copy of the registry, {(service, host): AdaptiveLimiter}.
+    """
+    with _limiters_lock:
+        return dict(_limiters)
+
+
+def clear_concurrency_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _limiters_lock
+    _limiters_lock = threading.Lock()
+    for limiter in _limiters.values():
+        limiter._after_fork()
+
+
+class AdaptiveLimiter(object):
+
+    def __init__(self, service, initial_limit=5, min_limit=1, max_limit=5, backoff=0.9,
+                 latency_tolerance=2.0, window=100, queue_timeout=None):
+        self.service = service
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.queue_timeout = queue_timeout
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._failed = False
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """
+        The current limit on requests in flight.
+        """
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, url):
+        """
+        Wait for a slot under the limit; pair with release().
+        """
+        timeout = self.queue_timeout
+        left = deadline.remaining()
+        if left is not None:
+            timeout = left if timeout is None else min(timeout, left)
+        with self._lock:
+            if self._in_flight < int(self._limit) and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return
+        with self._lock:
+            if waiter.is_set():
+                # granted just as the wait timed out
+                return
+            self._waiters.remove(waiter)
+        metrics.incr('concurrency_limited', self.service)
+        deadline.check(url)
+        raise ConcurrencyLimited(url, self.service, self.limit)
+
+    def release(self, latency, success=True):
+        """
+        Give back a slot, adjusting the limit by the request's outcome:
+        success True or False, or None to leave the limit alone.
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if success is not None:
+                self._adjust(latency, success)
+            # hand free slots straight to the longest waiters
+            while self._waiters and self._in_flight < int(self._limit):
+                self._in_flight += 1
+                self._waiters.popleft().set()
+
+    def status(self):
+        with self._lock:
+            return {'limit': int(self._limit), 'in_flight': self._in_flight,
+                    'no_load_latency': min(self._latencies) if self._latencies else None}
+
+    def _after_fork(self):
+        """
+        Keep the limit learned so far, but none of the parent's requests
+        or waiters.
+        """
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters.clear()
+        self._count, self._total, self._failed = 0, 0.0, False
+
+    def _adjust(self, latency, success):
+        if success:
+            self._latencies.append(latency)
+        self._count += 1
+        self._total += latency
+        self._failed = self._failed or not success
+        if self._count < int(self._limit):
+            return
+        overloaded = (self._failed or not self._latencies or
+                      self._total / self._count > self.latency_tolerance * min(self._latencies))
+        self._count, self._total, self._failed = 0, 0.0, False
+        if not overloaded:
+            self._limit = min(self.max_limit, self._limit + 1)
+            return
+        limit = max(self.min_limit, self._limit * self.backoff)
+        if int(limit) < int(self._limit):
+            logger.info('%s concurrency limit %d -> %d', self.service, int(self._limit), int(limit))
+        self._limit = limit
@@ -0,0 +1,189 @@
+"""
+Asyncio transports.  Each wraps the matching synchronous DAO so that
+configuration (pool size, timeouts, certificate checks) is read the
+same way in both worlds.
+"""
+import ssl
+import weakref
+import asyncio
+
+from resttools import forksafe
+from resttools.dao_implementation.live import pool_key
+
+import logging
+logger = logging.getLogger(__name__)
+
+# aiohttp sessions, per event loop, keyed like the live connection pools
+_sessions = weakref.WeakKeyDictionary()
+# a forked child opens its own
+forksafe.register(_sessions.clear)
+
+
+class AsyncResponse(object):
+    """
+    The parts of HTTPResponse the service classes use, with the body
+    already read.
+    """
+    def __init__(self, status, data, headers):
+        self.status = status
+        self.data = data
+        self.headers = headers
+
+    def read(self):
+        return self.data
+
+    def getheader(self, field, default=''):
+        return self.headers.get(field, default)
+
+
+class LiveStream(object):
+    """
+    An aiohttp response with its body unread.  iter_chunks() yields the
+    body as it arrives; the caller then release()s it, or close()s it
+    to drop a connection left part way through the body.
+    """
+    def __init__(self, resp):
+        self.status = resp.status
+        self.headers = resp.headers
+        self._resp = resp
+
+    async def read(self):
+        return await self._resp.read()
+
+    def iter_chunks(self, size=65536):
+        return self._resp.content.iter_chunked(size)
+
+    def close(self):
+        self._resp.close()
+
+    def release(self):
+        self._resp.release()
+
+
+class FileStream(object):
+    """
+    LiveStream's face on a File DAO's streaming response.
+    """
+    def __init__(self, response):
+        self.status = response.status
+        self.headers = response.headers
+        self._response = response
+
+    async def read(self):
+        return self._response.read()
+
+    async def iter_chunks(self, size=65536):
+        while True:
+            data = self._response.read(size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        self._response.close()
+
+    def release(self):
+        self._response.release_conn()
+
+
+class File(object):
+    """
+    Async face of a File DAO.  Mock data is local, so calls run inline
+    on the event loop.
+    """
+    def __init__(self, dao):
+        self._dao = dao
+        self._max_pool_size = dao._max_pool_size
+
+    async def getURL(self, url, headers):
+        return self._dao.getURL(url, headers)
+
+    async def getStream(self, url, headers):
+        return FileStream(self._dao.getStream(url, headers))
+
+    async def putURL(self, url, headers, body):
+        return self._dao.putURL(url, headers, body)
+
+    async def postURL(self, url, headers, body):
+        return self._dao.postURL(url, headers, body)
+
+    async def deleteURL(self, url, headers):
+        return self._dao.deleteURL(url, headers)
+
+
+class Live(object):
+    """
+    Async face of a Live DAO, on aiohttp.  Connections to a host are
+    capped at the live DAO's MAX_POOL_SIZE, per event loop.  Only the
+    first of several HOSTs is used; there is no load balancing here.
+    """
+    def __init__(self, dao):
+        self._conf = dao._conf
+        self._service_name = dao._service_name
+        self._max_pool_size = dao._max_pool_size
+        self._socket_timeout = dao._socket_timeout
+        self._verify_https = dao._verify_https
+        self._host = dao._hosts[0]
+
+    async def getURL(self, url, headers):
+        return await self._request('GET', url, headers)
+
+    async def getStream(self, url, headers):
+        resp = await self._get_session().request('GET', self._host.rstrip('/') + url, headers=headers)
+        return LiveStream(resp)
+
+    async def putURL(self, url, headers, body):
+        return await self._request('PUT', url, headers, body=body)
+
+    async def postURL(self, url, headers, body):
+        return await self._request('POST', url, headers, body=body)
+
+    async def deleteURL(self, url, headers):
+        return await self._request('DELETE', url, headers)
+
+    async def _request(self, method, url, headers, body=None):
+        session = self._get_session()
+        async with session.request(method, self._host.rstrip('/') + url,
+                                   headers=headers, data=body) as resp:
+            data = await resp.read()
+            return AsyncResponse(resp.status, data, resp.headers)
+
+    def _get_session(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        sessions = _sessions.setdefault(loop, {})
+        key = pool_key(self._host,
+                       self._conf.get('KEY_FILE'),
+                       self._conf.get('CERT_FILE'),
+                       self._conf.get('CA_FILE'),
+                       self._verify_https)
+        session = sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_pool_size,
+                                             ssl=self._ssl_context())
+            timeout = aiohttp.ClientTimeout(sock_connect=self._socket_timeout,
+                                            sock_read=self._socket_timeout)
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            sessions[key] = session
+        return session
+
+    def _ssl_context(self):
+        if not self._host.startswith('https:'):
+            return None
+        context = ssl.create_default_context(cafile=self._conf.get('CA_FILE'))
+        if not self._verify_https:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        if self._conf.get('CERT_FILE') and self._conf.get('KEY_FILE'):
+            context.load_cert_chain(self._conf['CERT_FILE'], self._conf['KEY_FILE'])
+        return context
+
+
+async def close_sessions():
+    """
+    Close the aiohttp sessions opened on the running event loop.
+    """
+    sessions = _sessions.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.close()
@@ -0,0 +1,193 @@
+"""
+Client-side load balancing for live DAOs configured with several hosts.
+
+'HOST' may be a list of replica URLs.  Each request goes to the host
+with the fewest requests outstanding from this process, ties broken by
+the lower recent latency; with POLICY 'latency' the host with the lowest
+latency times (outstanding + 1) wins instead.  A host that fails
+EJECT_AFTER times in a row (connection errors, timeouts, 5xx) is ejected
+for EJECT_TIME seconds and then re-admitted on probation: its next
+failure ejects it again.
+
+Override any of the DEFAULTS in a service conf with 'LOAD_BALANCER'.
+"""
+import time
+import threading
+
+from resttools import forksafe, metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLICY': 'least_outstanding',
+    'EJECT_AFTER': 3,
+    'EJECT_TIME': 30.0,
+    'LATENCY_DECAY': 0.3,
+}
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+
+def hosts(conf):
+    """
+    Return conf['HOST'] as a list of host URLs.
+    """
+    host = conf['HOST']
+    if isinstance(host, (list, tuple)):
+        return list(host)
+    return [host]
+
+
+def host_key(conf):
+    """
+    Return conf's HOST in a form usable in registry keys.
+    """
+    host = conf.get('HOST')
+    if isinstance(host, list):
+        return tuple(host)
+    return host
+
+
+def get_balancer(service, conf):
+    """
+    Return the balancer shared by the service's DAOs for conf's hosts, or
+    None if conf names a single host.
+    """
+    host_list = hosts(conf)
+    if len(host_list) < 2:
+        return None
+    key = (service, tuple(host_list))
+    with _balancers_lock:
+        balancer = _balancers.get(key)
+        if balancer is None:
+            options = dict(DEFAULTS)
+            options.update(conf.get('LOAD_BALANCER') or {})
+            balancer = Balancer(service, host_list, **dict((k.lower(), v) for k, v in options.items()))
+            _balancers[key] = balancer
+    return balancer
+
+
+def get_balancers():
+    """
+    Return a copy of the balancer registry, {(service, hosts): Balancer}.
+    """
+    with _balancers_lock:
+        return dict(_balancers)
+
+
+def clear_balancers():
+    with _balancers_lock:
+        _balancers.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _balancers_lock
+    _balancers_lock = threading.Lock()
+    for balancer in _balancers.values():
+        balancer._after_fork()
+
+
+class _Host(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = 0.0
+        self.failures = 0
+        self.ejected_until = None
+
+
+class Balancer(object):
+
+    def __init__(self, service, host_list, policy='least_outstanding', eject_after=3,
+                 eject_time=30.0, latency_decay=0.3):
+        if policy not in ('least_outstanding', 'latency'):
+            raise ValueError('unknown load balancer policy %r' % policy)
+        self.service = service
+        self.policy = policy
+        self.eject_after = eject_after
+        self.eject_time = eject_time
+        self.latency_decay = latency_decay
+        self._hosts = [_Host(url) for url in host_list]
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        """
+        The parent's requests are not outstanding in the child.
+        """
+        self._lock = threading.Lock()
+        for host in self._hosts:
+            host.outstanding = 0
+
+    def choose(self, exclude=()):
+        """
+        Return the URL of the best host not in exclude, and count a
+        request outstanding on it; pair each choose() with a finish().
+        When every candidate is ejected, the one due back soonest is
+        used rather than failing.
+        """
+        now = time.time()
+        with self._lock:
+            candidates = [h for h in self._hosts if h.url not in exclude]
+            if not candidates:
+                raise ValueError('no hosts left to try')
+            for host in candidates:
+                if host.ejected_until is not None and host.ejected_until <= now:
+                    # back on probation: one more failure ejects it again
+                    host.ejected_until = None
+                    host.failures = self.eject_after - 1
+                    logger.info('%s host %s re-admitted', self.service, host.url)
+            admitted = [h for h in candidates if h.ejected_until is None]
+            if admitted:
+                host = min(admitted, key=self._score)
+            else:
+                host = min(candidates, key=lambda h: h.ejected_until)
+            host.outstanding += 1
+            return host.url
+
+    def finish(self, url, success, elapsed):
+        """
+        Record the outcome and duration of a request chosen for url.
+        """
+        with self._lock:
+            host = self._host(url)
+            host.outstanding -= 1
+            if host.latency:
+                host.latency += self.latency_decay * (elapsed - host.latency)
+            else:
+                host.latency = elapsed
+            if success:
+                host.failures = 0
+                return
+            host.failures += 1
+            if host.failures >= self.eject_after and host.ejected_until is None:
+                host.ejected_until = time.time() + self.eject_time
+                metrics.incr('ejections', self.service)
+                logger.warning('%s host %s ejected for %ss after %d failures',
+                               self.service, url, self.eject_time, host.failures)
+
+    def status(self):
+        """
+        Return {url: {'outstanding', 'latency', 'failures', 'ejected'}}.
+        """
+        now = time.time()
+        with self._lock:
+            return dict((h.url, {'outstanding': h.outstanding,
+                                 'latency': h.latency,
+                                 'failures': h.failures,
+                                 'ejected': h.ejected_until is not None and h.ejected_until > now})
+                        for h in self._hosts)
+
+    def _score(self, host):
+        if self.policy == 'latency':
+            return (host.latency * (host.outstanding + 1), host.outstanding)
+        return (host.outstanding, host.latency)
+
+    def _host(self, url):
+        for host in self._hosts:
+            if host.url == url:
+                return host
+        raise KeyError(url)
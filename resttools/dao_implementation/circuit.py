@@ -0,0 +1,159 @@
+"""
+Circuit breakers for the live DAOs, one per service and host.
+
+A breaker watches the outcome of the last WINDOW requests.  Once at
+least MIN_REQUESTS have been seen and the share of errors (connection
+failures, timeouts and 5xx responses) reaches FAILURE_RATE, it opens:
+requests fail fast with CircuitBreakerOpen for RESET_TIMEOUT seconds.
+Then it is half-open and lets HALF_OPEN_PROBES requests through; if
+they all succeed it closes, and any failure opens it again.
+
+Turn it on in a service conf with 'CIRCUIT_BREAKER': True, or a dict
+overriding any of the DEFAULTS.
+"""
+import time
+import threading
+from collections import deque
+
+from resttools import forksafe
+from resttools.exceptions import CircuitBreakerOpen
+
+import logging
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+DEFAULTS = {
+    'WINDOW': 20,
+    'MIN_REQUESTS': 10,
+    'FAILURE_RATE': 0.5,
+    'RESET_TIMEOUT': 30.0,
+    'HALF_OPEN_PROBES': 2,
+}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(service, host, settings):
+    """
+    Return the breaker for service at host, or None if settings is falsy.
+    """
+    if not settings:
+        return None
+    key = (service, host)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            options = dict(DEFAULTS)
+            if isinstance(settings, dict):
+                options.update(settings)
+            breaker = CircuitBreaker(service, host, **dict((k.lower(), v) for k, v in options.items()))
+            _breakers[key] = breaker
+    return breaker
+
+
+def get_breakers():
+    """
+    Return a copy of the breaker registry, {(service, host): CircuitBreaker}.
+    """
+    with _breakers_lock:
+        return dict(_breakers)
+
+
+def clear_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _breakers_lock
+    _breakers_lock = threading.Lock()
+    for breaker in _breakers.values():
+        breaker._after_fork()
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, service, host, window=20, min_requests=10, failure_rate=0.5,
+                 reset_timeout=30.0, half_open_probes=2):
+        self.service = service
+        self.host = host
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def before(self, url):
+        """
+        Admit a request, or raise CircuitBreakerOpen.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    raise CircuitBreakerOpen(url, self.service, self.host)
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    raise CircuitBreakerOpen(url, self.service, self.host)
+                self._probes += 1
+
+    def cancel(self):
+        """
+        Release an admitted request that ended without an outcome to
+        record, such as one never sent, giving back its half-open probe.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, success, timeout=False):
+        """
+        Record the outcome of an admitted request.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not success:
+                    self._set_state(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._set_state(CLOSED)
+                return
+            self._outcomes.append('timeout' if timeout else ('ok' if success else 'error'))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_requests:
+                failures = sum(1 for o in self._outcomes if o != 'ok')
+                if failures >= self.failure_rate * len(self._outcomes):
+                    self._set_state(OPEN)
+
+    def rates(self):
+        """
+        Return (error rate, timeout rate) over the current window.
+        """
+        with self._lock:
+            count = len(self._outcomes) or 1
+            return (sum(1 for o in self._outcomes if o == 'error') / float(count),
+                    sum(1 for o in self._outcomes if o == 'timeout') / float(count))
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning('circuit for %s at %s: %s -> %s', self.service, self.host, self.state, state)
+        self.state = state
+        self._probes = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.time()
+        elif state == CLOSED:
+            self._outcomes.clear()
@@ -1,8 +1,9 @@
 """
 Contains GWS DAO implementations.
 """
-from resttools.mock.mock_http import MockHTTP
-from resttools.dao_implementation.live import get_con_pool, get_live_url
+from resttools.mock.mock_http import MockHTTP, MockStreamingHTTP
+from resttools import forksafe
+from resttools.dao_implementation.live import LiveDAO
 from resttools.dao_implementation.mock import get_mockdata_url
 
 
@@ -28,8 +29,31 @@ class File(object):
             response = MockHTTP()
             response.data = File._cache_db[url]
             response.status = 200
+        if response.status == 200 and self._not_modified(response, headers):
+            response.status = 304
+            response.data = ''
         return response
 
+    def getStream(self, url, headers):
+        response = self.getURL(url, headers)
+        stream = MockStreamingHTTP()
+        stream.status = response.status
+        stream.headers = response.headers
+        stream.data = response.data
+        return stream
+
+    def _not_modified(self, response, headers):
+        """
+        True if the request's validators match the mock data's
+        ETag or Last-Modified header.
+        """
+        etag = response.getheader('ETag', None)
+        last_modified = response.getheader('Last-Modified', None)
+        if etag and headers.get('If-None-Match') == etag:
+            return True
+        return bool(last_modified and 'If-None-Match' not in headers and
+                    headers.get('If-Modified-Since') == last_modified)
+
     def putURL(self, url, headers, body):
         response = MockHTTP()
 
@@ -53,53 +77,30 @@ class File(object):
         return response
 
 
-class Live(object):
+class Live(LiveDAO):
     """
     This DAO provides real data.  It requires further configuration, (conf)
     """
-    _max_pool_size = 5
+    _service_name = 'gws'
     _socket_timeout = 20.0
 
     def __init__(self, conf):
-        self._conf = conf
-        if 'MAX_POOL_SIZE' in conf:
-            self._max_pool_size = conf['MAX_POOL_SIZE']
+        super(Live, self).__init__(conf)
         if 'SOCKET_TIMEOUT' in conf:
             self._socket_timeout = conf['SOCKET_TIMEOUT']
 
-    pool = None
-
     def getURL(self, url, headers):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
+        return self._request('GET', url, headers)
 
-        return get_live_url(Live.pool, 'GET',
-                            self._conf['HOST'],
-                            url, headers=headers,
-                            service_name='gws')
+    def getStream(self, url, headers):
+        return self._request('GET', url, headers, preload_content=False)
 
     def putURL(self, url, headers, body):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
-
-        return get_live_url(Live.pool, 'PUT',
-                            self._conf['HOST'],
-                            url, headers=headers, body=body,
-                            service_name='gws')
+        return self._request('PUT', url, headers, body=body)
 
     def deleteURL(self, url, headers):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
-
-        return get_live_url(Live.pool, 'DELETE',
-                            self._conf['HOST'],
-                            url, headers=headers,
-                            service_name='gws')
-
-    def _get_pool(self):
-        return get_con_pool(self._conf['HOST'],
-                            self._conf['KEY_FILE'],
-                            self._conf['CERT_FILE'],
-                            self._conf['CA_FILE'],
-                            socket_timeout=self._socket_timeout,
-                            max_pool_size=self._max_pool_size)
+        return self._request('DELETE', url, headers)
+
+
+# a forked worker starts over from the mock files
+forksafe.register(File._cache_db.clear)
@@ -0,0 +1,151 @@
+"""
+Hedged GETs for the live DAOs.
+
+A GET that has not answered within the PERCENTILE latency of recent
+GETs is sent a second time, and whichever response arrives first is
+used; the other is discarded.  Hedges are paid for from a budget that
+earns MAX_RATIO of a hedge per GET, so they add at most that share of
+extra load.  Until MIN_SAMPLES GETs have been timed, DELAY (if set) is
+the hedge delay; with no DELAY, nothing is hedged until then.  The
+delay runs from when the first request starts, not from when it was
+queued for one of the hedger's MAX_WORKERS threads (by default twice the
+pool size, so a primary and a hedge for every connection).
+
+Turn it on in a service conf with 'HEDGE': True, or a dict overriding
+any of the DEFAULTS.  The hedge_requests, hedges and hedge_wins
+counters give the hedge rate and how often the hedge won.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from resttools import deadline, forksafe, metrics, priority
+from resttools.dao_implementation.retry import RetryBudget
+
+DEFAULTS = {
+    'PERCENTILE': 95,
+    'DELAY': None,
+    'MIN_DELAY': 0.005,
+    'MAX_RATIO': 0.05,
+    'MIN_SAMPLES': 20,
+    'WINDOW': 200,
+    'MAX_WORKERS': None,
+}
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(service, host, settings, max_pool_size):
+    """
+    Return the hedger for service at host, or None if settings is falsy.
+    """
+    if not settings:
+        return None
+    key = (service, host)
+    with _hedgers_lock:
+        hedger = _hedgers.get(key)
+        if hedger is None:
+            options = dict(DEFAULTS)
+            if isinstance(settings, dict):
+                options.update(settings)
+            options = dict((k.lower(), v) for k, v in options.items())
+            options['max_workers'] = options['max_workers'] or 2 * max_pool_size
+            hedger = Hedger(service, **options)
+            _hedgers[key] = hedger
+    return hedger
+
+
+def clear_hedgers():
+    with _hedgers_lock:
+        hedgers = list(_hedgers.values())
+        _hedgers.clear()
+    for hedger in hedgers:
+        hedger.close()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _hedgers_lock
+    _hedgers_lock = threading.Lock()
+    for hedger in _hedgers.values():
+        hedger._after_fork()
+
+
+class Hedger(object):
+
+    def __init__(self, service, percentile=95, delay=None, min_delay=0.005, max_ratio=0.05,
+                 min_samples=20, window=200, max_workers=16):
+        self.service = service
+        self.percentile = percentile
+        self.fixed_delay = delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._budget = RetryBudget(ratio=max_ratio, min_tokens=0, max_tokens=max(1, max_ratio * window))
+        self._latencies = deque(maxlen=window)
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def delay(self):
+        """
+        Seconds to wait for the first response before hedging, or None
+        if there is nothing to base it on yet.
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.fixed_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))
+        return max(self.min_delay, samples[index])
+
+    def call(self, send):
+        """
+        Return send(), hedged with a second send() if the first is slow.
+        """
+        metrics.incr('hedge_requests', self.service)
+        self._budget.deposit()
+        send = priority.bind(deadline.bind(send))
+        delay = self.delay()
+        if delay is None:
+            return self._timed(send)
+        running = threading.Event()
+        first = self._executor.submit(self._timed, send, running)
+        # a wait for a worker thread doesn't count toward the delay
+        running.wait()
+        done, pending = wait([first], timeout=delay)
+        if done or not self._budget.withdraw():
+            return first.result()
+
+        metrics.incr('hedges', self.service)
+        second = self._executor.submit(self._timed, send)
+        pending = [first, second]
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        metrics.incr('hedge_wins', self.service)
+                    return future.result()
+        return first.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _after_fork(self):
+        """
+        The parent's worker threads do not exist in the child.
+        """
+        self._lock = threading.Lock()
+        self._budget._after_fork()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+
+    def _timed(self, send, running=None):
+        if running is not None:
+            running.set()
+        started = time.time()
+        response = send()
+        with self._lock:
+            self._latencies.append(time.time() - started)
+        return response
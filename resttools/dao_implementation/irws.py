@@ -4,7 +4,8 @@ Contains IRWS DAO implementations.
 from resttools.mock.mock_http import MockHTTP
 import json
 import re
-from resttools.dao_implementation.live import get_con_pool, get_live_url
+from resttools import forksafe
+from resttools.dao_implementation.live import LiveDAO
 from resttools.dao_implementation.mock import get_mockdata_url
 
 import logging
@@ -97,50 +98,28 @@ class File(object):
         return response
 
 
-class Live(object):
+class Live(LiveDAO):
     """
     This DAO provides real data.  It requires further configuration, (conf)
     """
-    _max_pool_size = 5
+    _service_name = 'irws'
 
     def __init__(self, conf):
-        self._conf = conf
-        if 'MAX_POOL_SIZE' in conf:
-            self._max_pool_size = conf['MAX_POOL_SIZE']
-
-    # class attribute means you can't switch hosts/keys
-    pool = None
+        super(Live, self).__init__(conf)
+        self._verify_https = conf.get('VERIFY_HOST', True)
 
     def getURL(self, url, headers):
-        return get_live_url(self._get_pool(), 'GET',
-                            self._conf['HOST'],
-                            url, headers=headers,
-                            service_name='irws')
+        return self._request('GET', url, headers)
 
     def deleteURL(self, url, headers):
-        return get_live_url(self._get_pool(), 'DELETE',
-                            self._conf['HOST'],
-                            url, headers=headers,
-                            service_name='irws')
+        return self._request('DELETE', url, headers)
 
     def putURL(self, url, headers, body):
-        return get_live_url(self._get_pool(), 'PUT',
-                            self._conf['HOST'],
-                            url, headers=headers, body=body,
-                            service_name='irws')
+        return self._request('PUT', url, headers, body=body)
 
     def postURL(self, url, headers, body):
-        return get_live_url(self._get_pool(), 'POST',
-                            self._conf['HOST'],
-                            url, headers=headers, body=body,
-                            service_name='irws')
-
-    def _get_pool(self):
-        if not Live.pool:
-            Live.pool = get_con_pool(self._conf['HOST'],
-                                     self._conf['KEY_FILE'],
-                                     self._conf['CERT_FILE'],
-                                     self._conf['CA_FILE'],
-                                     max_pool_size=self._max_pool_size,
-                                     verify_https=self._conf.get('VERIFY_HOST', True))
-        return Live.pool
+        return self._request('POST', url, headers, body=body)
+
+
+# a forked worker starts over from the mock files
+forksafe.register(File._cache_db.clear)
@@ -3,9 +3,100 @@ Provides access to the http connection pools and
 connections for live data from a web service
 
 """
+import re
 import ssl
+import threading
+import time
 from six.moves.urllib.parse import urlparse
-from urllib3 import connection_from_url
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, Timeout
+from urllib3.connectionpool import port_by_scheme
+from urllib3.util import parse_url
+from urllib3.util.ssl_ import create_urllib3_context
+from urllib3.exceptions import EmptyPoolError, HTTPError, MaxRetryError, TimeoutError
+
+from resttools import deadline, forksafe, metrics, priority
+from resttools.dao_implementation.adaptive import get_concurrency_limiter
+from resttools.dao_implementation.balancer import get_balancer, host_key, hosts
+from resttools.dao_implementation.circuit import get_breaker
+from resttools.dao_implementation.hedge import get_hedger
+from resttools.dao_implementation.retry import RetryPolicy, record_request
+from resttools.exceptions import CircuitBreakerOpen, DeadlineExceeded, PoolSaturated
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# pools shared by every live DAO, keyed by (host, cert, key, ca, verify)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class _MeteredPool(object):
+    """
+    Records, for the pool's service, how long each request waited for a
+    connection (pool_wait, seconds) and how many connections were in use
+    once it had one (pool_in_use).
+    """
+    service_name = None
+
+    def _get_conn(self, timeout=None):
+        started = time.time()
+        try:
+            return super(_MeteredPool, self)._get_conn(timeout)
+        finally:
+            metrics.observe('pool_wait', self.service_name, time.time() - started)
+            if self.pool is not None:
+                metrics.observe('pool_in_use', self.service_name, self.pool.maxsize - self.pool.qsize(),
+                                buckets=range(self.pool.maxsize + 1))
+
+
+class _MeteredHTTPPool(_MeteredPool, HTTPConnectionPool):
+    pass
+
+
+class _MeteredHTTPSPool(_MeteredPool, HTTPSConnectionPool):
+    pass
+
+
+class _GatedStream(object):
+    """
+    A streamed response that gives back its priority gate slot when its
+    connection is released.
+    """
+
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def release_conn(self):
+        try:
+            self._response.release_conn()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+def make_ssl_context(verify_https=True, min_version='TLSv1.2'):
+    """
+    Return an SSLContext for the live pools: TLS min_version ('TLSv1.2'
+    or 'TLSv1.3') and up, certificate checks as verify_https says.
+
+    Session tickets stay off (urllib3's OP_NO_TICKET): urllib3 never hands
+    an SSLSession to wrap_socket, so a ticket could not be presented on a
+    later connection.  Handshakes are saved instead by keeping pooled
+    connections alive and opening them ahead of time with warm_up().
+    """
+    context = create_urllib3_context(cert_reqs=ssl.CERT_REQUIRED if verify_https else ssl.CERT_NONE)
+    if hasattr(ssl, 'TLSVersion'):
+        context.minimum_version = getattr(ssl.TLSVersion, min_version.replace('.', '_'))
+    else:
+        # Python 2.7 and 3.6 have no TLSVersion: turn the older versions off
+        context.options |= ssl.OP_NO_TLSv1 | ssl.OP_NO_TLSv1_1
+        if min_version == 'TLSv1.3':
+            context.options |= ssl.OP_NO_TLSv1_2
+    return context
 
 
 def get_con_pool(host,
@@ -14,11 +105,17 @@ def get_con_pool(host,
                  ca_file=None,
                  socket_timeout=15.0,
                  max_pool_size=3,
-                 verify_https=True):
+                 verify_https=True,
+                 ssl_context=None,
+                 service_name=None):
     """
     Return a ConnectionPool instance of given host
     :param socket_timeout:
         socket timeout for each connection in seconds
+    :param ssl_context:
+        the SSLContext for https hosts; defaults to make_ssl_context()
+    :param service_name:
+        the service the pool's wait and in-use histograms are kept for
     """
     kwargs = {
         "timeout": socket_timeout,
@@ -31,12 +128,336 @@ def get_con_pool(host,
         kwargs["cert_file"] = cert_file
 
     if urlparse(host).scheme == "https":
-        kwargs["ssl_version"] = ssl.PROTOCOL_TLSv1
+        if ssl_context is None:
+            ssl_context = make_ssl_context(verify_https)
+        kwargs["ssl_context"] = ssl_context
         if verify_https:
             kwargs["cert_reqs"] = "CERT_REQUIRED"
             kwargs["ca_certs"] = ca_file
+        else:
+            kwargs["cert_reqs"] = "CERT_NONE"
+            kwargs["assert_hostname"] = False
+
+    url = parse_url(host)
+    if url.scheme == "https":
+        pool = _MeteredHTTPSPool(url.host, port=url.port or port_by_scheme["https"], **kwargs)
+    else:
+        pool = _MeteredHTTPPool(url.host, port=url.port or port_by_scheme["http"], **kwargs)
+    pool.service_name = service_name
+    return pool
+
+
+def pool_key(host, key_file=None, cert_file=None, ca_file=None,
+             verify_https=True):
+    """
+    Return the registry key for a pool: one pool per host and client identity.
+    """
+    return (host, cert_file, key_file, ca_file, bool(verify_https))
 
-    return connection_from_url(host, **kwargs)
+
+def get_pool(host,
+             key_file=None,
+             cert_file=None,
+             ca_file=None,
+             socket_timeout=15.0,
+             max_pool_size=3,
+             verify_https=True,
+             ssl_context=None,
+             service_name=None):
+    """
+    Return the shared ConnectionPool for the host and client identity,
+    creating it on first use.  Each pool is built exactly once, even when
+    several threads ask for it at the same time.  The pool size, timeout,
+    SSL context and metrics service of the first caller win.  A forked
+    child never gets a pool of its parent's (see resttools.forksafe).
+    ssl_context may be a function returning the context, called only
+    when the pool is built.
+    """
+    forksafe.check()
+    key = pool_key(host, key_file, cert_file, ca_file, verify_https)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                if callable(ssl_context):
+                    ssl_context = ssl_context()
+                pool = get_con_pool(host, key_file, cert_file, ca_file,
+                                    socket_timeout=socket_timeout,
+                                    max_pool_size=max_pool_size,
+                                    verify_https=verify_https,
+                                    ssl_context=ssl_context,
+                                    service_name=service_name)
+                _pools[key] = pool
+    return pool
+
+
+def get_pools():
+    """
+    Return a copy of the pool registry, {pool_key: ConnectionPool}.
+    """
+    with _pools_lock:
+        return dict(_pools)
+
+
+def clear_pools():
+    """
+    Close and forget every registered pool.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@forksafe.register
+def _reset_pools():
+    """
+    Forget the pools inherited from the parent: their connections are
+    the parent's, and must not be shared with it.
+    """
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    _pools.clear()
+
+
+class LiveDAO(object):
+    """
+    Common base of the live DAO implementations.  Subclasses set
+    _service_name and override the pool settings as needed; the
+    connection pool comes from the shared registry, so DAOs configured
+    for different hosts or certificates get different pools.
+
+    Timeouts default to the socket timeout, and can be set in conf with
+    CONNECT_TIMEOUT and READ_TIMEOUT, and per endpoint with TIMEOUTS, a
+    list of (url regex, connect, read) tried in order.  CIRCUIT_BREAKER
+    turns on the service's breaker (see circuit.py), and the RETRY_*
+    settings shape the retry policy (see retry.py).
+
+    With COMPRESSION on, requests accept gzip and deflate; bodies are
+    decompressed before the service decoders see them, and the wire and
+    decoded sizes of preloaded bodies are counted per service as the
+    bytes_wire and bytes_body metrics.
+
+    https pools use SSL_CONTEXT if given, else a context for
+    TLS_MIN_VERSION ('TLSv1.2' by default, or 'TLSv1.3').  warm_up()
+    opens the pool's connections ahead of the first requests, and
+    probe() times a handshake and a request on a fresh connection.
+
+    A request waits at most POOL_TIMEOUT seconds (default: no limit)
+    for a free connection, then raises PoolSaturated; the wait and the
+    connections in use are kept as the pool_wait and pool_in_use
+    histograms.
+
+    HOST may be a list of replicas, each with its own pool and breaker;
+    requests are spread over them by a Balancer (see balancer.py).  A
+    request that fails to reach a host is sent to the next one when it
+    may safely be sent again.
+
+    HEDGE turns on hedged GETs (see hedge.py), ADAPTIVE_CONCURRENCY
+    an adaptive limit on the requests in flight (see adaptive.py), and
+    PRIORITY_ADMISSION hands out the pool's connections by request
+    priority (see resttools.priority).
+    """
+    _service_name = None
+    _max_pool_size = 5
+    _socket_timeout = 15.0
+    _verify_https = True
+
+    def __init__(self, conf):
+        self._conf = conf
+        if 'MAX_POOL_SIZE' in conf:
+            self._max_pool_size = conf['MAX_POOL_SIZE']
+        self._timeouts = [(re.compile(pattern), Timeout(connect=connect, read=read))
+                          for pattern, connect, read in conf.get('TIMEOUTS', ())]
+        self._retry_policy = RetryPolicy.from_conf(conf)
+        self._hosts = hosts(conf)
+        self._balancer = get_balancer(self._service_name, conf)
+        self._hedger = get_hedger(self._service_name, host_key(conf), conf.get('HEDGE'), self._max_pool_size)
+        self._limiter = get_concurrency_limiter(self._service_name, host_key(conf),
+                                                conf.get('ADAPTIVE_CONCURRENCY'), self._max_pool_size)
+        self._gate = priority.get_gate(self._service_name, host_key(conf),
+                                       conf.get('PRIORITY_ADMISSION'), self._max_pool_size)
+
+    def concurrency_limit(self):
+        """
+        The adaptive limit on requests in flight, or None if not enabled.
+        """
+        return self._limiter.limit if self._limiter is not None else None
+
+    def _get_pool(self, host=None):
+        host = host or self._hosts[0]
+        return get_pool(host,
+                        self._conf.get('KEY_FILE'),
+                        self._conf.get('CERT_FILE'),
+                        self._conf.get('CA_FILE'),
+                        socket_timeout=self._socket_timeout,
+                        max_pool_size=self._max_pool_size,
+                        verify_https=self._verify_https,
+                        ssl_context=lambda: self._get_ssl_context(host),
+                        service_name=self._service_name)
+
+    def _get_ssl_context(self, host):
+        if self._conf.get('SSL_CONTEXT') is not None:
+            return self._conf['SSL_CONTEXT']
+        if urlparse(host).scheme != 'https':
+            return None
+        return make_ssl_context(self._verify_https, self._conf.get('TLS_MIN_VERSION', 'TLSv1.2'))
+
+    def warm_up(self, connections=None):
+        """
+        Open up to connections (default: the pool size) connections per
+        host, handshakes included, and leave them idle in the pools.
+        Returns the number opened.
+        """
+        return sum(self._warm_pool(self._get_pool(host), connections) for host in self._hosts)
+
+    def _warm_pool(self, pool, connections):
+        connections = min(connections or self._max_pool_size, pool.pool.maxsize)
+        opened = []
+        try:
+            for i in range(connections):
+                conn = pool._get_conn(timeout=0)
+                opened.append(conn)
+                if conn.sock is None:
+                    conn.connect()
+        except EmptyPoolError:
+            pass
+        finally:
+            for conn in opened:
+                pool._put_conn(conn)
+        return len(opened)
+
+    def probe(self, url='/', host=None):
+        """
+        GET url on a new connection to host (default: the first host),
+        outside the pool.  Returns a dict of the status and the seconds
+        spent connecting (TCP and TLS handshake) and on the request itself.
+        """
+        pool = self._get_pool(host)
+        conn = pool._new_conn()
+        try:
+            started = time.time()
+            conn.connect()
+            connected = time.time()
+            conn.request('GET', url)
+            response = conn.getresponse()
+            response.read()
+            done = time.time()
+        finally:
+            conn.close()
+        return {'status': response.status,
+                'connect': connected - started,
+                'request': done - connected}
+
+    def _get_timeout(self, url):
+        for pattern, timeout in self._timeouts:
+            if pattern.search(url):
+                return timeout
+        return Timeout(connect=self._conf.get('CONNECT_TIMEOUT', self._socket_timeout),
+                       read=self._conf.get('READ_TIMEOUT', self._socket_timeout))
+
+    def _request(self, method, url, headers, body=None, preload_content=True):
+        compression = self._conf.get('COMPRESSION', False)
+        if compression:
+            headers = dict(headers or {}, **{'Accept-Encoding': ACCEPT_ENCODING})
+        if self._balancer is None:
+            def send():
+                return self._send(self._hosts[0], method, url, headers, body, preload_content)
+        else:
+            def send():
+                return self._send_balanced(method, url, headers, body, preload_content)
+        if self._gate is not None:
+            send = self._admitted(send, url, preload_content)
+        if self._limiter is not None:
+            send = self._limited(send, url)
+        if self._hedger is not None and method == 'GET' and preload_content:
+            response = self._hedger.call(send)
+        else:
+            response = send()
+        if compression and preload_content:
+            metrics.incr('bytes_wire', self._service_name, response.tell())
+            metrics.incr('bytes_body', self._service_name, len(response.data))
+        return response
+
+    def _admitted(self, send, url, preload_content=True):
+        """
+        Wrap send to hold a pool slot from the priority gate, until a
+        stream's connection is released if preload_content is False.
+        """
+        def admitted():
+            self._gate.acquire(url)
+            try:
+                response = send()
+            except BaseException:
+                self._gate.release()
+                raise
+            if preload_content:
+                self._gate.release()
+                return response
+            return _GatedStream(response, self._gate.release)
+        return admitted
+
+    def _limited(self, send, url):
+        """
+        Wrap send to hold a slot under the adaptive concurrency limit.
+        """
+        def limited():
+            self._limiter.acquire(url)
+            started = time.time()
+            success = None
+            try:
+                response = send()
+                success = response.status < 500
+                return response
+            except MaxRetryError:
+                success = False
+                raise
+            finally:
+                self._limiter.release(time.time() - started, success)
+        return limited
+
+    def _send(self, host, method, url, headers, body, preload_content):
+        return get_live_url(self._get_pool(host), method,
+                            host,
+                            url, headers=headers, body=body,
+                            preload_content=preload_content,
+                            pool_timeout=self._conf.get('POOL_TIMEOUT'),
+                            retries=self._retry_policy,
+                            service_name=self._service_name,
+                            timeout=self._get_timeout(url),
+                            breaker=get_breaker(self._service_name, host,
+                                                self._conf.get('CIRCUIT_BREAKER')))
+
+    def _send_balanced(self, method, url, headers, body, preload_content):
+        tried = []
+        while True:
+            host = self._balancer.choose(exclude=tried)
+            tried.append(host)
+            started = time.time()
+            success = False
+            try:
+                response = self._send(host, method, url, headers, body, preload_content)
+                success = response.status < 500
+            except (MaxRetryError, CircuitBreakerOpen, PoolSaturated) as ex:
+                if len(tried) == len(self._hosts) or not self._can_fail_over(method, ex):
+                    raise
+                metrics.incr('failovers', self._service_name)
+                continue
+            finally:
+                # on any exit, DeadlineExceeded included
+                self._balancer.finish(host, success, time.time() - started)
+            return response
+
+    def _can_fail_over(self, method, ex):
+        """
+        True if the request failing with ex may be sent to another host:
+        it never left this one, or it is safe to send twice.
+        """
+        if isinstance(ex, (CircuitBreakerOpen, PoolSaturated)):
+            return True
+        return self._retry_policy.retry_error(method, ex.reason)
 
 
 def get_live_url(con_pool,
@@ -46,7 +467,11 @@ def get_live_url(con_pool,
                  headers,
                  retries=3,
                  body=None,
-                 service_name=None):
+                 service_name=None,
+                 timeout=None,
+                 breaker=None,
+                 preload_content=True,
+                 pool_timeout=None):
     """
     Return a connection from the pool and perform an HTTP request.
     :param con_pool:
@@ -57,9 +482,98 @@ def get_live_url(con_pool,
         the url of the server host.
     :param headers:
         headers to include with the request
+    :param retries:
+        a RetryPolicy, or the number of retries for idempotent requests
     :param body:
         the POST, PUT body of the request
+    :param timeout:
+        a urllib3 Timeout, or seconds; defaults to the pool's timeout
+    :param breaker:
+        the CircuitBreaker guarding the host, if any
+    :param preload_content:
+        if False, the body is left unread for the caller to read()
+        incrementally, and the caller must release_conn() when done
+    :param pool_timeout:
+        seconds to wait for a free connection before raising
+        PoolSaturated; None waits as long as it takes
+
+    Under a resttools.deadline.Deadline, the timeouts, pool wait and
+    retry backoff are cut to the time left, and DeadlineExceeded is
+    raised once it is spent.
+    """
+    if timeout is None:
+        timeout = con_pool.timeout
+    policy = retries if isinstance(retries, RetryPolicy) else RetryPolicy(retries)
+    record_request()
+    attempt = 0
+    while True:
+        left = deadline.check(url)
+        if breaker is not None:
+            breaker.before(url)
+        try:
+            response = con_pool.urlopen(method, url, body=body, headers=headers, retries=False,
+                                        timeout=_within(timeout, left),
+                                        preload_content=preload_content,
+                                        pool_timeout=_within(pool_timeout, left))
+        except EmptyPoolError:
+            # never sent, so nothing for the breaker to record
+            if breaker is not None:
+                breaker.cancel()
+            deadline.check(url)
+            metrics.incr('pool_saturated', service_name)
+            raise PoolSaturated(url, service_name, pool_timeout)
+        except HTTPError as ex:
+            left = deadline.remaining()
+            if isinstance(ex, TimeoutError) and left is not None and left <= 0:
+                # cut short by the deadline, not the host's fault
+                if breaker is not None:
+                    breaker.cancel()
+                raise DeadlineExceeded(url)
+            if breaker is not None:
+                breaker.record(False, timeout=isinstance(ex, TimeoutError))
+            if (attempt < policy.retries_for(method) and policy.retry_error(method, ex) and
+                    policy.allow(service_name)):
+                attempt += 1
+                _backoff(policy.delay(attempt), url)
+                continue
+            raise MaxRetryError(con_pool, url, reason=ex)
+        except BaseException:
+            if breaker is not None:
+                breaker.cancel()
+            raise
+        if breaker is not None:
+            breaker.record(response.status < 500)
+        if (attempt < policy.retries_for(method) and policy.retry_status(method, response.status) and
+                policy.allow(service_name)):
+            attempt += 1
+            if not preload_content:
+                response.drain_conn()
+                response.release_conn()
+            _backoff(policy.delay(attempt, response), url)
+            continue
+        return response
+
+
+def _within(timeout, left):
+    """
+    Return timeout (seconds or a urllib3 Timeout) cut to left seconds.
+    """
+    if left is None:
+        return timeout
+    left = max(left, 0.001)
+    if isinstance(timeout, Timeout):
+        return Timeout(connect=_within(timeout.connect_timeout, left),
+                       read=_within(timeout.read_timeout, left))
+    if isinstance(timeout, (int, float)):
+        return min(timeout, left)
+    return left
+
+
+def _backoff(seconds, url):
+    """
+    Sleep before a retry, unless the deadline would pass first.
     """
-    timeout = con_pool.timeout
-    response = con_pool.urlopen(method, url, body=body, headers=headers, retries=retries, timeout=timeout)
-    return response
+    left = deadline.remaining()
+    if left is not None and seconds >= left:
+        raise DeadlineExceeded(url)
+    time.sleep(seconds)
@@ -83,13 +83,13 @@ def _load_resource_from_path(app_root, service_name, conf, url, headers):
             file_values = json.loads(data)
 
             if "headers" in file_values:
-                response.headers = dict(response.headers.items() + file_values['headers'].items())
+                response.headers = dict(response.headers, **file_values['headers'])
 
             if 'status' in file_values:
                 response.status = file_values['status']
 
             else:
-                response.headers = dict(response.headers.items() + file_values.items())
+                response.headers = dict(response.headers, **file_values)
 
         except IOError:
             pass
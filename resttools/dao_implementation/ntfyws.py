@@ -4,7 +4,7 @@ Contains Notify WS  DAO implementations.
 
 from resttools.mock.mock_http import MockHTTP
 import re
-from resttools.dao_implementation.live import get_con_pool, get_live_url
+from resttools.dao_implementation.live import LiveDAO
 from resttools.dao_implementation.mock import get_mockdata_url
 
 import logging
@@ -34,31 +34,16 @@ class File(object):
         return response
 
 
-class Live(object):
+class Live(LiveDAO):
     """
     This DAO provides real data.  It requires further configuration, (conf)
     """
-    _max_pool_size = 5
+    _verify_https = False
 
     def __init__(self, conf):
-        self._conf = conf
-        if 'MAX_POOL_SIZE' in conf:
-            self._max_pool_size = conf['MAX_POOL_SIZE']
-
-    pool = None
+        # before LiveDAO keys its balancer, hedger and limits by service
+        self._service_name = conf['SERVICE_NAME']
+        super(Live, self).__init__(conf)
 
     def postURL(self, url, headers, body):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
-
-        return get_live_url(Live.pool, 'POST',
-                            self._conf['HOST'],
-                            url, headers=headers, body=body,
-                            service_name=self._conf['SERVICE_NAME'])
-
-    def _get_pool(self):
-        return get_con_pool(self._conf['HOST'],
-                            self._conf['KEY_FILE'],
-                            self._conf['CERT_FILE'],
-                            self._conf['CA_FILE'],
-                            max_pool_size=self._max_pool_size, verify_https=False)
+        return self._request('POST', url, headers, body=body)
@@ -4,7 +4,8 @@ Contains NWS DAO implementations.
 
 from resttools.mock.mock_http import MockHTTP
 import re
-from resttools.dao_implementation.live import get_con_pool, get_live_url
+from resttools import forksafe
+from resttools.dao_implementation.live import LiveDAO
 from resttools.dao_implementation.mock import get_mockdata_url
 
 import logging
@@ -50,40 +51,19 @@ class File(object):
         return response
 
 
-class Live(object):
+class Live(LiveDAO):
     """
     This DAO provides real data.  It requires further configuration, (conf)
     """
-    _max_pool_size = 5
-
-    def __init__(self, conf):
-        self._conf = conf
-        if 'MAX_POOL_SIZE' in conf:
-            self._max_pool_size = conf['MAX_POOL_SIZE']
-
-    pool = None
+    _service_name = 'nws'
+    _verify_https = False
 
     def getURL(self, url, headers):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
-
-        return get_live_url(Live.pool, 'GET',
-                            self._conf['HOST'],
-                            url, headers=headers,
-                            service_name='nws')
+        return self._request('GET', url, headers)
 
     def postURL(self, url, headers, body):
-        if Live.pool is None:
-            Live.pool = self._get_pool()
-
-        return get_live_url(Live.pool, 'POST',
-                            self._conf['HOST'],
-                            url, headers=headers, body=body,
-                            service_name='nws')
-
-    def _get_pool(self):
-        return get_con_pool(self._conf['HOST'],
-                            self._conf['KEY_FILE'],
-                            self._conf['CERT_FILE'],
-                            self._conf['CA_FILE'],
-                            max_pool_size=self._max_pool_size, verify_https=False)
+        return self._request('POST', url, headers, body=body)
+
+
+# a forked worker starts over from the mock files
+forksafe.register(File._cache_db.clear)
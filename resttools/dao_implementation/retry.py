@@ -0,0 +1,156 @@
+"""
+Retry policy for the live DAOs.
+
+Idempotent requests (GET, HEAD, PUT, DELETE, OPTIONS) are retried on
+connection errors, timeouts and the RETRY_STATUSES, after a jittered
+exponential backoff or the server's Retry-After, whichever is longer.
+A POST is only retried when the connection could not be made, so its
+body has not been sent.
+
+Service conf:
+    'RETRIES': 3, or per method {'GET': 3, 'PUT': 1, 'POST': 0}
+    'RETRY_BACKOFF': 0.1        first backoff, doubled each retry
+    'RETRY_BACKOFF_MAX': 5.0    longest backoff
+    'RETRY_STATUSES': (429, 502, 503, 504)
+    'RETRY_AFTER_MAX': 30.0     longest Retry-After honored
+
+All services draw on one per-process RetryBudget, so retries cannot
+multiply the load on an upstream that is already failing.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from resttools import forksafe, metrics
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+DEFAULT_RETRIES = 3
+DEFAULT_STATUSES = (429, 502, 503, 504)
+
+
+class RetryBudget(object):
+    """
+    Every request earns ratio of a retry token, and each retry spends
+    one; min_tokens are there from the start and max_tokens is the most
+    that can be saved up.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+
+budget = RetryBudget()
+
+
+@forksafe.register
+def _reset_after_fork():
+    budget._after_fork()
+
+
+def record_request():
+    """
+    Earn the retry budget's share for a request about to be sent.
+    """
+    budget.deposit()
+
+
+def configure_budget(ratio=0.2, min_tokens=10, max_tokens=100):
+    """
+    Replace the per-process retry budget.
+    """
+    global budget
+    budget = RetryBudget(ratio=ratio, min_tokens=min_tokens, max_tokens=max_tokens)
+
+
+class RetryPolicy(object):
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=0.1, backoff_max=5.0,
+                 statuses=DEFAULT_STATUSES, retry_after_max=30.0):
+        if isinstance(retries, dict):
+            self._retries = dict((m.upper(), n) for m, n in retries.items())
+            self._default = self._retries.get('DEFAULT', DEFAULT_RETRIES)
+        else:
+            self._retries = {}
+            self._default = retries or 0
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.statuses = frozenset(statuses)
+        self.retry_after_max = retry_after_max
+
+    @classmethod
+    def from_conf(cls, conf):
+        return cls(retries=conf.get('RETRIES', DEFAULT_RETRIES),
+                   backoff=conf.get('RETRY_BACKOFF', 0.1),
+                   backoff_max=conf.get('RETRY_BACKOFF_MAX', 5.0),
+                   statuses=conf.get('RETRY_STATUSES', DEFAULT_STATUSES),
+                   retry_after_max=conf.get('RETRY_AFTER_MAX', 30.0))
+
+    def retries_for(self, method):
+        return self._retries.get(method.upper(), self._default)
+
+    def retry_error(self, method, error):
+        """
+        True if the request may be sent again after error.
+        """
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        reason = getattr(error, 'reason', error)
+        return isinstance(reason, (ConnectTimeoutError, NewConnectionError))
+
+    def retry_status(self, method, status):
+        return method.upper() in IDEMPOTENT_METHODS and status in self.statuses
+
+    def delay(self, retry, response=None):
+        """
+        Seconds to wait before the retry'th retry (1-based).
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * (2 ** (retry - 1))))
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_after_max))
+        return delay
+
+    def allow(self, service):
+        """
+        Take a retry from the process budget, counting the outcome.
+        """
+        if budget.withdraw():
+            metrics.incr('retries', service)
+            return True
+        metrics.incr('retries_denied', service)
+        return False
+
+
+def _retry_after(response):
+    if response is None:
+        return None
+    value = (response.headers or {}).get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, mktime_tz(date) - time.time())
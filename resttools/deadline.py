@@ -0,0 +1,87 @@
+"""
+Deadlines covering several upstream requests.
+
+    with Deadline(2.0):
+        irws.verify_sc_pin(netid, pin)
+
+Every request made inside the block, by this thread or by the thread
+pools the DAOs use on its behalf, gets at most the time left: live
+timeouts, pool waits and retry backoffs are cut to it, and once it has
+passed requests raise DeadlineExceeded instead of being sent.  Nested
+deadlines can only shorten the one around them.
+"""
+import threading
+import time
+
+from resttools.exceptions import DeadlineExceeded
+
+_local = threading.local()
+
+
+class Deadline(object):
+    """
+    Context manager setting a deadline seconds from now; None sets none.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = expires()
+        if self.seconds is not None:
+            deadline = time.time() + self.seconds
+            if self._outer is not None:
+                deadline = min(deadline, self._outer)
+            _local.expires = deadline
+        return self
+
+    def __exit__(self, *args):
+        _local.expires = self._outer
+
+
+def expires():
+    """
+    Return the time the current deadline passes, or None.
+    """
+    return getattr(_local, 'expires', None)
+
+
+def remaining():
+    """
+    Return the seconds left before the current deadline, or None.
+    """
+    deadline = expires()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check(url):
+    """
+    Raise DeadlineExceeded for url if the current deadline has passed.
+    Returns the seconds left, or None.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(url)
+    return left
+
+
+def bind(func):
+    """
+    Return func wrapped to run under the caller's deadline, for handing
+    to another thread.
+    """
+    deadline = expires()
+    if deadline is None:
+        return func
+
+    def bound(*args, **kwargs):
+        outer = expires()
+        _local.expires = deadline
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.expires = outer
+    return bound
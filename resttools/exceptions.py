@@ -103,3 +103,55 @@ class DataFailureException(Exception):
     def __str__(self):
         return ("Error fetching %s.  Status code: %s.  Message: %s." %
                 (self.url, self.status, self.msg))
+
+
+class CircuitBreakerOpen(DataFailureException):
+    """
+    The circuit breaker for the service's host is open: recent requests
+    failed or timed out too often, so this one was not sent.
+    """
+    def __init__(self, url, service, host):
+        super(CircuitBreakerOpen, self).__init__(url, 503, 'circuit open for %s at %s' % (service, host))
+        self.service = service
+        self.host = host
+
+
+class PoolSaturated(DataFailureException):
+    """
+    Every connection to the service's host stayed busy for the whole
+    pool timeout, so the request was shed without being sent.
+    """
+    def __init__(self, url, service, wait):
+        super(PoolSaturated, self).__init__(url, 503, 'no %s connection free within %ss' % (service, wait))
+        self.service = service
+        self.wait = wait
+
+
+class RateLimited(DataFailureException):
+    """
+    The service's rate limit would have held the request longer than
+    allowed, so it was not sent.
+    """
+    def __init__(self, url, service):
+        super(RateLimited, self).__init__(url, 429, '%s rate limit reached' % service)
+        self.service = service
+
+
+class DeadlineExceeded(DataFailureException):
+    """
+    The deadline covering the request (see resttools.deadline) passed
+    before it could be answered.
+    """
+    def __init__(self, url):
+        super(DeadlineExceeded, self).__init__(url, 504, 'deadline exceeded')
+
+
+class ConcurrencyLimited(DataFailureException):
+    """
+    The service's adaptive concurrency limit stayed reached for the
+    whole queue timeout, so the request was shed without being sent.
+    """
+    def __init__(self, url, service, limit):
+        super(ConcurrencyLimited, self).__init__(url, 503, '%s concurrency limit of %d reached' % (service, limit))
+        self.service = service
+        self.limit = limit
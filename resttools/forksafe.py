@@ -0,0 +1,43 @@
+"""
+Keeps the process-wide state of the clients private to each process.
+
+A child forked from a process that has used the clients (a pre-fork
+server with the app preloaded, say) inherits its connection pools,
+locks possibly held by threads that did not survive the fork, and
+caches.  Modules holding such state register a reset with
+register(); the resets run in the child right after os.fork() where
+os.register_at_fork exists, and otherwise the first time check() sees
+a new process id.  The pool registry calls check() on every lookup, and
+the service DAOs on every request, File mode included.
+"""
+import os
+
+_pid = os.getpid()
+_resets = []
+
+
+def register(reset):
+    """
+    Run reset() in each child process, before it uses the clients.
+    """
+    _resets.append(reset)
+    return reset
+
+
+def check():
+    """
+    Run the resets if this is a new process that has not yet run them.
+    """
+    if os.getpid() != _pid:
+        _after_fork()
+
+
+def _after_fork():
+    global _pid
+    _pid = os.getpid()
+    for reset in _resets:
+        reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
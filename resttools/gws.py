@@ -2,32 +2,39 @@
 This is the interface for interacting with the Group Web Service.
 """
 from resttools.dao import GWS_DAO
+from resttools.cache import get_validator_store
+from resttools import gws_backend, metrics
 from resttools.exceptions import InvalidGroupID
 from resttools.exceptions import DataFailureException
-from resttools.models.gws import Group, CourseGroup, GroupReference
-from resttools.models.gws import GroupUser, GroupMember
-from six.moves.urllib.parse import urlencode
-from lxml import etree
+from resttools.models.gws import GroupMember, MemberList
+from six.moves.urllib.parse import quote, urlencode
 import re
-from jinja2 import Environment, PackageLoader
+import copy
 
 import logging
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_URL_LENGTH = 2000
+
 
 class GWS(object):
     """
-    The GWS object has methods for getting group information.
+    The GWS object has methods for getting group information.  The API
+    is spoken in the encoding of conf['API_VERSION'], 'v2' (XML, the
+    default) or 'v3' (JSON); see resttools.gws_backend.
     """
-    def __init__(self, conf, actas=None):
+    def __init__(self, conf, actas=None, priority=None):
         self._service_name = 'gws'
         self._conf = conf
-        self._j2env = Environment(loader=PackageLoader('resttools',
-                                                       'templates/gws'))
+        self._backend = gws_backend.get_backend(conf.get('API_VERSION', 'v2'))
+        self._root = '/group_sws/%s' % self._backend.version
         self._actas = actas
-        self.dao = GWS_DAO(conf)
+        self.dao = GWS_DAO(conf, priority=priority)
+        self._validators = get_validator_store(self._service_name, conf, actas)
+
+    QTRS = gws_backend.QTRS
 
-    QTRS = {'win': 'winter', 'spr': 'spring', 'sum': 'summer', 'aut': 'autumn'}
+    MEMBER_ID_PREFIXES = {GroupMember.GROUP_TYPE: 'g:', GroupMember.DNS_TYPE: 'd:'}
 
     def search_groups(self, **kwargs):
         """
@@ -51,6 +58,15 @@ class GWS(object):
                 Values are 'one' to limit results to one level of stem name
                 and 'all' to return all groups.
         """
+        url = self._search_url(**kwargs)
+        response = self.dao.getURL(url, self._headers({"Accept": self._backend.content_type}))
+
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+
+        return self._backend.decode_groups(response.data)
+
+    def _search_url(self, **kwargs):
         kwargs = dict((k.lower(), v.lower()) for k, v in kwargs.items())
         if 'type' in kwargs and (kwargs['type'] != 'direct' and
                                  kwargs['type'] != 'effective'):
@@ -63,24 +79,7 @@ class GWS(object):
         if "instructor" in kwargs or "student" in kwargs:
             kwargs["stem"] = "course"
 
-        url = "/group_sws/v2/search?" + urlencode(kwargs)
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        groups = []
-        root = etree.fromstring(response.data)
-        e_grs_list = root.find('groupreferences').findall('groupreference')
-        for e in e_grs_list:
-            group = GroupReference()
-            group.uwregid = e.find('regid').text
-            group.title = e.find('title').text
-            group.description = e.find('description').text
-            group.name = e.find('name').text
-            groups.append(group)
-
-        return groups
+        return "%s/search?%s" % (self._root, urlencode(kwargs))
 
     def get_group_by_id(self, group_id):
         """
@@ -90,46 +89,42 @@ class GWS(object):
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        url = "/group_sws/v2/group/%s" % group_id
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._group_from_xml(response.data)
+        url = "%s/group/%s" % (self._root, group_id)
+        return self._get_revalidated(url, self._backend.decode_group)
 
     def create_group(self, group):
         """
         Creates a group from the passed resttools.Group object.
         """
-        body = self._xml_from_group(group)
+        body = self._backend.encode_group(group)
 
-        url = "/group_sws/v2/group/%s" % group.name
+        url = "%s/group/%s" % (self._root, group.name)
         response = self.dao.putURL(
-            url, self._headers({"Accept": "text/xml", "Content-Type": "text/xml"}),
+            url, self._headers({"Accept": self._backend.content_type,
+                                "Content-Type": self._backend.content_type}),
             body)
 
         if response.status != 201:
             raise DataFailureException(url, response.status, response.data)
 
-        return self._group_from_xml(response.data)
+        return self._backend.decode_group(response.data)
 
     def put_group(self, group):
         """
         Updates a group from the passed resttools.Group object.
         """
-        body = self._xml_from_group(group)
+        body = self._backend.encode_group(group)
 
-        url = "/group_sws/v2/group/%s" % group.name
+        url = "%s/group/%s" % (self._root, group.name)
         response = self.dao.putURL(
-            url, self._headers({"Accept": "text/xml",
-                                "Content-Type": "text/xml", "If-Match": "*"}),
+            url, self._headers({"Accept": self._backend.content_type,
+                                "Content-Type": self._backend.content_type, "If-Match": "*"}),
             body)
 
         if response.status != 200:
             raise DataFailureException(url, response.status, response.data)
 
-        return self._group_from_xml(response.data)
+        return self._backend.decode_group(response.data)
 
     def delete_group(self, group_id):
         """
@@ -138,7 +133,7 @@ class GWS(object):
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        url = "/group_sws/v2/group/%s" % group_id
+        url = "%s/group/%s" % (self._root, group_id)
         response = self.dao.deleteURL(url, self._headers({}))
 
         if response.status != 200:
@@ -148,19 +143,14 @@ class GWS(object):
 
     def get_members(self, group_id):
         """
-        Returns a list of resttools.GroupMember objects for the group
-        identified by the passed group ID.
+        Returns a MemberList (see resttools.models.gws) of the members of
+        the group identified by the passed group ID.
         """
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        url = "/group_sws/v2/group/%s/member" % group_id
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._members_from_xml(response.data)
+        url = "%s/group/%s/member" % (self._root, group_id)
+        return self._get_revalidated(url, self._backend.decode_members)
 
     def put_membership(self, group_id, members):
         """
@@ -171,23 +161,77 @@ class GWS(object):
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        body = self._xml_from_members(group_id, members)
+        body = self._backend.encode_members(group_id, members)
+        return self._put_membership_body(group_id, body)
 
-        url = "/group_sws/v2/group/%s/member" % group_id
+    def _put_membership_body(self, group_id, body):
+        url = "%s/group/%s/member" % (self._root, group_id)
         response = self.dao.putURL(
-            url, self._headers({"Content-Type": "text/xml", "If-Match": "*"}),
+            url, self._headers({"Content-Type": self._backend.content_type, "If-Match": "*"}),
             body)
 
         if response.status != 200:
             raise DataFailureException(url, response.status, response.data)
 
-        return self._notfoundmembers_from_xml(response.data)
+        return self._backend.decode_notfound(response.data)
+
+    def sync_membership(self, group_id, desired, threshold=None):
+        """
+        Makes the membership of the group represented by the passed group
+        id the desired members (GroupMembers, or uwnetids), sending only
+        the changes: the members to add and to remove are found by a merge
+        of the sorted current and desired members, and sent with
+        put_members and delete_members.  When there are more changes than
+        threshold (default: conf['SYNC_THRESHOLD'], else half the desired
+        members), the whole membership is sent with put_membership instead.
+
+        Returns a dict: 'added' and 'removed', MemberLists of the changes;
+        'notfound', the members GWS did not know; 'full', True if
+        put_membership was used; and 'bytes_sent', the size of the URLs
+        and bodies sent.
+        """
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
+
+        desired = _member_list(desired)
+        summary = self._sync_plan(self.get_members(group_id), desired, threshold)
+        if summary['full']:
+            body = self._backend.encode_members(group_id, desired)
+            summary['notfound'] = self._put_membership_body(group_id, body)
+            summary['bytes_sent'] = len(self._members_url(group_id)) + len(body.encode('utf-8'))
+            return summary
+
+        if summary['added']:
+            ids = [self._member_id(member) for member in summary['added']]
+            summary['notfound'] = self.put_members(group_id, ids)
+            summary['bytes_sent'] += sum(len(url) for url in self._members_urls(group_id, ids))
+        if summary['removed']:
+            ids = [self._member_id(member) for member in summary['removed']]
+            self.delete_members(group_id, ids)
+            summary['bytes_sent'] += sum(len(url) for url in self._members_urls(group_id, ids))
+        return summary
+
+    def _sync_plan(self, current, desired, threshold):
+        """
+        The summary of a sync_membership before anything is sent.
+        """
+        added = desired - current
+        removed = current - desired
+        if threshold is None:
+            threshold = self._conf.get('SYNC_THRESHOLD', len(desired) // 2)
+        return {'added': added, 'removed': removed, 'notfound': [], 'bytes_sent': 0,
+                'full': len(added) + len(removed) > threshold}
 
     def put_members(self, group_id, members):
         """
         Puts members into the group represented by the passed group id.
         Members is a list of string. (could be prefaced, e.g. 'u:user_id')
         Returns a list of members not found.
+
+        The members go in the URL, so long lists are split into requests
+        whose URLs fit in conf['MAX_URL_LENGTH'] (default 2000) bytes,
+        sent at once up to the pool size.  Each is safe to repeat, so a
+        call that failed part way may simply be made again.
         """
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
@@ -195,21 +239,21 @@ class GWS(object):
         if len(members) == 0:
             return []
 
-        url = "/group_sws/v2/group/%s/member/%s" % (group_id, ','.join(members))
-        response = self.dao.putURL(
-            url, self._headers({"Content-Type": "text/xml", "If-Match": "*"}),
+        urls = self._members_urls(group_id, members)
+        responses = self.dao.putURLs(
+            urls, self._headers({"Content-Type": self._backend.content_type, "If-Match": "*"}),
             None)
 
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._notfoundmembers_from_xml(response.data)
+        notfound = []
+        for response in _checked(urls, responses):
+            notfound.extend(self._backend.decode_notfound(response.data))
+        return notfound
 
     def delete_members(self, group_id, members):
         """
         Delete members from the group represented by the passed group id.
-        Members is a list of string.
-        Returns a list of members not found.
+        Members is a list of string, split into requests as by put_members.
+        Returns True.
         """
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
@@ -217,30 +261,48 @@ class GWS(object):
         if len(members) == 0:
             return True
 
-        url = "/group_sws/v2/group/%s/member/%s" % (group_id, ','.join(members))
-        response = self.dao.deleteURL(url, self._headers(
-            {"Content-Type": "text/xml", "If-Match": "*"}))
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+        urls = self._members_urls(group_id, members)
+        _checked(urls, self.dao.deleteURLs(urls, self._headers(
+            {"Content-Type": self._backend.content_type, "If-Match": "*"})))
 
         return True
 
     def get_effective_members(self, group_id):
         """
-        Returns a list of effective resttools.GroupMember objects for the
-        group identified by the passed group ID.
+        Returns a MemberList (see resttools.models.gws) of the effective
+        members of the group identified by the passed group ID.
         """
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        url = "/group_sws/v2/group/%s/effective_member" % group_id
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
+        url = "%s/group/%s/effective_member" % (self._root, group_id)
+        return self._get_revalidated(url, self._backend.decode_members)
 
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+    def iter_effective_members(self, group_id):
+        """
+        Yields the effective resttools.GroupMember objects of the group
+        identified by the passed group ID as the response is read, so
+        memory stays flat however large the group.  Not cached or
+        revalidated.
+        """
+        if not self._is_valid_group_id(group_id):
+            raise InvalidGroupID(group_id)
 
-        return self._members_from_xml(response.data)
+        url = "%s/group/%s/effective_member" % (self._root, group_id)
+        response = self.dao.getStream(url, self._headers({"Accept": self._backend.content_type}))
+        done = False
+        try:
+            if response.status != 200:
+                raise DataFailureException(url, response.status, response.read())
+
+            for member in self._backend.iter_members(response):
+                yield member
+            done = True
+        finally:
+            if not done:
+                # unread body: don't hand the connection back mid-response
+                response.close()
+            response.release_conn()
 
     def get_effective_member_count(self, group_id):
         """
@@ -250,16 +312,13 @@ class GWS(object):
         if not self._is_valid_group_id(group_id):
             raise InvalidGroupID(group_id)
 
-        url = "/group_sws/v2/group/%s/effective_member?view=count" % group_id
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
+        url = "%s/group/%s/effective_member?view=count" % (self._root, group_id)
+        response = self.dao.getURL(url, self._headers({"Accept": self._backend.content_type}))
 
         if response.status != 200:
             raise DataFailureException(url, response.status, response.data)
 
-        root = etree.fromstring(response.data)
-        count = root.find('member_count').get("count")
-
-        return int(count)
+        return self._backend.decode_member_count(response.data)
 
     def is_effective_member(self, group_id, netid):
         """
@@ -271,8 +330,8 @@ class GWS(object):
         # GWS doesn't accept EPPNs on effective member checks, for UW users
         netid = re.sub('@washington.edu', '', netid)
 
-        url = "/group_sws/v2/group/%s/effective_member/%s" % (group_id, netid)
-        response = self.dao.getURL(url, self._headers({"Accept": "text/xml"}))
+        url = "%s/group/%s/effective_member/%s" % (self._root, group_id, netid)
+        response = self.dao.getURL(url, self._headers({"Accept": self._backend.content_type}))
 
         if response.status == 404:
             return False
@@ -281,105 +340,69 @@ class GWS(object):
         else:
             raise DataFailureException(url, response.status, response.data)
 
-    def _group_from_xml(self, data):
-        root = etree.fromstring(data)
-        gr = root.find('group')
-        group_id = gr.find('name').text
-        if re.match(r'^course_', group_id):
-            group = CourseGroup()
-            group.curriculum_abbr = gr.find('course_curr').text.upper()
-            group.course_number = gr.find('course_no').text
-            group.year = gr.find('course_year').text
-            group.quarter = self.QTRS[gr.find('course_qtr').text]
-            group.section_id = gr.find('course_sect').text.upper()
-            group.sln = gr.find('course_sln').text
-
-            group.instructors = []
-            instructors = (gr.find('course_instructors').findall('course_instructor'))
-            for instructor in instructors:
-                group.instructors.append(GroupMember(name=instructor.text,
-                                                     member_type="uwnetid"))
-        else:
-            group = Group()
-
-        group.name = group_id
-        group.uwregid = gr.find('regid').text
-        group.title = gr.find('title').text
-        group.description = gr.find('description').text
-        group.contact = gr.find('contact').text
-        group.authnfactor = gr.find('authnfactor').text
-        group.classification = gr.find('classification').text
-        group.emailenabled = gr.find('emailenabled').text
-        group.dependson = gr.find('dependson').text
-        group.publishemail = gr.find('publishemail').text
-
-        try:
-            group.reporttoorig = gr.find('reporttoorig').text
-        except AttributeError:
-            # Legacy class name for this attribute
-            group.reporttoorig = gr.find('reporttoowner').text
-
-        for user in gr.find('admins').findall('admin'):
-            group.admins.append(GroupUser(user.text,
-                                          user_type=user.get('type')))
-
-        for user in gr.find('updaters').findall('updater'):
-            group.updaters.append(GroupUser(name=user.text,
-                                            user_type=user.get("type")))
-
-        for user in gr.find('creators').findall('creator'):
-            group.creators.append(GroupUser(name=user.text,
-                                            user_type=user.get("type")))
-
-        for user in gr.find('readers').findall('reader'):
-            group.readers.append(GroupUser(name=user.text,
-                                           user_type=user.get("type")))
-
-        for user in gr.find('optins').findall('optin'):
-            group.optins.append(GroupUser(name=user.text,
-                                          user_type=user.get("type")))
-
-        for user in gr.find('optouts').findall('optout'):
-            group.optouts.append(GroupUser(name=user.text,
-                                           user_type=user.get("type")))
-
-        # viewers are not used according to Jim Fox
-        # group.viewers = []
-        # for user in gr.find('viewers').findall('viewer'):
-        #     group.viewers.append(GroupUser(name=user.text,
-        #                                    user_type=user.get("type")))
-        return group
-
-    def _xml_from_group(self, group):
-        template = self._j2env.get_template("group.xml")
-        return template.render({"group": group})
-
-    def _members_from_xml(self, data):
-        e_mbrs = etree.fromstring(data).find('group').find('members')
-        e_mbr_list = e_mbrs.findall('member')
-
-        members = []
-        for member in e_mbr_list:
-            members.append(GroupMember(name=member.text,
-                                       member_type=member.get("type")))
+    def _get_revalidated(self, url, decode):
+        """
+        GET url and return its decoded body.  With CONDITIONAL_GET on, the
+        request carries the validators of the last response for url, and a
+        304 reuses that response's decoded value.
+        """
+        headers = self._headers({"Accept": self._backend.content_type})
+        entry = self._validators.get(url) if self._validators is not None else None
+        if entry is not None:
+            etag, last_modified, value = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            metrics.incr('revalidations', self._service_name)
+
+        response = self.dao.getURL(url, headers)
+
+        if response.status == 304 and entry is not None:
+            metrics.incr('not_modified', self._service_name)
+            return _copy(value)
 
-        return members
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
 
-    def _notfoundmembers_from_xml(self, data):
-        members = []
-        root = etree.fromstring(data)
-        e_nf = root.find('notfoundmembers')
-        if e_nf is None:
-            return members
-        e_nf_list = e_nf.findall('notfoundmember')
-        for m in e_nf_list:
-            members.append(m.text)
+        value = decode(response.data)
+        if self._validators is not None:
+            self._validators.put(url, _header(response, 'ETag'),
+                                 _header(response, 'Last-Modified'), value)
+            value = _copy(value)
+        return value
 
-        return members
+    def _members_url(self, group_id):
+        return "%s/group/%s/member" % (self._root, group_id)
 
-    def _xml_from_members(self, group_id, members):
-        template = self._j2env.get_template("members.xml")
-        return template.render({"group_id": group_id, "members": members})
+    def _members_urls(self, group_id, ids):
+        """
+        The member URLs for ids, as few as fit in MAX_URL_LENGTH each; an
+        id too long for that gets a URL of its own.
+        """
+        base = self._members_url(group_id) + '/'
+        budget = self._conf.get('MAX_URL_LENGTH', DEFAULT_MAX_URL_LENGTH)
+        urls = []
+        chunk = []
+        size = len(base)
+        for member_id in ids:
+            member_id = quote(member_id, safe='@:')
+            if chunk and size + 1 + len(member_id) > budget:
+                urls.append(base + ','.join(chunk))
+                chunk = []
+                size = len(base)
+            size += len(member_id) + (1 if chunk else 0)
+            chunk.append(member_id)
+        if chunk:
+            urls.append(base + ','.join(chunk))
+        return urls
+
+    def _member_id(self, member):
+        """
+        The id of a GroupMember in member URLs: prefixed for types GWS
+        can't tell from the name.
+        """
+        return self.MEMBER_ID_PREFIXES.get(member.member_type, '') + member.name
 
     def _is_valid_group_id(self, group_id):
         if not re.match(r'^[a-z0-9][\w\.-]+$', group_id, re.I):
@@ -399,3 +422,45 @@ class GWS(object):
 
         headers[header] = value
         return headers
+
+
+def _copy(value):
+    """
+    A copy of a stored result that callers may modify: member lists are
+    immutable and shared, groups are copied deeply.
+    """
+    if isinstance(value, MemberList):
+        return value
+    return copy.deepcopy(value)
+
+
+def _checked(urls, responses):
+    """
+    The responses to requests for urls, raising the first failure.
+    """
+    for url, response in zip(urls, responses):
+        if isinstance(response, Exception):
+            raise response
+        if response.status != 200:
+            raise DataFailureException(url, response.status, response.data)
+    return responses
+
+
+def _member_list(members):
+    """
+    members as a MemberList; plain strings are taken as uwnetids.
+    """
+    if isinstance(members, MemberList):
+        return members
+    return MemberList(m if isinstance(m, GroupMember) else GroupMember(m, GroupMember.UWNETID_TYPE)
+                      for m in members)
+
+
+def _header(response, name):
+    """
+    Case-insensitive response header lookup, for live and mock responses.
+    """
+    for header, value in (response.headers or {}).items():
+        if header.lower() == name.lower():
+            return value
+    return None
@@ -0,0 +1,383 @@
+"""
+Encodings of the Groups Web Service API.  GWS uses the backend named by
+its conf's API_VERSION:
+
+    'v2'    /group_sws/v2, XML (the default)
+    'v3'    /group_sws/v3, JSON
+
+Both decode to the same resttools.models.gws objects, with scalar group
+fields as text.  v3 flags decode to the v2 words ('enabled'/'disabled',
+'yes'/'no') and encode back to JSON booleans, as numbers do to ints.
+"""
+import json
+import re
+import threading
+
+from jinja2 import Environment, PackageLoader
+from lxml import etree
+
+from resttools.models.gws import Group, CourseGroup, GroupReference
+from resttools.models.gws import GroupUser, GroupMember, MemberList
+
+QTRS = {'win': 'winter', 'spr': 'spring', 'sum': 'summer', 'aut': 'autumn'}
+_QTR_CODES = dict((name, code) for code, name in QTRS.items())
+
+_local = threading.local()
+
+# v2 group elements decoded as text: element tag -> Group attribute
+_GROUP_FIELDS = {
+    'name': 'name',
+    'regid': 'uwregid',
+    'title': 'title',
+    'description': 'description',
+    'contact': 'contact',
+    'authnfactor': 'authnfactor',
+    'classification': 'classification',
+    'emailenabled': 'emailenabled',
+    'dependson': 'dependson',
+    'publishemail': 'publishemail',
+    'reporttoorig': 'reporttoorig',
+    'course_curr': 'curriculum_abbr',
+    'course_no': 'course_number',
+    'course_year': 'year',
+    'course_qtr': 'quarter',
+    'course_sect': 'section_id',
+    'course_sln': 'sln',
+}
+
+# v2 group elements holding GroupUsers: list tag -> (item tag, Group attribute)
+_GROUP_USERS = {
+    'admins': ('admin', 'admins'),
+    'updaters': ('updater', 'updaters'),
+    'creators': ('creator', 'creators'),
+    'readers': ('reader', 'readers'),
+    'optins': ('optin', 'optins'),
+    'optouts': ('optout', 'optouts'),
+}
+
+_GROUP_REFERENCE_FIELDS = {
+    'regid': 'uwregid',
+    'title': 'title',
+    'description': 'description',
+    'name': 'name',
+}
+
+# v3 group fields: JSON key -> Group attribute
+_JSON_GROUP_FIELDS = {
+    'id': 'name',
+    'regid': 'uwregid',
+    'displayName': 'title',
+    'description': 'description',
+    'contact': 'contact',
+    'authnfactor': 'authnfactor',
+    'classification': 'classification',
+    'emailEnabled': 'emailenabled',
+    'dependsOn': 'dependson',
+    'publishEmail': 'publishemail',
+    'reportToOrig': 'reporttoorig',
+}
+
+_JSON_COURSE_FIELDS = {
+    'curriculum': 'curriculum_abbr',
+    'number': 'course_number',
+    'year': 'year',
+    'quarter': 'quarter',
+    'section': 'section_id',
+    'sln': 'sln',
+}
+
+# v3 boolean fields: JSON key -> (text when true, text when false)
+_JSON_FLAGS = {
+    'emailEnabled': ('enabled', 'disabled'),
+    'publishEmail': ('yes', 'no'),
+    'reportToOrig': ('yes', 'no'),
+}
+
+_JSON_NUMBERS = ('authnfactor', 'year', 'sln')
+
+_USER_LISTS = ('admins', 'updaters', 'creators', 'readers', 'optins', 'optouts')
+
+_COURSE_ATTRS = ('curriculum_abbr', 'course_number', 'year', 'quarter', 'section_id', 'sln')
+
+
+def get_backend(version):
+    """
+    Return a backend for the API version, 'v2' or 'v3'.
+    """
+    try:
+        return BACKENDS[version]()
+    except KeyError:
+        raise ValueError('unknown GWS API version %r' % version)
+
+
+def _parse(data):
+    """
+    Parse an XML document with this thread's parser.  lxml parsers may
+    not be shared between threads, and reusing one saves setting it up
+    for every document.
+    """
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = etree.XMLParser(resolve_entities=False, collect_ids=False)
+    return etree.fromstring(data, parser)
+
+
+def _text(value):
+    return value if value is None else '%s' % value
+
+
+def _json_text(key, value):
+    if isinstance(value, bool) and key in _JSON_FLAGS:
+        return _JSON_FLAGS[key][not value]
+    return _text(value)
+
+
+def _json_value(key, value):
+    """
+    Return a group field's text value as the v3 JSON type for key.
+    """
+    if key in _JSON_FLAGS:
+        if isinstance(value, bool):
+            return value
+        return bool(value) and value.lower() not in ('disabled', 'no', 'false')
+    if key in _JSON_NUMBERS:
+        return None if value in (None, '') else int(value)
+    return value
+
+
+def _make_group(fields, users, instructors):
+    """
+    Build a Group, or a CourseGroup for course_ names, from decoded
+    attribute values.
+    """
+    if re.match(r'^course_', fields['name']):
+        group = CourseGroup()
+        fields['curriculum_abbr'] = fields['curriculum_abbr'].upper()
+        fields['quarter'] = QTRS[fields['quarter']]
+        fields['section_id'] = fields['section_id'].upper()
+        group.instructors = instructors
+    else:
+        group = Group()
+        for attr in _COURSE_ATTRS:
+            fields.pop(attr, None)
+
+    for attr, value in list(fields.items()) + list(users.items()):
+        setattr(group, attr, value)
+    return group
+
+
+class _XMLMemberFeed(object):
+    """
+    Decodes GroupMembers from a document fed to it in pieces,
+    discarding each member element once read.
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(tag='member', resolve_entities=False)
+
+    def feed(self, data):
+        """
+        Parse the next piece; returns the members it completed.
+        """
+        self._parser.feed(data)
+        return self._members()
+
+    def close(self):
+        """
+        End the document; returns any members not yet returned.
+        """
+        self._parser.close()
+        return self._members()
+
+    def _members(self):
+        members = []
+        for event, member in self._parser.read_events():
+            members.append(GroupMember(name=member.text, member_type=member.get("type")))
+            member.clear()
+            while member.getprevious() is not None:
+                del member.getparent()[0]
+        return members
+
+
+class _JSONMemberFeed(object):
+    """
+    _XMLMemberFeed for JSON documents, which are decoded whole at close().
+    """
+
+    def __init__(self):
+        self._pieces = []
+
+    def feed(self, data):
+        self._pieces.append(data)
+        return []
+
+    def close(self):
+        return [GroupMember(name=member['id'], member_type=member['type'])
+                for member in json.loads(b''.join(self._pieces))['data']]
+
+
+class XMLBackend(object):
+    """
+    The v2 API: XML documents, written with the templates/gws templates.
+    """
+    version = 'v2'
+    content_type = 'text/xml'
+
+    def __init__(self):
+        self._j2env = Environment(loader=PackageLoader('resttools', 'templates/gws'))
+
+    def decode_groups(self, data):
+        groups = []
+        for e in _parse(data).find('groupreferences').iterchildren('groupreference'):
+            group = GroupReference()
+            for field in e:
+                attr = _GROUP_REFERENCE_FIELDS.get(field.tag)
+                if attr is not None:
+                    setattr(group, attr, field.text)
+            groups.append(group)
+
+        return groups
+
+    def decode_group(self, data):
+        """
+        Decode a group document in one pass over the group's elements.
+        """
+        fields = {}
+        users = dict((attr, []) for tag, attr in _GROUP_USERS.values())
+        instructors = []
+        for e in _parse(data).find('group'):
+            tag = e.tag
+            if tag in _GROUP_FIELDS:
+                fields[_GROUP_FIELDS[tag]] = e.text
+            elif tag in _GROUP_USERS:
+                item, attr = _GROUP_USERS[tag]
+                users[attr] = [GroupUser(name=user.text, user_type=user.get('type'))
+                               for user in e.iterchildren(item)]
+            elif tag == 'reporttoowner':
+                # legacy name of reporttoorig
+                fields.setdefault('reporttoorig', e.text)
+            elif tag == 'course_instructors':
+                instructors = [GroupMember(name=instructor.text, member_type="uwnetid")
+                               for instructor in e.iterchildren('course_instructor')]
+
+        # viewers are not used according to Jim Fox
+        return _make_group(fields, users, instructors)
+
+    def decode_members(self, data):
+        e_mbrs = _parse(data).find('group/members')
+        return MemberList.from_pairs((member.text, member.get("type"))
+                                     for member in e_mbrs.iterchildren('member'))
+
+    def iter_members(self, source):
+        """
+        Yields GroupMembers from a file-like source, discarding each
+        member element once read.
+        """
+        for event, member in etree.iterparse(source, tag='member'):
+            yield GroupMember(name=member.text, member_type=member.get("type"))
+            member.clear()
+            while member.getprevious() is not None:
+                del member.getparent()[0]
+
+    def member_feed(self):
+        """
+        Return a feed decoding members from a document read in pieces.
+        """
+        return _XMLMemberFeed()
+
+    def decode_member_count(self, data):
+        return int(_parse(data).find('member_count').get("count"))
+
+    def decode_notfound(self, data):
+        e_nf = _parse(data).find('notfoundmembers')
+        if e_nf is None:
+            return []
+        return [m.text for m in e_nf.iterchildren('notfoundmember')]
+
+    def encode_group(self, group):
+        template = self._j2env.get_template("group.xml")
+        return template.render({"group": group})
+
+    def encode_members(self, group_id, members):
+        template = self._j2env.get_template("members.xml")
+        return template.render({"group_id": group_id, "members": members})
+
+
+class JSONBackend(object):
+    """
+    The v3 API: JSON documents with the resource under 'data'.
+    """
+    version = 'v3'
+    content_type = 'application/json'
+
+    def decode_groups(self, data):
+        groups = []
+        for e in json.loads(data)['data']:
+            group = GroupReference()
+            group.uwregid = e.get('regid')
+            group.title = e.get('displayName')
+            group.description = e.get('description')
+            group.name = e.get('id')
+            group.url = e.get('url', '')
+            groups.append(group)
+
+        return groups
+
+    def decode_group(self, data):
+        gr = json.loads(data)['data']
+        fields = dict((attr, _json_text(key, gr[key])) for key, attr in _JSON_GROUP_FIELDS.items() if key in gr)
+        users = dict((attr, [GroupUser(name=user['id'], user_type=user['type']) for user in gr.get(attr, ())])
+                     for attr in _USER_LISTS)
+        course = gr.get('course') or {}
+        fields.update((attr, _json_text(key, course[key]))
+                      for key, attr in _JSON_COURSE_FIELDS.items() if key in course)
+        instructors = [GroupMember(name=instructor['id'], member_type="uwnetid")
+                       for instructor in course.get('instructors', ())]
+        return _make_group(fields, users, instructors)
+
+    def decode_members(self, data):
+        return MemberList.from_pairs((member['id'], member['type']) for member in json.loads(data)['data'])
+
+    def iter_members(self, source):
+        """
+        Yields GroupMembers from a file-like source.  The JSON document is
+        read whole before the first is yielded.
+        """
+        for member in json.loads(source.read())['data']:
+            yield GroupMember(name=member['id'], member_type=member['type'])
+
+    def member_feed(self):
+        return _JSONMemberFeed()
+
+    def decode_member_count(self, data):
+        return int(json.loads(data)['data']['count'])
+
+    def decode_notfound(self, data):
+        members = []
+        for error in json.loads(data).get('errors') or ():
+            members.extend(error.get('notFound') or ())
+        return members
+
+    def encode_group(self, group):
+        gr = dict((key, _json_value(key, getattr(group, attr))) for key, attr in _JSON_GROUP_FIELDS.items())
+        for attr in _USER_LISTS:
+            gr[attr] = [{'type': user.user_type, 'id': user.name} for user in getattr(group, attr)]
+        if isinstance(group, CourseGroup):
+            course = dict((key, _json_value(key, getattr(group, attr))) for key, attr in _JSON_COURSE_FIELDS.items())
+            # undo _make_group's expansions
+            course['curriculum'] = course['curriculum'].lower()
+            course['quarter'] = _QTR_CODES.get(course['quarter'], course['quarter'])
+            course['section'] = course['section'].lower()
+            course['instructors'] = [{'type': instructor.member_type, 'id': instructor.name}
+                                     for instructor in getattr(group, 'instructors', ())]
+            gr['course'] = course
+        return json.dumps({'data': gr})
+
+    def encode_members(self, group_id, members):
+        return json.dumps({'data': [{'type': member.member_type, 'id': member.name} for member in members]})
+
+
+BACKENDS = {
+    XMLBackend.version: XMLBackend,
+    JSONBackend.version: JSONBackend,
+}
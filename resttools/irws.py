@@ -4,6 +4,7 @@ import copy
 from six.moves.urllib.parse import quote
 import json
 from resttools.dao import IRWS_DAO
+from resttools.deadline import Deadline
 from resttools.models.irws import UWNetId
 from resttools.models.irws import Regid
 from resttools.models.irws import Subscription
@@ -26,13 +27,18 @@ from resttools.exceptions import ResourceNotFound, BadInput
 import logging
 logger = logging.getLogger(__name__)
 
+ACCEPT_JSON = {"Accept": "application/json"}
+PUT_JSON = {"Content-type": "application/json", "Accept": "application/json"}
+# statuses the verify_ methods answer with
+VERIFY_STATUSES = (200, 400, 404)
+
 
 class IRWS(object):
 
-    def __init__(self, conf):
+    def __init__(self, conf, priority=None):
 
         self._service_name = conf['SERVICE_NAME']
-        self.dao = IRWS_DAO(conf)
+        self.dao = IRWS_DAO(conf, priority=priority)
 
     def _get_code_from_error(self, message):
         try:
@@ -51,32 +57,38 @@ class IRWS(object):
     # the IRWS responses into an arbitrary middle-man structure, we should
     # simply pass them on to our client as opaque blobs.  To wit...
 
-    def get_entity_profile(self, netid=None):
+    def _get_decoded(self, url, decode):
         """
-        Returns the entire entity profile as an opaque JSON dict blob.
+        GET url and decode the body; None on 404, DataFailureException
+        on any other error.
         """
-        if netid is not None:
-            url = "/%s/v3/entity.profile/uwnetid=%s" % (self._service_name, netid)
-        else:
-            return None
-
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+        return self._decoded(url, self.dao.getURL(url, ACCEPT_JSON), decode)
 
+    def _decoded(self, url, response, decode):
         if response.status == 404:
             return None
 
         if response.status != 200:
             raise DataFailureException(url, response.status, response.data)
 
-        try:
-            profile = json.loads(response.data)['entity.profile'][0]
-        except ValueError as e:
-            raise DataFailureException(url, 500, "Bad json: " + str(e) + " in " + response.data)
-        except (KeyError, IndexError) as e:
-            raise DataFailureException(url, 500, "Missing key: " + str(e) + " in " + response.data)
-        except Exception as e:
-            raise DataFailureException(url, 500, repl(e) + " in " + response.data)
-        return profile
+        return decode(response.data)
+
+    def _checked(self, url, response, ok=(200,)):
+        """
+        Return response, raising DataFailureException unless its status is ok.
+        """
+        if response.status not in ok:
+            raise DataFailureException(url, response.status, response.data)
+        return response
+
+    def get_entity_profile(self, netid=None):
+        """
+        Returns the entire entity profile as an opaque JSON dict blob.
+        """
+        if netid is None:
+            return None
+        url = self._entity_profile_url(netid)
+        return self._get_decoded(url, self._entity_profile_decoder(url))
 
     def put_entity_profile(self, netid=None, profile=None):
         """
@@ -85,50 +97,57 @@ class IRWS(object):
         NB: The pronoun, if not other fields, cannot be stuffed back into the profile w/o adjustment
         so you cannot simply update the response from our 'get' counterpart.
         """
-        if profile is not None:
-            body = '{"entity.profile": [%s]}' % json.dumps(profile)
-        else:
-            return self.get_entity_profile(self, netid=netid)
+        if profile is None:
+            return self.get_entity_profile(netid=netid)
 
-        if netid is not None:
-            url = "/%s/v3/entity.profile/uwnetid=%s?-reflect" % (self._service_name, netid)
-        else:
-            raise BadInput('Missing netid for entity profile')
+        url = self._entity_profile_put_url(netid)
+        response = self.dao.putURL(url, PUT_JSON, self._entity_profile_body(profile))
+        return self._entity_profile_decoder(url)(self._checked(url, response).data)
 
-        response = self.dao.putURL(url, {"Content-type": "application/json", "Accept": "application/json"}, body)
+    def _entity_profile_url(self, netid):
+        return "/%s/v3/entity.profile/uwnetid=%s" % (self._service_name, netid)
 
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+    def _entity_profile_put_url(self, netid):
+        if netid is None:
+            raise BadInput('Missing netid for entity profile')
+        return self._entity_profile_url(netid) + '?-reflect'
 
-        try:
-            profile = json.loads(response.data)['entity.profile'][0]
-        except ValueError as e:
-            raise DataFailureException(url, 500, "Bad json: " + str(e) + " in " + response.data)
-        except (KeyError, IndexError) as e:
-            raise DataFailureException(url, 500, "Missing key: " + str(e) + " in " + response.data)
-        except Exception as e:
-            raise DataFailureException(url, 500, repl(e) + " in " + response.data)
-        return profile
+    def _entity_profile_body(self, profile):
+        return '{"entity.profile": [%s]}' % json.dumps(profile)
+
+    def _entity_profile_decoder(self, url):
+        return lambda data: self._v3_from_json(url, data, 'entity.profile')
 
     def get_verify_attributes(self):
         """
         Fetch the verify attributes because they might change some day
         """
-        url = "/%s/v3/reference.verify.attribute" % self._service_name
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+        url = self._verify_attributes_url()
+        response = self._checked(url, self.dao.getURL(url, ACCEPT_JSON))
+        return self._verify_attributes_from_json(url, response.data)
 
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+    def _verify_attributes_url(self):
+        return "/%s/v3/reference.verify.attribute" % self._service_name
+
+    def _verify_attributes_from_json(self, url, data):
+        return self._v3_from_json(url, data, 'reference.verify.attribute', first=False)
 
+    def _v3_from_json(self, url, data, key, first=True):
+        """
+        Returns the key's value from a v3 payload (its first element if
+        first is set), raising DataFailureException on a bad payload.
+        """
         try:
-            attributes = json.loads(response.data)['reference.verify.attribute']
+            value = json.loads(data)[key]
+            if first:
+                value = value[0]
         except ValueError as e:
-            raise DataFailureException(url, 500, "Bad json: " + str(e) + " in " + response.data)
+            raise DataFailureException(url, 500, "Bad json: " + str(e) + " in " + data)
         except (KeyError, IndexError) as e:
-            raise DataFailureException(url, 500, "Missing key: " + str(e) + " in " + response.data)
+            raise DataFailureException(url, 500, "Missing key: " + str(e) + " in " + data)
         except Exception as e:
-            raise DataFailureException(url, 500, repl(e) + " in " + response.data)
-        return attributes
+            raise DataFailureException(url, 500, repr(e) + " in " + data)
+        return value
 
     # v2 - no change
     def get_uwnetid(self, eid=None, regid=None, netid=None, source=None, status=None, ret_array=False):
@@ -138,6 +157,15 @@ class IRWS(object):
         communicating with the IRWS, a DataFailureException will be thrown.
         if 'all' an array is returned with all the matching netids.
         """
+        url = self._uwnetid_url(eid=eid, regid=regid, netid=netid, source=source, status=status)
+        if url is None:
+            return None
+        ids = self._get_decoded(url, lambda data: self._uwnetids_from_json(data, ret_array))
+        if ids is None and ret_array:
+            return []
+        return ids
+
+    def _uwnetid_url(self, eid=None, regid=None, netid=None, source=None, status=None):
         eid = self._clean(eid)
         regid = self._clean(regid)
         netid = self._clean(netid)
@@ -153,22 +181,7 @@ class IRWS(object):
             url = "/%s/v2/uwnetid?validid=uwnetid=%s%s" % (self._service_name, netid, status_str)
         else:
             return None
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return [] if ret_array else None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        id_data = json.loads(response.data)['uwnetid']
-        if ret_array:
-            ret = []
-            for n in range(0, len(id_data)):
-                ret.append(self._uwnetid_from_json_obj(id_data[n]))
-            return ret
-        else:
-            return self._uwnetid_from_json_obj(id_data[0])
+        return url
 
     # v2 - no change
     def get_person(self, netid=None, regid=None, eid=None):
@@ -177,6 +190,12 @@ class IRWS(object):
         netid isn't found, nothing will be returned.  If there is an error
         communicating with the IRWS, a DataFailureException will be thrown.
         """
+        url = self._person_url(netid=netid, regid=regid, eid=eid)
+        if url is None:
+            return None
+        return self._get_decoded(url, self._person_from_json)
+
+    def _person_url(self, netid=None, regid=None, eid=None):
         netid = self._clean(netid)
         regid = self._clean(regid)
         eid = self._clean(eid)
@@ -189,41 +208,50 @@ class IRWS(object):
             url = "/%s/v2/person?validid=1=%s" % (self._service_name, eid)
         else:
             return None
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+        return url
 
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._person_from_json(response.data)
-
-    def post_hr_person_by_netid(self, netid, wp_publish=None):
+    def post_hr_person_by_netid(self, netid, wp_publish=None, deadline=None):
         """
         Update the whitepages publish value for a netid's employee record.
+        deadline: seconds the whole update may take (see resttools.deadline)
         """
+        with Deadline(deadline):
+            self._check_wp_publish(wp_publish)
+            url = self._hr_url(netid, self._get_hr_url(netid))
+            self._checked(url, self.dao.postURL(url, ACCEPT_JSON, self._hr_body(wp_publish)))
+            return self.get_uwhr_person(*self._hr_source_eid(url))
+
+    def _check_wp_publish(self, wp_publish):
         if wp_publish not in ('Y', 'N', 'E'):
             raise BadInput('Invalid publish option')
 
-        url = self._get_hr_url(netid)
-        if url:
-            hr_data = {'person': [{'wp_publish': wp_publish}]}
-            response = self.dao.postURL(
-                url, {"Accept": "application/json"}, json.dumps(hr_data))
-            if response.status != 200:
-                raise DataFailureException(url, response.status, response.data)
-        else:
+    def _hr_url(self, netid, url):
+        """
+        Return url, the netid's employee record, or raise ResourceNotFound
+        if there is none.
+        """
+        if not url:
             raise ResourceNotFound('not an hr person: {}'.format(netid))
+        return url
+
+    def _hr_body(self, wp_publish):
+        return json.dumps({'person': [{'wp_publish': wp_publish}]})
+
+    def _hr_source_eid(self, url):
+        """
+        Return (eid, source) from an employee record url.
+        """
         source, eid = url.split('/')[-2:]
-        return self.get_uwhr_person(eid, source=source)
+        return eid, source
 
     def _get_hr_url(self, netid):
         """
         Given a netid, return the absolute url for a person's employee record
         or None if not an employee.
         """
-        person = self.get_person(netid=netid)
+        return self._hr_url_from_person(self.get_person(netid=netid))
+
+    def _hr_url_from_person(self, person):
         hr_url = None
         if person:
             hr_url = next((url for key, url in person.identifiers.items()
@@ -240,6 +268,12 @@ class IRWS(object):
         netid isn't found, nothing will be returned.  If there is an error
         communicating with the IRWS, a DataFailureException will be thrown.
         """
+        url = self._regid_url(netid=netid, regid=regid)
+        if url is None:
+            return None
+        return self._get_decoded(url, self._regid_from_json)
+
+    def _regid_url(self, netid=None, regid=None):
         regid = self._clean(regid)
         netid = self._clean(netid)
 
@@ -249,15 +283,7 @@ class IRWS(object):
             url = "/%s/v2/regid?validid=regid=%s" % (self._service_name, regid)
         else:
             return None
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._regid_from_json(response.data)
+        return url
 
     # v2 - changes
     def get_pw_recover_info(self, netid):
@@ -267,33 +293,21 @@ class IRWS(object):
         netid isn't found, nothing will be returned.  If there is an error
         communicating with the IRWS, a DataFailureException will be thrown.
         """
-        netid = self._clean(netid)
-
-        url = "/%s/v2/profile/validid=uwnetid=%s" % \
-            (self._service_name, netid.lower())
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._pw_recover_from_json(response.data)
+        return self._get_decoded(self._profile_url(netid.lower()), self._pw_recover_from_json)
 
     def put_pw_recover_info(self, netid, profile):
         """
         Updates recover info in netid's profile
         """
-        netid = self._clean(netid)
+        url = self._profile_url(netid)
+        response = self.dao.putURL(url, {"Content-type": "application/json"}, self._pw_recover_body(profile))
+        return self._checked(url, response, ok=range(500)).status
 
-        url = "/%s/v2/profile/validid=uwnetid=%s" % (self._service_name, netid)
-        response = self.dao.putURL(url, {"Content-type": "application/json"}, json.dumps(profile.json_data()))
+    def _pw_recover_body(self, profile):
+        return json.dumps(profile.json_data())
 
-        if response.status >= 500:
-            raise DataFailureException(url, response.status, response.data)
-
-        return response.status
+    def _profile_url(self, netid):
+        return "/%s/v2/profile/validid=uwnetid=%s" % (self._service_name, self._clean(netid))
 
     def get_name_by_netid(self, netid):
         """
@@ -301,27 +315,15 @@ class IRWS(object):
         netid isn't found, nothing will be returned.  If there is an error
         communicating with the IRWS, a DataFailureException will be thrown.
         """
-        netid = self._clean(netid)
-
-        url = "/%s/v2/name/uwnetid=%s" % (self._service_name, netid.lower())
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._name_from_json(response.data)
+        return self._get_decoded(self._name_url(netid), self._name_from_json)
 
     def put_name_by_netid(self, netid, first=None, middle=None, last=None):
         name = self.valid_name_json(first=first, middle=middle, last=last)
-        url = "/%s/v2/name/uwnetid=%s" % (self._service_name, netid.lower())
-        response = self.dao.putURL(
-            url, {'Accept': 'application/json'}, name)
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-        return response.status
+        url = self._name_url(netid)
+        return self._checked(url, self.dao.putURL(url, ACCEPT_JSON, name)).status
+
+    def _name_url(self, netid):
+        return "/%s/v2/name/uwnetid=%s" % (self._service_name, self._clean(netid).lower())
 
     def valid_name_json(self, first=None, middle=None, last=None):
         """Construct name json to put to IRWS name."""
@@ -349,20 +351,7 @@ class IRWS(object):
         If the netid isn't found, throws IRWSNotFound.
         If there is an error contacting IRWS, throws DataFailureException.
         """
-        eid = self._clean(eid)
-        source = self._clean(source)
-
-        url = "/%s/v2/person/%s/%s" % (self._service_name, source, eid)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        person_data = json.loads(response.data)['person'][0]
-        return UWhrPerson(**person_data)
+        return self._get_decoded(self._source_person_url(source, eid), self._uwhr_person_from_json)
 
     def get_sdb_person(self, sid):
         """
@@ -371,18 +360,7 @@ class IRWS(object):
         If the netid isn't found, throws IRWSNotFound.
         If there is an error contacting IRWS, throws DataFailureException.
         """
-        sid = self._clean(sid)
-
-        url = "/%s/v2/person/sdb/%s" % (self._service_name, sid)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-        person_data = json.loads(response.data)['person'][0]
-        return SdbPerson(**person_data)
+        return self._get_decoded(self._source_person_url('sdb', sid), self._sdb_person_from_json)
 
     def get_cascadia_person(self, id):
         """
@@ -390,18 +368,7 @@ class IRWS(object):
         If the netid isn't found, throws IRWSNotFound.
         If there is an error contacting IRWS, throws DataFailureException.
         """
-        id = self._clean(id)
-
-        url = "/%s/v2/person/cascadia/%s" % (self._service_name, id)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._cascadia_person_from_json(response.data)
+        return self._get_decoded(self._source_person_url('cascadia', id), self._cascadia_person_from_json)
 
     def get_scca_person(self, id):
         """
@@ -409,18 +376,7 @@ class IRWS(object):
         If the netid isn't found, throws IRWSNotFound.
         If there is an error contacting IRWS, throws DataFailureException.
         """
-        id = self._clean(id)
-
-        url = "/%s/v2/person/scca/%s" % (self._service_name, id)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._scca_person_from_json(response.data)
+        return self._get_decoded(self._source_person_url('scca', id), self._scca_person_from_json)
 
     def get_supplemental_person(self, id):
         """
@@ -428,18 +384,10 @@ class IRWS(object):
         If the netid isn't found, throws IRWSNotFound.
         If there is an error contacting IRWS, throws DataFailureException.
         """
-        id = self._clean(id)
-        url = "/%s/v2/person/supplemental/%s" % (self._service_name, id)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+        return self._get_decoded(self._source_person_url('supplemental', id), self._supplemental_person_from_json)
 
-        data = json.loads(response.data)['person'][0]
-        return SupplementalPerson(**data)
+    def _source_person_url(self, source, id):
+        return "/%s/v2/person/%s/%s" % (self._service_name, self._clean(source), self._clean(id))
 
     def get_generic_person(self, uri):
         """
@@ -447,17 +395,10 @@ class IRWS(object):
         The uris come in from values in irws.Person.identifiers.
         Raises DataFailureExeption on error.
         """
-        uri = quote(uri, '/')
-
-        url = '/%s/v2%s' % (self._service_name, uri)
-        response = self.dao.getURL(url, {'Accept': 'application/json'})
-
-        if response.status == 404:
-            return None
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+        return self._get_decoded(self._generic_person_url(uri), self._generic_person_from_json)
 
-        return self._generic_person_from_json(response.data)
+    def _generic_person_url(self, uri):
+        return '/%s/v2%s' % (self._service_name, quote(uri, '/'))
 
     def get_subscription(self, netid, subscription):
         """
@@ -465,18 +406,11 @@ class IRWS(object):
         netid isn't found, nothing will be returned.  If there is an error
         communicating with the IRWS, a DataFailureException will be thrown.
         """
-        netid = self._clean(netid)
-
-        url = "/%s/v2/subscription?uwnetid=%s&subscription=%d" % (self._service_name, netid.lower(), subscription)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+        return self._get_decoded(self._subscription_url(netid, subscription), self._subscription_from_json)
 
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._subscription_from_json(response.data)
+    def _subscription_url(self, netid, subscription):
+        return "/%s/v2/subscription?uwnetid=%s&subscription=%d" % (
+            self._service_name, self._clean(netid).lower(), subscription)
 
     def get_pdsentry_by_netid(self, netid):
         """
@@ -485,116 +419,106 @@ class IRWS(object):
             If the netid isn't found, throws #TODO
             If there is an error contacting IRWS, throws DataFailureException.
             """
-        netid = self._clean(netid)
+        return self._get_decoded(self._pdsentry_url(netid), self._pdsentry_from_json)
 
-        url = "/%s/v2/pdsentry/validid=uwnetid=%s" % (self._service_name, netid)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-
-        if response.status == 404:
-            return None
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
-
-        return self._pdsentry_from_json(response.data)
+    def _pdsentry_url(self, netid):
+        return "/%s/v2/pdsentry/validid=uwnetid=%s" % (self._service_name, self._clean(netid))
 
     def put_pac(self, eid, source='uwhr'):
         """
         Creates a PAC for the employee.  Returns the Pac.
         """
-        eid = self._clean(eid)
-        source = self._clean(source)
-
-        url = "/%s/v2/person/%s/%s/pac?-force" % (self._service_name, source, eid)
-        response = self.dao.putURL(url, {"Accept": "application/json"}, '')
-
-        if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+        url = self._pac_url(eid, source)
+        return self._pac_from_json(self._checked(url, self.dao.putURL(url, ACCEPT_JSON, '')).data)
 
-        return self._pac_from_json(response.data)
+    def _pac_url(self, eid, source):
+        return self._source_person_url(source, eid) + '/pac?-force'
 
     def verify_sdb_pac(self, sid, pac):
         """
         Verifies a permanent student PAC. Returns 200 (ok) or 400 (no)
         """
-        sid = self._clean(sid)
-        pac = self._clean(pac)
+        url = self._sdb_pac_url(sid, pac)
+        return self._checked(url, self.dao.getURL(url, ACCEPT_JSON), ok=VERIFY_STATUSES).status
 
-        url = "/%s/v2/person/sdb/%s?pac=%s" % (self._service_name, sid, pac)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+    def _sdb_pac_url(self, sid, pac):
+        return self._source_person_url('sdb', sid) + '?pac=%s' % self._clean(pac)
 
-        if (response.status == 200 or response.status == 400 or response.status == 404):
-            return response.status
-        raise DataFailureException(url, response.status, response.data)
-
-    def verify_sc_pin(self, netid, pin):
+    def verify_sc_pin(self, netid, pin, deadline=None):
         """
         Verifies a service center one-time pin. Returns 200 (ok) or 400 (no).
         OK clears the pin.
+        deadline: seconds the whole check may take (see resttools.deadline)
         """
-        netid = self._clean(netid)
-        pin = self._clean(pin)
-
-        # make sure there is a pin subscription
-        url = "/%s/v2/subscription/63/%s" % (self._service_name, netid)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-        if response.status == 200:
-            sub = json.loads(response.data)['subscription'][0]
-            # verify pending subscription and unexpired, unused pac
-            if sub['status_code'] != '23' or sub['pac'] != 'Y':
-                return 404
-        else:
-            return response.status
-
-        url = "/%s/v2/subscribe/63/%s?action=1&pac=%s" % (self._service_name, netid, pin)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
-        if response.status == 200:
-            # delete the pac
-            url = "/%s/v2/subscribe/63/%s?action=2" % (self._service_name, netid)
-            response = self.dao.getURL(url, {"Accept": "application/json"})
+        with Deadline(deadline):
+            # make sure there is a pin subscription
+            response = self.dao.getURL(self._sc_subscription_url(netid), ACCEPT_JSON)
             if response.status != 200:
-                # the pin was good.  we return OK, but note the error
-                logger.error('Delete SC pin failed: %d' % response.status)
-            return 200
+                return response.status
+            if not self._sc_pin_pending(response.data):
+                return 404
 
-        if (response.status == 400 or response.status == 404):
-            return response.status
-        raise DataFailureException(url, response.status, response.data)
+            url = self._sc_pin_url(netid, pin)
+            response = self.dao.getURL(url, ACCEPT_JSON)
+            if response.status == 200:
+                self._sc_pin_deleted(self.dao.getURL(self._sc_pin_delete_url(netid), ACCEPT_JSON))
+            return self._checked(url, response, ok=VERIFY_STATUSES).status
 
-    def get_qna(self, netid):
-        """
-        Returns a list irws.QnA for the given netid.
-        """
-        netid = self._clean(netid)
+    def _sc_subscription_url(self, netid):
+        return "/%s/v2/subscription/63/%s" % (self._service_name, self._clean(netid))
 
-        url = "/%s/v2/qna?uwnetid=%s" % (self._service_name, netid)
-        response = self.dao.getURL(url, {"Accept": "application/json"})
+    def _sc_pin_url(self, netid, pin):
+        return "/%s/v2/subscribe/63/%s?action=1&pac=%s" % (self._service_name, self._clean(netid), self._clean(pin))
 
-        if response.status == 404:
-            return None
+    def _sc_pin_delete_url(self, netid):
+        return "/%s/v2/subscribe/63/%s?action=2" % (self._service_name, self._clean(netid))
+
+    def _sc_pin_pending(self, data):
+        """
+        True if the pin subscription is pending with an unexpired, unused pac.
+        """
+        sub = json.loads(data)['subscription'][0]
+        return sub['status_code'] == '23' and sub['pac'] == 'Y'
 
+    def _sc_pin_deleted(self, response):
         if response.status != 200:
-            raise DataFailureException(url, response.status, response.data)
+            # the pin was good.  we return OK, but note the error
+            logger.error('Delete SC pin failed: %d' % response.status)
 
-        return self._qna_from_json(response.data)
+    def get_qna(self, netid):
+        """
+        Returns a list irws.QnA for the given netid.
+        """
+        return self._get_decoded(self._qna_url(netid), self._qna_from_json)
+
+    def _qna_url(self, netid):
+        return "/%s/v2/qna?uwnetid=%s" % (self._service_name, self._clean(netid))
 
-    def get_verify_qna(self, netid, answers):
+    def get_verify_qna(self, netid, answers, deadline=None):
         """
         Verifies that all answers are present and that all are correct.
         answers: ordered list of answers
+        deadline: seconds the whole check may take (see resttools.deadline)
         """
-        questions = self.get_qna(netid)
-        if len(questions) != len(answers):
-            return False
-        for index, answer in enumerate(answers, start=1):
-            answer = re.sub(r'\W+', '', answer)
-            url = "/%s/v2/qna/%s/%s/check?ans=%s" % (self._service_name, index, quote(netid), quote(answer))
-            response = self.dao.getURL(url, {"Accept": "application/json"})
-            if response.status in (400, 404):
-                logger.debug('qna wrong answer #{}, status = {}'.format(index, response.status))
+        with Deadline(deadline):
+            questions = self.get_qna(netid)
+            if len(questions) != len(answers):
                 return False
-            if response.status != 200:
-                raise DataFailureException(url, response.status, response.data)
+            for index, answer in enumerate(answers, start=1):
+                url = self._qna_check_url(netid, index, answer)
+                if not self._qna_answer_ok(url, index, self.dao.getURL(url, ACCEPT_JSON)):
+                    return False
+            return True
+
+    def _qna_check_url(self, netid, index, answer):
+        answer = re.sub(r'\W+', '', answer)
+        return "/%s/v2/qna/%s/%s/check?ans=%s" % (self._service_name, index, quote(netid), quote(answer))
+
+    def _qna_answer_ok(self, url, index, response):
+        if response.status in (400, 404):
+            logger.debug('qna wrong answer #{}, status = {}'.format(index, response.status))
+            return False
+        self._checked(url, response)
         return True
 
     def verify_person_attribute(self, netid, attribute, value):
@@ -605,12 +529,20 @@ class IRWS(object):
         list of identifiers. For birthdate, IRWS has the added value of discarding silly
         birthdates and matching on partial birthdates.
         """
-        netid = self._clean(netid)
-        attribute = self._clean(attribute)
-        value = self._clean(value)
+        return self.dao.getURL(self._person_attribute_url(netid, attribute, value), ACCEPT_JSON).status == 200
+
+    def _person_attribute_url(self, netid, attribute, value):
+        return "/%s/v2/person?uwnetid=%s&%s=%s" % (
+            self._service_name, self._clean(netid), self._clean(attribute), self._clean(value))
+
+    def _uwhr_person_from_json(self, data):
+        return UWhrPerson(**json.loads(data)['person'][0])
 
-        url = "/%s/v2/person?uwnetid=%s&%s=%s" % (self._service_name, netid, attribute, value)
-        return self.dao.getURL(url, {'Accept': 'application/json'}).status == 200
+    def _sdb_person_from_json(self, data):
+        return SdbPerson(**json.loads(data)['person'][0])
+
+    def _supplemental_person_from_json(self, data):
+        return SupplementalPerson(**json.loads(data)['person'][0])
 
     def _cascadia_person_from_json(self, data):
         """
@@ -688,6 +620,16 @@ class IRWS(object):
             ret.recover_block_reasons = info['recover_block_reasons']
         return ret
 
+    def _uwnetids_from_json(self, data, ret_array=False):
+        id_data = json.loads(data)['uwnetid']
+        if ret_array:
+            ret = []
+            for n in range(0, len(id_data)):
+                ret.append(self._uwnetid_from_json_obj(id_data[n]))
+            return ret
+        else:
+            return self._uwnetid_from_json_obj(id_data[0])
+
     def _uwnetid_from_json_obj(self, id_data):
         uwnetid = UWNetId()
         uwnetid.uwnetid = id_data['uwnetid']
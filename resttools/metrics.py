@@ -0,0 +1,117 @@
+"""
+Process-wide counters and histograms for the service clients, keyed by
+metric name and service.  Read them with get_metrics(), get_counter()
+or get_histogram().
+"""
+import threading
+
+from resttools import forksafe
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+# upper bounds, in seconds, of the default histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def incr(name, service=None, value=1):
+    """
+    Add value to the name counter of service.
+    """
+    key = (name, service)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get_counter(name, service=None):
+    with _lock:
+        return _counters.get((name, service), 0)
+
+
+def observe(name, service=None, value=0, buckets=LATENCY_BUCKETS):
+    """
+    Record value in the name histogram of service.  buckets, the
+    ascending bucket upper bounds, is only used when the histogram is
+    created; values above the last bound fall in an overflow bucket.
+    """
+    key = (name, service)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def get_histogram(name, service=None):
+    """
+    Return a snapshot of the name histogram of service (see
+    Histogram.snapshot), or None if nothing was recorded.
+    """
+    with _lock:
+        histogram = _histograms.get((name, service))
+        return histogram.snapshot() if histogram is not None else None
+
+
+def get_metrics():
+    """
+    Return a snapshot: {'counters': {(name, service): value},
+    'histograms': {(name, service): histogram snapshot}}.
+    """
+    with _lock:
+        return {'counters': dict(_counters),
+                'histograms': dict((key, h.snapshot()) for key, h in _histograms.items())}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    """
+    A forked child counts its own requests, from zero.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+
+
+class Histogram(object):
+    """
+    Bucketed distribution of observed values.  Not locked; the module
+    functions hold the metrics lock around it.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        """
+        {'count', 'sum', 'min', 'max', 'buckets'}, where buckets is a list
+        of (upper bound, count) ending with (None, overflow count).
+        """
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'buckets': list(zip(self.bounds + (None,), self.counts))}
@@ -1,6 +1,7 @@
 """
 Contains objects used by the non-HTTP DAO implementations
 """
+import io
 
 
 class MockHTTP(object):
@@ -29,3 +30,29 @@ class MockHTTP(object):
                     return self.headers[header]
 
         return default
+
+
+class MockStreamingHTTP(MockHTTP):
+    """
+    A MockHTTP read incrementally, as a live response is when
+    requested with preload_content=False.
+    """
+    _stream = None
+
+    def read(self, amt=None):
+        """
+        Returns up to amt bytes of the document body; all of the
+        rest when amt is None.
+        """
+        if self._stream is None:
+            data = self.data or b''
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            self._stream = io.BytesIO(data)
+        return self._stream.read(amt)
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
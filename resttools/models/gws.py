@@ -1,3 +1,11 @@
+from array import array
+from itertools import islice
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 
 class GroupReference():
     uwregid = ''
@@ -145,3 +153,209 @@ class GroupMember():
     def __str__(self):
         return "{name: %s, user_type: %s}" % (
             self.name, self.member_type)
+
+
+class MemberList(Sequence):
+    """
+    An immutable sequence of group members, kept compactly: the names
+    joined in one string with an array of their offsets, and a one-byte
+    code per member for its type.  GroupMember objects are only made
+    when members are read.
+
+    'name' in members tests for a member of any type, a GroupMember for
+    one of that name and type.  union(), intersection() and difference()
+    (also |, & and -) work on the (name, type) pairs by a merge of the
+    sorted members, and return MemberLists in that order.
+    """
+
+    def __init__(self, members=()):
+        self._types = []
+        self._type_codes = {}
+        if isinstance(members, MemberList):
+            pairs = members.pairs()
+        else:
+            pairs = ((member.name, member.member_type) for member in members)
+        self._build(pairs)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Return a MemberList of (name, member type) pairs.
+        """
+        members = cls()
+        members._build(pairs)
+        return members
+
+    def _build(self, pairs):
+        names = []
+        offsets = array('I', [0])
+        codes = array('B')
+        end = 0
+        for name, member_type in pairs:
+            # a missing type reads back as GroupMember's default, '', so
+            # the sorted pairs stay comparable
+            member_type = member_type or ''
+            code = self._type_codes.get(member_type)
+            if code is None:
+                code = self._type_codes[member_type] = len(self._types)
+                self._types.append(member_type)
+            names.append(name)
+            end += len(name)
+            offsets.append(end)
+            codes.append(code)
+        self._names = ''.join(names)
+        self._offsets = offsets
+        self._codes = codes
+        self._order = None
+        self._in_order = None
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MemberList.from_pairs(self._pair(i) for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('member index out of range')
+        name, member_type = self._pair(index)
+        return GroupMember(name=name, member_type=member_type)
+
+    def __iter__(self):
+        for name, member_type in self.pairs():
+            yield GroupMember(name=name, member_type=member_type)
+
+    def __contains__(self, member):
+        if isinstance(member, GroupMember):
+            key = (member.name, member.member_type or '')
+            i = self._search(key, self._pair)
+            return i < len(self) and self._pair(self._order[i]) == key
+        i = self._search(member, self._name)
+        return i < len(self) and self._name(self._order[i]) == member
+
+    def __eq__(self, other):
+        if isinstance(other, MemberList):
+            return len(self) == len(other) and all(a == b for a, b in zip(self.pairs(), other.pairs()))
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        shown = ', '.join('%s:%s' % (member_type, name) for name, member_type in islice(self.pairs(), 5))
+        more = ', ...' if len(self) > 5 else ''
+        return '<MemberList of %d: %s%s>' % (len(self), shown, more)
+
+    def names(self):
+        """
+        Yields the member names, in order.
+        """
+        names, offsets = self._names, self._offsets
+        for i in range(len(self)):
+            yield names[offsets[i]:offsets[i + 1]]
+
+    def pairs(self):
+        """
+        Yields (name, member type) pairs, in order.
+        """
+        names, offsets, types = self._names, self._offsets, self._types
+        for i, code in enumerate(self._codes):
+            yield names[offsets[i]:offsets[i + 1]], types[code]
+
+    def sorted_pairs(self):
+        """
+        Yields the distinct (name, member type) pairs in sorted order.
+        """
+        self._sorted()
+        pairs = self.pairs() if self._in_order else (self._pair(i) for i in self._order)
+        last = None
+        for pair in pairs:
+            if pair != last:
+                yield pair
+                last = pair
+
+    def union(self, other):
+        return MemberList.from_pairs(_merge(self.sorted_pairs(), _sorted_pairs(other), True, True, True))
+
+    def intersection(self, other):
+        return MemberList.from_pairs(_merge(self.sorted_pairs(), _sorted_pairs(other), False, True, False))
+
+    def difference(self, other):
+        return MemberList.from_pairs(_merge(self.sorted_pairs(), _sorted_pairs(other), True, False, False))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def _name(self, i):
+        return self._names[self._offsets[i]:self._offsets[i + 1]]
+
+    def _pair(self, i):
+        return self._names[self._offsets[i]:self._offsets[i + 1]], self._types[self._codes[i]]
+
+    def _sorted(self):
+        """
+        The member indexes in (name, type) order, computed on first use.
+        """
+        if self._order is None:
+            pairs = self.pairs()
+            last = next(pairs, None)
+            self._in_order = True
+            for pair in pairs:
+                if pair < last:
+                    self._in_order = False
+                    break
+                last = pair
+            if self._in_order:
+                self._order = array('I', range(len(self)))
+            else:
+                self._order = array('I', sorted(range(len(self)), key=self._pair))
+        return self._order
+
+    def _search(self, key, key_of):
+        """
+        Binary search of the sorted members for the first whose key_of()
+        is not below key.
+        """
+        order = self._sorted()
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_of(order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _sorted_pairs(members):
+    if not isinstance(members, MemberList):
+        members = MemberList(members)
+    return members.sorted_pairs()
+
+
+def _merge(a, b, only_a, both, only_b):
+    """
+    Merge two sorted streams of distinct pairs, yielding those only in a,
+    in both, and only in b as the flags say.
+    """
+    x, y = next(a, None), next(b, None)
+    while x is not None or y is not None:
+        if y is None or (x is not None and x < y):
+            if only_a:
+                yield x
+            x = next(a, None)
+        elif x is None or y < x:
+            if only_b:
+                yield y
+            y = next(b, None)
+        else:
+            if both:
+                yield x
+            x, y = next(a, None), next(b, None)
@@ -9,14 +9,24 @@ logger = logging.getLogger(__name__)
 
 class NTFYWS(object):
 
-    def __init__(self, conf, actas=None):
+    def __init__(self, conf, actas=None, priority=None):
         self._service_name = conf['SERVICE_NAME']
-        self.dao = NTFYWS_DAO(conf)
+        self.dao = NTFYWS_DAO(conf, priority=priority)
 
     def send_message(self, eppn, number, message, type='text'):
         """
         Sends a text (or voice) message to the phone number
         """
+        body = self._dispatch_json(eppn, number, message, type)
+        if body is None:
+            return 400
+
+        url = "/%s/v1/dispatch" % (self._service_name)
+        resp = self.dao.postURL(url, {"Content-Type": "application/json"}, body)
+
+        return resp.status
+
+    def _dispatch_json(self, eppn, number, message, type):
         if type == 'text':
             mtype = 'uw_direct_phone_sms'
             ts = 'Text'
@@ -24,7 +34,7 @@ class NTFYWS(object):
             mtype = 'uw_direct_phone_voice'
             ts = 'Say'
         else:
-            return 400
+            return None
 
         data = {'Dispatch': {
             'MessageType': mtype, 'Content': {
@@ -33,8 +43,4 @@ class NTFYWS(object):
                 ts: message
                 }
         }}
-
-        url = "/%s/v1/dispatch" % (self._service_name)
-        resp = self.dao.postURL(url, {"Content-Type": "application/json"}, json.dumps(data))
-
-        return resp.status
+        return json.dumps(data)
@@ -20,14 +20,14 @@ logger = logging.getLogger(__name__)
 
 class NWS(object):
 
-    def __init__(self, conf, actas=None):
+    def __init__(self, conf, actas=None, priority=None):
         service_name = conf['SERVICE_NAME']
         version = conf.get('VERSION', 'v1')
         self._base_url = '/{}/{}'.format(service_name, version)
         self._pw_action = 'Set'
         if 'PASSWORD_ACTION' in conf:
             self._pw_action = conf['PASSWORD_ACTION']
-        self.dao = NWS_DAO(conf)
+        self.dao = NWS_DAO(conf, priority=priority)
 
     def get_netid_admins(self, netid):
         """
@@ -0,0 +1,190 @@
+"""
+Request priorities, and admission to the live connection pools by
+priority.
+
+A request is 'interactive' unless made under 'background' priority:
+
+    with Priority('background'):
+        gws.get_effective_members(group_id)
+
+or through a client built with one, IRWS(conf, priority='background').
+
+With 'PRIORITY_ADMISSION' on in a service conf, requests take one of the
+pool's MAX_POOL_SIZE slots before they get a connection.  RESERVED slots
+are only ever given to interactive requests, and when both classes are
+waiting, freed slots go to them in the ratio of WEIGHTS, so background
+work cannot starve interactive callers but still progresses.  Time spent
+waiting is kept per class as the queue_time_<priority> histograms.  Set
+it to True, or a dict overriding any of the DEFAULTS.
+"""
+import time
+import threading
+from collections import deque
+
+from resttools import deadline, forksafe, metrics
+from resttools.exceptions import DeadlineExceeded
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+DEFAULTS = {
+    'RESERVED': 1,
+    'WEIGHTS': {INTERACTIVE: 8, BACKGROUND: 1},
+}
+
+_local = threading.local()
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+class Priority(object):
+    """
+    Context manager setting the priority of the requests made in it;
+    None keeps the current one.
+    """
+
+    def __init__(self, priority):
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError('unknown priority %r' % priority)
+        self.priority = priority
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = getattr(_local, 'priority', None)
+        if self.priority is not None:
+            _local.priority = self.priority
+        return self
+
+    def __exit__(self, *args):
+        _local.priority = self._outer
+
+
+def current():
+    """
+    Return the priority of requests made now.
+    """
+    return getattr(_local, 'priority', None) or INTERACTIVE
+
+
+def bind(func):
+    """
+    Return func wrapped to run at the caller's priority, for handing to
+    another thread.
+    """
+    priority = getattr(_local, 'priority', None)
+    if priority is None:
+        return func
+
+    def bound(*args, **kwargs):
+        with Priority(priority):
+            return func(*args, **kwargs)
+    return bound
+
+
+def get_gate(service, host, settings, slots):
+    """
+    Return the admission gate for service at host, or None if settings is
+    falsy.
+    """
+    if not settings:
+        return None
+    key = (service, host)
+    with _gates_lock:
+        gate = _gates.get(key)
+        if gate is None:
+            options = dict(DEFAULTS)
+            if isinstance(settings, dict):
+                options.update(settings)
+            gate = PriorityGate(service, slots, **dict((k.lower(), v) for k, v in options.items()))
+            _gates[key] = gate
+    return gate
+
+
+def clear_gates():
+    with _gates_lock:
+        _gates.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _gates_lock
+    _gates_lock = threading.Lock()
+    for gate in _gates.values():
+        gate._after_fork()
+
+
+class PriorityGate(object):
+
+    def __init__(self, service, slots, reserved=1, weights=None):
+        self.service = service
+        self.slots = slots
+        self.reserved = min(reserved, slots - 1)
+        self.weights = dict(DEFAULTS['WEIGHTS'], **(weights or {}))
+        self._in_use = 0
+        self._waiting = dict((p, deque()) for p in PRIORITIES)
+        self._credit = dict((p, 0) for p in PRIORITIES)
+        self._lock = threading.Lock()
+
+    def acquire(self, url, priority=None):
+        """
+        Wait for a slot for a request of priority (default: the current
+        one); pair with release().
+        """
+        priority = priority or current()
+        started = time.time()
+        with self._lock:
+            if self._may_take(priority) and not self._waiting[priority]:
+                self._in_use += 1
+                waiter = None
+            else:
+                waiter = threading.Event()
+                self._waiting[priority].append(waiter)
+        if waiter is not None and not waiter.wait(deadline.remaining()):
+            with self._lock:
+                if not waiter.is_set():
+                    self._waiting[priority].remove(waiter)
+                    raise DeadlineExceeded(url)
+        metrics.observe('queue_time_%s' % priority, self.service, time.time() - started)
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+            while True:
+                priority = self._next()
+                if priority is None:
+                    break
+                self._in_use += 1
+                self._waiting[priority].popleft().set()
+
+    def status(self):
+        with self._lock:
+            return {'in_use': self._in_use,
+                    'waiting': dict((p, len(q)) for p, q in self._waiting.items())}
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._in_use = 0
+        for waiting in self._waiting.values():
+            waiting.clear()
+
+    def _may_take(self, priority):
+        limit = self.slots if priority == INTERACTIVE else self.slots - self.reserved
+        return self._in_use < limit
+
+    def _next(self):
+        """
+        The class to hand a free slot to: smooth weighted round robin over
+        the classes waiting that may take one.
+        """
+        ready = [p for p in PRIORITIES if self._waiting[p] and self._may_take(p)]
+        if not ready:
+            return None
+        if len(ready) == 1:
+            return ready[0]
+        total = sum(self.weights[p] for p in ready)
+        for p in ready:
+            self._credit[p] += self.weights[p]
+        chosen = max(ready, key=lambda p: self._credit[p])
+        self._credit[chosen] -= total
+        return chosen
@@ -0,0 +1,171 @@
+"""
+Token-bucket pacing of the requests a service DAO sends upstream.
+
+Enable it per service in conf:
+
+    'RATE_LIMIT': 20,                     # requests per second
+    'RATE_LIMIT_BURST': 40,               # bucket size, default max(1, rate)
+    'RATE_LIMITS': [(r'/qna/', 2, 2)],    # (url regex, rate, burst), first
+                                          # match; paced on top of RATE_LIMIT
+    'RATE_LIMIT_BLOCK': True,             # False: fail instead of waiting
+    'RATE_LIMIT_MAX_WAIT': 5.0,           # seconds; longer waits fail
+
+The buckets are shared by every thread using DAOs with the same host
+and identity; each forked worker process paces its own requests.  A
+request that may not wait, or would wait longer than RATE_LIMIT_MAX_WAIT,
+raises RateLimited without being sent or holding any tokens.  Time spent
+waiting is kept as the rate_limit_wait histogram, refusals as the
+rate_limited counter.  Cached and coalesced GETs are not paced.
+"""
+import re
+import time
+import threading
+
+from resttools import forksafe, metrics
+from resttools.dao_implementation.balancer import host_key
+from resttools.exceptions import RateLimited
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service, conf):
+    """
+    Return the limiter shared by the service DAOs with this conf's host and
+    identity, or None if no rate limit is configured.
+    """
+    if 'RATE_LIMIT' not in conf and 'RATE_LIMITS' not in conf:
+        return None
+    key = (service, conf.get('RUN_MODE'), host_key(conf), conf.get('CERT_FILE'))
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(service,
+                                  rate=conf.get('RATE_LIMIT'),
+                                  burst=conf.get('RATE_LIMIT_BURST'),
+                                  limits=conf.get('RATE_LIMITS', ()),
+                                  block=conf.get('RATE_LIMIT_BLOCK', True),
+                                  max_wait=conf.get('RATE_LIMIT_MAX_WAIT'))
+            _limiters[key] = limiter
+    return limiter
+
+
+def clear_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _limiters_lock
+    _limiters_lock = threading.Lock()
+    for limiter in _limiters.values():
+        limiter._after_fork()
+
+
+class TokenBucket(object):
+    """
+    rate tokens a second, up to burst.  Waiters reserve their token up
+    front, so they are served in arrival order and wake at their turn.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token, returning the seconds to wait before using it; or
+        take nothing and return None if that wait would exceed max_wait.
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def refund(self):
+        """
+        Give back a token taken by reserve and not used.
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def acquire(self, blocking=True, timeout=None):
+        """
+        Take a token, sleeping for it if blocking (at most timeout
+        seconds).  Returns True if a token was taken.
+        """
+        wait = self.reserve(timeout if blocking else 0)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+
+class RateLimiter(object):
+
+    def __init__(self, service, rate=None, burst=None, limits=(), block=True, max_wait=None):
+        self.service = service
+        self.block = block
+        self.max_wait = max_wait
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._limits = [(re.compile(pattern), TokenBucket(r, b)) for pattern, r, b in limits]
+
+    def reserve(self, url, max_wait=None):
+        """
+        Take the tokens for a request to url and return the seconds to wait
+        before sending it.  Raises RateLimited if it may not wait that long,
+        or longer than max_wait.
+        """
+        limit = self.max_wait if self.block else 0
+        if max_wait is not None:
+            max_wait = max(0.0, max_wait if limit is None else min(limit, max_wait))
+        else:
+            max_wait = limit
+        wait = 0.0
+        taken = []
+        for bucket in self._buckets(url):
+            delay = bucket.reserve(max_wait)
+            if delay is None:
+                for bucket in taken:
+                    bucket.refund()
+                metrics.incr('rate_limited', self.service)
+                raise RateLimited(url, self.service)
+            taken.append(bucket)
+            wait = max(wait, delay)
+        metrics.observe('rate_limit_wait', self.service, wait)
+        return wait
+
+    def acquire(self, url, max_wait=None):
+        """
+        Block until a request to url may be sent (see reserve).
+        """
+        wait = self.reserve(url, max_wait)
+        if wait:
+            time.sleep(wait)
+
+    def _after_fork(self):
+        if self._bucket is not None:
+            self._bucket._after_fork()
+        for pattern, bucket in self._limits:
+            bucket._after_fork()
+
+    def _buckets(self, url):
+        for pattern, bucket in self._limits:
+            if pattern.search(url):
+                yield bucket
+                break
+        if self._bucket is not None:
+            yield self._bucket
@@ -0,0 +1,115 @@
+"""
+Coalescing of identical in-flight GETs.  While one thread fetches a
+url, other threads asking for the same url (with the same headers) wait
+for that fetch and share its response, or its exception, instead of
+each going upstream.
+
+It is on by default; set 'SINGLE_FLIGHT': False in a service conf to
+turn it off.
+"""
+import threading
+
+from resttools import deadline, forksafe, metrics
+from resttools.exceptions import DeadlineExceeded
+from resttools.dao_implementation.balancer import host_key
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(service, conf):
+    """
+    Return the SingleFlight shared by the service DAOs with this conf's
+    host and identity, or None if it is turned off.
+    """
+    if not conf.get('SINGLE_FLIGHT', True):
+        return None
+    key = (service, conf.get('RUN_MODE'), host_key(conf), conf.get('CERT_FILE'))
+    with _groups_lock:
+        group = _groups.get(key)
+        if group is None:
+            group = SingleFlight(service)
+            _groups[key] = group
+    return group
+
+
+def clear_groups():
+    with _groups_lock:
+        _groups.clear()
+
+
+@forksafe.register
+def _reset_after_fork():
+    global _groups_lock
+    _groups_lock = threading.Lock()
+    for group in _groups.values():
+        group._after_fork()
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+
+    def __init__(self, service=None):
+        self.service = service
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def key(self, url, headers):
+        return (url, tuple(sorted((headers or {}).items())))
+
+    def do(self, key, func):
+        """
+        Return func(), unless a call for key is already running, in which
+        case wait for it and return (or raise) its outcome.  A waiter
+        gives up with DeadlineExceeded when its own deadline passes.  A
+        leader's DeadlineExceeded is not shared: a waiter with time left
+        makes the call itself.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+
+            left = deadline.remaining()
+            if not call.done.wait(None if left is None else max(left, 0)):
+                raise DeadlineExceeded(key[0])
+            if isinstance(call.error, DeadlineExceeded):
+                deadline.check(key[0])
+                continue
+            metrics.incr('coalesced', self.service)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _after_fork(self):
+        """
+        The parent's fetches will not finish in the child.
+        """
+        self._lock = threading.Lock()
+        self._calls.clear()
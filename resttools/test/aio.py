@@ -0,0 +1,144 @@
+import asyncio
+import time
+from nose.tools import *
+from nose.plugins.skip import SkipTest
+
+from resttools.aio.irws import IRWS
+from resttools.aio.gws import GWS
+from resttools.aio.nws import NWS
+from resttools.aio.dao import IRWS_DAO
+from resttools.dao_implementation.aio import close_sessions
+from resttools.exceptions import DataFailureException, DeadlineExceeded
+from resttools.test.server import StandInServer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class AIO_Test():
+
+    def __init__(self):
+        self.irws = IRWS(settings.IRWS_CONF)
+        self.gws = GWS(settings.GWS_CONF)
+        self.nws = NWS(settings.NWS_CONF)
+
+    def test_get_person_file(self):
+        person = run(self.irws.get_person(netid='wdspud867'))
+        eq_(person.lname, 'Daywork')
+        eq_(run(self.irws.get_person(netid='pud867')), None)
+
+    def test_multi_call_file(self):
+        eq_(run(self.irws.verify_sc_pin('user1s', '123456')), 200)
+        eq_(run(self.irws.get_verify_qna('user1q', ['skyblue', 'mememe', 'begood'])), True)
+        uwhr = run(self.irws.post_hr_person_by_netid('javerage', wp_publish='E'))
+        eq_(uwhr.wp_publish, 'E')
+
+    def test_gather_file(self):
+        async def lookups():
+            return await asyncio.gather(self.irws.get_person(netid='wdspud867'),
+                                        self.irws.get_sdb_person('000083856'),
+                                        self.gws.get_group_by_id('course_2015spr-phys114a'),
+                                        self.nws.get_netid_admins('groups'))
+        person, sdb, group, admins = run(lookups())
+        eq_(person.fname, 'Spud')
+        eq_(sdb.lname, 'STUDENT')
+        eq_(group.name, 'course_2015spr-phys114a')
+        eq_(len(admins), 3)
+
+    @raises(DataFailureException)
+    def test_gws_error_file(self):
+        run(self.gws.get_members('course_2015spr-phys114a'))
+
+    def test_sync_membership_file(self):
+        summary = run(self.gws.sync_membership('u_fox_unittest', ['fox', 'imf', 'pass']))
+        eq_((len(summary['added']), len(summary['removed']), summary['full']), (0, 0, False))
+        summary = run(self.gws.sync_membership('u_fox_unittest', ['fox'], threshold=0))
+        eq_(list(summary['removed'].names()), ['imf', 'pass'])
+        ok_(summary['full'])
+        ok_(summary['bytes_sent'] > 0)
+
+    def test_iter_effective_members_file(self):
+        async def names(gws, group_id):
+            return [m.name async for m in gws.iter_effective_members(group_id)]
+
+        expected = [m.name for m in run(self.gws.get_effective_members('u_fox_unittest'))]
+        eq_(run(names(self.gws, 'u_fox_unittest')), expected)
+        eq_(run(names(GWS(dict(settings.GWS_CONF, API_VERSION='v3')), 'u_fox_unittest')), expected)
+        assert_raises(DataFailureException, run, names(self.gws, 'u_fox_nosuchgroup'))
+
+    def test_iter_effective_members_live(self):
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            raise SkipTest('aiohttp is not installed')
+
+        async def stream(gws):
+            try:
+                names = [m.name async for m in gws.iter_effective_members('u_fox_big')]
+                # abandoning a stream part way leaves the connections usable
+                members = gws.iter_effective_members('u_fox_big')
+                await members.__anext__()
+                await members.aclose()
+                return names, len([m async for m in gws.iter_effective_members('u_fox_big')])
+            finally:
+                await close_sessions()
+
+        body = ('<gws><group><name>u_fox_big</name><members>%s</members></group></gws>' %
+                ''.join('<member type="uwnetid">user%d</member>' % i for i in range(20000)))
+        routes = {'/group_sws/v2/group/u_fox_big/effective_member': (200, body)}
+        with StandInServer('gws', settings.GWS_CONF, routes=routes) as server:
+            gws = GWS(dict(settings.GWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=1))
+            names, count = run(stream(gws))
+            eq_(len(names), 20000)
+            eq_(names[-1], 'user19999')
+            eq_(count, 20000)
+            eq_(len(server.requests), 3)
+
+    def test_get_person_live(self):
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            raise SkipTest('aiohttp is not installed')
+
+        async def lookups(irws):
+            try:
+                return await asyncio.gather(*[irws.get_person(netid=n) for n in ('wdspud867', 'pud867')])
+            finally:
+                await close_sessions()
+
+        with StandInServer('irws', settings.IRWS_CONF) as server:
+            irws = IRWS(dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url))
+            person, missing = run(lookups(irws))
+        eq_(person.lname, 'Daywork')
+        eq_(missing, None)
+
+    def test_deadline_live(self):
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            raise SkipTest('aiohttp is not installed')
+
+        async def verify(irws, deadline):
+            try:
+                return await irws.get_verify_qna('user1q', ['skyblue', 'mememe', 'begood'], deadline=deadline)
+            finally:
+                await close_sessions()
+
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.2) as server:
+            irws = IRWS(dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url))
+            eq_(run(verify(irws, 5.0)), True)
+            started = time.time()
+            assert_raises(DeadlineExceeded, run, verify(irws, 0.5))
+            ok_(time.time() - started < 0.65)
+
+    def test_get_urls_file(self):
+        dao = IRWS_DAO(settings.IRWS_CONF)
+        responses = run(dao.getURLs(['/registry-dev/v2/person/hepps/123456789',
+                                     '/registry-dev/v2/person/notthere'], {}))
+        eq_([r.status for r in responses], [200, 404])
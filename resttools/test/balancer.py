@@ -0,0 +1,102 @@
+import time
+from nose.tools import *
+
+from resttools import metrics
+from resttools.deadline import Deadline
+from resttools.exceptions import DeadlineExceeded
+from resttools.dao_implementation import balancer, live, circuit
+from resttools.dao_implementation.balancer import Balancer
+from resttools.irws import IRWS
+from resttools.test.server import StandInServer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+DEAD_HOST = 'http://127.0.0.1:1'
+
+
+class Balancer_Test():
+
+    def setup(self):
+        balancer.clear_balancers()
+        live.clear_pools()
+        circuit.clear_breakers()
+
+    def test_least_outstanding(self):
+        b = Balancer('irws', ['a', 'b', 'c'])
+        eq_([b.choose(), b.choose(), b.choose()], ['a', 'b', 'c'])
+        b.finish('b', True, 0.01)
+        eq_(b.choose(), 'b')
+        eq_(b.choose(exclude=['b']), 'a')
+
+    def test_latency_policy(self):
+        b = Balancer('irws', ['a', 'b'], policy='latency')
+        for host, elapsed in (('a', 0.5), ('b', 0.01)):
+            eq_(b.choose(exclude=['b'] if host == 'a' else ['a']), host)
+            b.finish(host, True, elapsed)
+        eq_(b.choose(), 'b')
+        eq_(b.choose(), 'b')
+
+    def test_eject_and_readmit(self):
+        b = Balancer('irws', ['a', 'b'], eject_after=2, eject_time=0.1)
+        for i in range(2):
+            eq_(b.choose(exclude=['b']), 'a')
+            b.finish('a', False, 0.01)
+        ok_(b.status()['a']['ejected'])
+        eq_(b.choose(), 'b')
+        b.finish('b', True, 0.01)
+        # every candidate ejected: use it anyway rather than fail
+        eq_(b.choose(exclude=['b']), 'a')
+        b.finish('a', True, 0.01)
+        time.sleep(0.15)
+        eq_(b.choose(exclude=['b']), 'a')
+        ok_(not b.status()['a']['ejected'])
+        # on probation: one failure ejects again
+        b.finish('a', False, 0.01)
+        ok_(b.status()['a']['ejected'])
+
+    def test_single_host(self):
+        eq_(balancer.get_balancer('irws', {'HOST': 'http://x'}), None)
+        eq_(balancer.hosts({'HOST': 'http://x'}), ['http://x'])
+
+    def test_failover(self):
+        with StandInServer('irws', settings.IRWS_CONF) as one:
+            with StandInServer('irws', settings.IRWS_CONF) as two:
+                conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=[DEAD_HOST, one.url, two.url],
+                            RETRIES=0, LOAD_BALANCER={'EJECT_AFTER': 2})
+                failovers = metrics.get_counter('failovers', 'irws')
+                ejections = metrics.get_counter('ejections', 'irws')
+                irws = IRWS(conf)
+                for i in range(10):
+                    eq_(irws.get_person(netid='wdspud867').lname, 'Daywork')
+                eq_(metrics.get_counter('ejections', 'irws') - ejections, 1)
+                eq_(metrics.get_counter('failovers', 'irws') - failovers, 2)
+                ok_(one.requests and two.requests)
+                eq_(len(one.requests) + len(two.requests), 10)
+                status = balancer.get_balancer('irws', conf).status()
+                ok_(status[DEAD_HOST]['ejected'])
+                eq_(sum(s['outstanding'] for s in status.values()), 0)
+
+    def test_error_response_not_failed_over(self):
+        routes = {'/registry-dev/v2/person': (503, 'down')}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as one:
+            with StandInServer('irws', settings.IRWS_CONF, routes=routes) as two:
+                conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=[one.url, two.url], RETRIES=0)
+                dao = IRWS(conf).dao._getDAO()
+                response = dao._request('GET', '/registry-dev/v2/person?uwnetid=x', {})
+                eq_(response.status, 503)
+                eq_(len(one.requests) + len(two.requests), 1)
+
+    def test_deadline_finishes_request(self):
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.3) as one:
+            with StandInServer('irws', settings.IRWS_CONF, delay=0.3) as two:
+                conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=[one.url, two.url], RETRIES=0,
+                            SINGLE_FLIGHT=False)
+                irws = IRWS(conf)
+                for i in range(3):
+                    with Deadline(0.1):
+                        assert_raises(DeadlineExceeded, irws.get_person, netid='wdspud867')
+                status = balancer.get_balancer('irws', conf).status()
+                eq_(sum(s['outstanding'] for s in status.values()), 0)
@@ -0,0 +1,118 @@
+import time
+from nose.tools import *
+
+from resttools import cache
+from resttools.cache import ResponseCache
+from resttools.dao import GWS_DAO
+from resttools.dao_implementation.irws import File as IRWSFile
+from resttools.irws import IRWS
+from resttools.mock.mock_http import MockHTTP
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class CountingDAO(object):
+    def __init__(self, conf):
+        self.calls = []
+
+    def getURL(self, url, headers):
+        self.calls.append(url)
+        response = MockHTTP()
+        response.status = 404 if 'missing' in url else 200
+        response.data = '%s %s' % (url, len(self.calls))
+        return response
+
+    def putURL(self, url, headers, body):
+        response = MockHTTP()
+        response.status = 200
+        return response
+
+
+def _response(data, status=200):
+    response = MockHTTP()
+    response.status = status
+    response.data = data
+    return response
+
+
+class Cache_Test():
+
+    def setup(self):
+        cache.clear_caches()
+        self.conf = dict(settings.GWS_CONF, CACHE_TTL=60)
+
+    def test_cache_off_by_default(self):
+        eq_(GWS_DAO(settings.GWS_CONF)._cache, None)
+
+    def test_read_through(self):
+        dao = GWS_DAO(self.conf, dao_factory=CountingDAO)
+        first = dao.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml'})
+        second = dao.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml'})
+        eq_(first.data, second.data)
+        eq_(len(dao._getDAO().calls), 1)
+        # another service object shares the cache
+        other = GWS_DAO(self.conf, dao_factory=CountingDAO)
+        eq_(other.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml'}).data, first.data)
+        eq_(other._getDAO().calls, [])
+
+    def test_key_includes_accept_and_actas(self):
+        dao = GWS_DAO(self.conf, dao_factory=CountingDAO)
+        dao.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml'})
+        dao.getURL('/group_sws/v2/group/a', {'Accept': 'application/json'})
+        dao.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml', 'X-UW-Act-as': 'fox'})
+        dao.getURL('/group_sws/v2/group/a', {'Accept': 'text/xml', 'X-UW-Act-as': 'fox'})
+        eq_(len(dao._getDAO().calls), 3)
+
+    def test_errors_not_cached(self):
+        dao = GWS_DAO(self.conf, dao_factory=CountingDAO)
+        dao.getURL('/group_sws/v2/group/missing', {})
+        dao.getURL('/group_sws/v2/group/missing', {})
+        eq_(len(dao._getDAO().calls), 2)
+
+    def test_write_invalidates(self):
+        dao = GWS_DAO(self.conf, dao_factory=CountingDAO)
+        dao.getURL('/group_sws/v2/group/a', {})
+        dao.getURL('/group_sws/v2/group/a/member', {})
+        dao.getURL('/group_sws/v2/group/b', {})
+        dao.putURL('/group_sws/v2/group/a/member/fox', {}, None)
+        for url in ('/group_sws/v2/group/a', '/group_sws/v2/group/a/member', '/group_sws/v2/group/b'):
+            dao.getURL(url, {})
+        eq_(len(dao._getDAO().calls), 5)
+
+    def test_irws_put_then_get(self):
+        irws = IRWS(dict(settings.IRWS_CONF, CACHE_TTL=60))
+        irws.get_name_by_netid('javerage')
+        saved = dict(IRWSFile._cache_db)
+        try:
+            irws.put_name_by_netid('javerage', first='Cached', middle='', last='Student')
+            eq_(irws.get_name_by_netid('javerage').preferred_fname, 'Cached')
+        finally:
+            IRWSFile._cache_db.clear()
+            IRWSFile._cache_db.update(saved)
+
+    def test_ttl_patterns(self):
+        c = ResponseCache(ttl=60, ttls=[(r'/qna', 0), (r'/person', 0.05)])
+        eq_(c.ttl_for('/registry-dev/v2/qna?uwnetid=x'), 0)
+        eq_(c.ttl_for('/registry-dev/v2/name/uwnetid=x'), 60)
+        c.put(c.key('/v2/qna', {}), _response('q'))
+        eq_(c.get(c.key('/v2/qna', {})), None)
+        c.put(c.key('/v2/person', {}), _response('p'))
+        eq_(c.get(c.key('/v2/person', {})).data, 'p')
+        time.sleep(0.06)
+        eq_(c.get(c.key('/v2/person', {})), None)
+
+    def test_lru_byte_budget(self):
+        c = ResponseCache(ttl=60, max_bytes=10)
+        for url in ('/a', '/b', '/c'):
+            c.put(c.key(url, {}), _response('xxxx'))
+            c.get(c.key('/a', {}))
+        ok_(c.get(c.key('/a', {})) is not None)
+        eq_(c.get(c.key('/b', {})), None)
+        ok_(c.get(c.key('/c', {})) is not None)
+        eq_(c.stats()['bytes'], 8)
+        eq_(c.stats()['evictions'], 1)
+        c.put(c.key('/big', {}), _response('x' * 11))
+        eq_(c.get(c.key('/big', {})), None)
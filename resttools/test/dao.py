@@ -0,0 +1,173 @@
+import threading
+import time
+from nose.tools import *
+
+from resttools.dao import IRWS_DAO, GWS_DAO
+from resttools.dao_implementation.irws import File as IRWSFile
+from resttools.dao_implementation.gws import Live as GWSLive
+from resttools.mock.mock_http import MockHTTP
+from resttools import deadline, singleflight
+from resttools.deadline import Deadline
+from resttools.exceptions import DeadlineExceeded
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class EchoDAO(object):
+    def __init__(self, conf):
+        self.conf = conf
+
+    def getURL(self, url, headers):
+        if 'fail' in url:
+            raise IOError(url)
+        response = MockHTTP()
+        response.status = 200
+        response.data = url
+        return response
+
+
+class SlowDAO(object):
+    calls = []
+
+    def __init__(self, conf):
+        pass
+
+    def getURL(self, url, headers):
+        SlowDAO.calls.append(url)
+        time.sleep(0.1)
+        if 'fail' in url:
+            raise IOError(url)
+        response = MockHTTP()
+        response.status = 200
+        response.data = url
+        return response
+
+
+def _concurrently(func, count=10):
+    results = []
+    start = threading.Event()
+
+    def worker():
+        start.wait()
+        try:
+            results.append(func())
+        except Exception as ex:
+            results.append(ex)
+
+    threads = [threading.Thread(target=worker) for i in range(count)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+class DAO_Test():
+
+    def setup(self):
+        singleflight.clear_groups()
+        SlowDAO.calls = []
+
+    def test_dao_resolved_once(self):
+        dao = IRWS_DAO(settings.IRWS_CONF)
+        first = dao._getDAO()
+        ok_(isinstance(first, IRWSFile))
+        ok_(dao._getDAO() is first)
+
+    def test_dao_run_mode_live(self):
+        dao = GWS_DAO(dict(settings.GWS_CONF, RUN_MODE='Live'))
+        ok_(isinstance(dao._getDAO(), GWSLive))
+
+    def test_dao_factory(self):
+        dao = IRWS_DAO(settings.IRWS_CONF, dao_factory=EchoDAO)
+        eq_(dao.getURL('/echo', {}).data, '/echo')
+        ok_(dao._getDAO().conf is settings.IRWS_CONF)
+
+    def test_dao_factory_from_conf(self):
+        conf = dict(settings.IRWS_CONF, DAO_FACTORY='resttools.test.dao.EchoDAO')
+        dao = IRWS_DAO(conf)
+        ok_(isinstance(dao._getDAO(), EchoDAO))
+
+    def test_get_urls_file(self):
+        dao = IRWS_DAO(settings.IRWS_CONF)
+        urls = ['/registry-dev/v2/person/hepps/123456789',
+                '/registry-dev/v2/person/notthere',
+                '/registry-dev/v2/person/sdb/000083856']
+        responses = dao.getURLs(urls, {'Accept': 'application/json'})
+        eq_([r.status for r in responses], [200, 404, 200])
+        ok_('hepps' in responses[0].data)
+
+    def test_get_urls_exceptions_in_order(self):
+        dao = IRWS_DAO(settings.IRWS_CONF, dao_factory=EchoDAO)
+        urls = ['/u%d' % i for i in range(20)] + ['/fail']
+        results = dao.getURLs(urls, {})
+        eq_([r.data for r in results[:-1]], urls[:-1])
+        ok_(isinstance(results[-1], IOError))
+
+    def test_get_urls_as_completed(self):
+        dao = IRWS_DAO(settings.IRWS_CONF, dao_factory=EchoDAO)
+        urls = ['/u%d' % i for i in range(10)] + ['/fail']
+        results = dict(dao.getURLs(urls, {}, ordered=False))
+        eq_(sorted(results), sorted(urls))
+        ok_(isinstance(results['/fail'], IOError))
+        eq_(results['/u3'].data, '/u3')
+
+    def test_single_flight(self):
+        conf = dict(settings.GWS_CONF, HOST='single-flight')
+        results = _concurrently(
+            lambda: GWS_DAO(conf, dao_factory=SlowDAO).getURL('/group', {'Accept': 'text/xml'}))
+        eq_(SlowDAO.calls, ['/group'])
+        eq_(set(r.data for r in results), set(['/group']))
+        eq_(len(results), 10)
+
+    def test_single_flight_shares_errors(self):
+        conf = dict(settings.GWS_CONF, HOST='single-flight')
+        results = _concurrently(lambda: GWS_DAO(conf, dao_factory=SlowDAO).getURL('/fail', {}))
+        eq_(SlowDAO.calls, ['/fail'])
+        ok_(all(isinstance(r, IOError) for r in results))
+
+    def test_single_flight_leader_deadline(self):
+        group = singleflight.SingleFlight('irws')
+        calls = []
+
+        def fetch():
+            calls.append(threading.current_thread().name)
+            time.sleep(0.1)
+            deadline.check('/group')
+            return 'ok'
+
+        def hurried():
+            with Deadline(0.05):
+                return group.do('/group', fetch)
+
+        leader = threading.Thread(target=lambda: assert_raises(DeadlineExceeded, hurried))
+        leader.start()
+        time.sleep(0.02)
+        # the leader's short deadline is not this caller's
+        eq_(group.do('/group', fetch), 'ok')
+        leader.join()
+        eq_(len(calls), 2)
+
+    def test_single_flight_keys_on_headers(self):
+        dao = GWS_DAO(settings.GWS_CONF, dao_factory=SlowDAO)
+        _concurrently(lambda: dao.getURL('/group', {'X-UW-Act-as': str(threading.current_thread().ident)}), 3)
+        eq_(len(SlowDAO.calls), 3)
+
+    def test_single_flight_keys_on_priority(self):
+        conf = dict(settings.GWS_CONF, HOST='single-flight')
+        batch = GWS_DAO(conf, dao_factory=SlowDAO, priority='background')
+        thread = threading.Thread(target=lambda: batch.getURL('/group', {}))
+        thread.start()
+        time.sleep(0.02)
+        eq_(GWS_DAO(conf, dao_factory=SlowDAO).getURL('/group', {}).data, '/group')
+        thread.join()
+        eq_(SlowDAO.calls, ['/group', '/group'])
+
+    def test_single_flight_off(self):
+        conf = dict(settings.GWS_CONF, SINGLE_FLIGHT=False)
+        _concurrently(lambda: GWS_DAO(conf, dao_factory=SlowDAO).getURL('/group', {}), 3)
+        eq_(len(SlowDAO.calls), 3)
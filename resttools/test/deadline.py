@@ -0,0 +1,86 @@
+import threading
+import time
+from nose.tools import *
+
+from resttools import deadline
+from resttools.deadline import Deadline
+from resttools.exceptions import DeadlineExceeded, RateLimited
+from resttools.irws import IRWS
+from resttools.dao_implementation import circuit, live
+from resttools import ratelimit
+from resttools.test.server import StandInServer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class Deadline_Test():
+
+    def test_nesting(self):
+        eq_(deadline.remaining(), None)
+        with Deadline(1.0):
+            with Deadline(5.0):
+                ok_(deadline.remaining() <= 1.0)
+            with Deadline(0.1):
+                ok_(deadline.remaining() <= 0.1)
+            with Deadline(None):
+                ok_(0.5 < deadline.remaining() <= 1.0)
+        eq_(deadline.remaining(), None)
+
+    def test_expired(self):
+        with Deadline(0):
+            assert_raises(DeadlineExceeded, deadline.check, '/url')
+            assert_raises(DeadlineExceeded, IRWS(settings.IRWS_CONF).get_person, netid='wdspud867')
+
+    def test_bind(self):
+        seen = []
+        with Deadline(1.0):
+            func = deadline.bind(lambda: seen.append(deadline.remaining()))
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+        ok_(0 < seen[0] <= 1.0)
+        eq_(deadline.remaining(), None)
+
+    def test_multi_call(self):
+        correct = ['skyblue', 'mememe', 'begood']
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.2) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url)
+            irws = IRWS(conf)
+            eq_(irws.get_verify_qna('user1q', correct, deadline=5.0), True)
+            started = time.time()
+            assert_raises(DeadlineExceeded, irws.get_verify_qna, 'user1q', correct, deadline=0.5)
+            ok_(time.time() - started < 0.65)
+            # the deadline cut the last request's read timeout short
+            eq_(len(server.requests), 4 + 3)
+        live.clear_pools()
+
+    def test_rate_limit_wait(self):
+        ratelimit.clear_limiters()
+        irws = IRWS(dict(settings.IRWS_CONF, RATE_LIMIT=1, RATE_LIMIT_BURST=1))
+        irws.get_person(netid='wdspud867')
+        started = time.time()
+        with Deadline(0.2):
+            # the next token is a second away: give up now, not after it
+            assert_raises(RateLimited, irws.get_person, netid='wdspud867')
+        ok_(time.time() - started < 0.1)
+        ratelimit.clear_limiters()
+
+    def test_breaker_probe(self):
+        circuit.clear_breakers()
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.3) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRIES=0,
+                        SINGLE_FLIGHT=False, CIRCUIT_BREAKER={'HALF_OPEN_PROBES': 1})
+            irws = IRWS(conf)
+            breaker = circuit.get_breaker('irws', server.url, conf['CIRCUIT_BREAKER'])
+            breaker._set_state(circuit.HALF_OPEN)
+            with Deadline(0.1):
+                assert_raises(DeadlineExceeded, irws.get_person, netid='wdspud867')
+            # a probe cut short by the deadline says nothing about the host
+            eq_(breaker.state, circuit.HALF_OPEN)
+            eq_(irws.get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(breaker.state, circuit.CLOSED)
+        live.clear_pools()
+        circuit.clear_breakers()
@@ -0,0 +1,118 @@
+import os
+import threading
+import traceback
+from nose.tools import *
+
+from resttools import forksafe, metrics
+from resttools.cache import get_cache
+from resttools.dao_implementation import live
+from resttools.dao_implementation.irws import Live as IRWSLive
+from resttools.irws import IRWS
+from resttools.dao import IRWS_DAO
+from resttools.test.server import StandInServer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+def _in_child(func):
+    """
+    Run func in a forked child; return its exit status, 0 if it returned.
+    """
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            func()
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+    return os.waitpid(pid, 0)[1]
+
+
+class ForkSafe_Test():
+
+    def setup(self):
+        live.clear_pools()
+
+    def test_child_gets_own_pool(self):
+        with StandInServer('irws', settings.IRWS_CONF) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=2,
+                        CACHE_TTL=60, SINGLE_FLIGHT=False)
+            irws = IRWS(conf)
+            eq_(irws.get_person(netid='wdspud867').lname, 'Daywork')
+            parent_pool = irws.dao._getDAO()._get_pool()
+            cache = get_cache('irws', conf)
+            eq_(cache.stats()['entries'], 1)
+
+            def child():
+                # the parent's pool, its cached response and its metrics stay behind
+                eq_(cache.stats()['entries'], 0)
+                eq_(metrics.get_metrics()['counters'], {})
+                errors = []
+
+                def worker():
+                    try:
+                        for i in range(5):
+                            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+                            cache.clear()
+                    except Exception as ex:
+                        errors.append(ex)
+                workers = [threading.Thread(target=worker) for i in range(4)]
+                for t in workers:
+                    t.start()
+                for t in workers:
+                    t.join()
+                eq_(errors, [])
+                pool = irws.dao._getDAO()._get_pool()
+                ok_(pool is not parent_pool)
+                ok_(0 < pool.num_connections <= 2)
+
+            # a lock held by another thread when the child is forked
+            # must not deadlock the child
+            with live._pools_lock:
+                status = _in_child(child)
+            eq_(status, 0)
+            ok_(irws.dao._getDAO()._get_pool() is parent_pool)
+            cache.clear()
+            eq_(irws.get_person(netid='wdspud867').lname, 'Daywork')
+
+    def test_check_without_fork_hook(self):
+        # what a platform without os.register_at_fork sees on first use;
+        # only a local reset runs, so other tests keep their pools
+        resets = []
+        saved = forksafe._pid, forksafe._resets
+        forksafe._resets = []
+        forksafe.register(lambda: resets.append(os.getpid()))
+        forksafe._pid = -1
+        try:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live')
+            IRWSLive(conf)._get_pool()
+            eq_(resets, [os.getpid()])
+            eq_(forksafe._pid, os.getpid())
+            IRWSLive(conf)._get_pool()
+            eq_(len(resets), 1)
+        finally:
+            forksafe._pid, forksafe._resets = saved
+
+    def test_check_on_dao_request(self):
+        # File mode DAOs never look up a pool, but reset all the same
+        resets = []
+        saved = forksafe._pid, forksafe._resets
+        forksafe._resets = []
+        forksafe.register(lambda: resets.append(os.getpid()))
+        try:
+            dao = IRWS_DAO(settings.IRWS_CONF)
+            url = '/registry-dev/v2/person/sdb/000083856'
+            forksafe._pid = -1
+            eq_(dao.getURL(url, {'Accept': 'application/json'}).status, 200)
+            eq_(resets, [os.getpid()])
+            forksafe._pid = -1
+            eq_(dao._send('getURL', url, {'Accept': 'application/json'}).status, 200)
+            eq_(len(resets), 2)
+        finally:
+            forksafe._pid, forksafe._resets = saved
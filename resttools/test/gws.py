@@ -1,15 +1,24 @@
 import json
+import os
+import time
 import logging
 from nose.tools import *
 
 from resttools.gws import GWS
+from resttools.gws_backend import get_backend
+from resttools.models.gws import Group, CourseGroup, GroupMember, MemberList
 from resttools.exceptions import DataFailureException
+from resttools import metrics, cache
+from resttools.dao_implementation import live
+from resttools.test.server import StandInServer
 
 import resttools.test.test_settings as settings
 import logging.config
 logging.config.dictConfig(settings.LOGGING)
 logger = logging.getLogger(__name__)
 
+V3_GROUPS = os.path.abspath(os.path.dirname(__file__)) + '/../mock/gws/group_sws/v3/group'
+
 
 class GWS_Test():
 
@@ -29,3 +38,191 @@ class GWS_Test():
     @raises(DataFailureException)
     def test_get_group_members_403(self):
         members = self.gws.get_members('course_2015spr-phys114a')
+
+    def test_conditional_get(self):
+        cache.clear_caches()
+        gws = GWS(dict(settings.GWS_CONF, CONDITIONAL_GET=True))
+        revalidations = metrics.get_counter('revalidations', 'gws')
+        not_modified = metrics.get_counter('not_modified', 'gws')
+        group = gws.get_group_by_id('u_fox_unittest')
+        group.title = 'changed by caller'
+        again = gws.get_group_by_id('u_fox_unittest')
+        eq_(again.title, 'Test group for resttools unittest')
+        eq_(len(gws.get_members('u_fox_unittest')), 3)
+        eq_(len(gws.get_members('u_fox_unittest')), 3)
+        # no validators in the mock data: never revalidated
+        gws.get_group_by_id('course_2015spr-phys114a')
+        gws.get_group_by_id('course_2015spr-phys114a')
+        eq_(metrics.get_counter('revalidations', 'gws') - revalidations, 2)
+        eq_(metrics.get_counter('not_modified', 'gws') - not_modified, 2)
+
+    def test_conditional_get_off(self):
+        revalidations = metrics.get_counter('revalidations', 'gws')
+        self.gws.get_group_by_id('u_fox_unittest')
+        self.gws.get_group_by_id('u_fox_unittest')
+        eq_(metrics.get_counter('revalidations', 'gws'), revalidations)
+
+    def test_iter_effective_members(self):
+        members = list(self.gws.iter_effective_members('u_fox_unittest'))
+        eq_([m.name for m in members], [m.name for m in self.gws.get_effective_members('u_fox_unittest')])
+        eq_(members[0].name, 'javerage')
+        eq_(members[0].member_type, 'uwnetid')
+
+    @raises(DataFailureException)
+    def test_iter_effective_members_404(self):
+        list(self.gws.iter_effective_members('u_fox_nosuchgroup'))
+
+    def test_iter_effective_members_live(self):
+        body = ('<gws><group><name>u_fox_big</name><members>%s</members></group></gws>' %
+                ''.join('<member type="uwnetid">user%d</member>' % i for i in range(20000)))
+        routes = {'/group_sws/v2/group/u_fox_big/effective_member': (200, body)}
+        with StandInServer('gws', settings.GWS_CONF, routes=routes) as server:
+            gws = GWS(dict(settings.GWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=1))
+            names = [m.name for m in gws.iter_effective_members('u_fox_big')]
+            eq_(len(names), 20000)
+            eq_(names[-1], 'user19999')
+            # abandoning a stream part way leaves the pool usable
+            members = gws.iter_effective_members('u_fox_big')
+            next(members)
+            members.close()
+            eq_(len(list(gws.iter_effective_members('u_fox_big'))), 20000)
+            eq_(len(server.requests), 3)
+        live.clear_pools()
+
+    def test_v3_group(self):
+        gws = GWS(dict(settings.GWS_CONF, API_VERSION='v3'))
+        for group_id, publish in (('u_fox_unittest', 'yes'), ('course_2015spr-phys114a', 'no')):
+            v2 = self.gws.get_group_by_id(group_id).__dict__
+            v3 = gws.get_group_by_id(group_id)
+            eq_(type(v3), CourseGroup if group_id.startswith('course_') else Group)
+            # v3 publishEmail is a flag, v2 publishemail the address
+            eq_(v3.publishemail, publish)
+            v2['publishemail'] = publish
+            eq_(v3.__dict__, v2)
+        group = gws.get_group_by_id('course_2015spr-phys114a')
+        eq_(group.quarter, 'spring')
+        eq_(group.curriculum_abbr, 'PHYS')
+        eq_([i.name for i in group.instructors], ['susanh82', 'blinov', 'kaimeifu'])
+
+    def test_v3_members(self):
+        gws = GWS(dict(settings.GWS_CONF, API_VERSION='v3'))
+        for method in ('get_members', 'get_effective_members', 'iter_effective_members'):
+            v2 = getattr(self.gws, method)('u_fox_unittest')
+            v3 = getattr(gws, method)('u_fox_unittest')
+            eq_(list(v3), list(v2))
+        eq_(gws.get_effective_member_count('u_fox_unittest'), 4)
+        eq_([g.name for g in gws.search_groups(stem='u_fox_unittest')],
+            [g.name for g in self.gws.search_groups(stem='u_fox_unittest')])
+
+    def test_v3_put(self):
+        gws = GWS(dict(settings.GWS_CONF, API_VERSION='v3'))
+        group = gws.get_group_by_id('u_fox_unittest')
+        group.title = 'renamed'
+        # the mock echoes the body back
+        eq_(gws.put_group(group).__dict__, group.__dict__)
+        members = gws.get_members('u_fox_unittest')
+        eq_(gws.put_membership('u_fox_unittest', members), [])
+        eq_(gws._backend.decode_notfound('{"errors": [{"status": 404, "notFound": ["nobody"]}]}'), ['nobody'])
+
+    def test_v3_round_trip(self):
+        backend = get_backend('v3')
+        for group_id in ('u_fox_unittest.resource', 'course_2015spr-phys114a'):
+            with open(os.path.join(V3_GROUPS, group_id)) as f:
+                data = f.read()
+            group = backend.decode_group(data)
+            eq_(json.loads(backend.encode_group(group)), json.loads(data))
+        eq_(group.sln, '18188')
+        eq_((group.emailenabled, group.reporttoorig), ('disabled', 'no'))
+
+    @raises(ValueError)
+    def test_unknown_api_version(self):
+        GWS(dict(settings.GWS_CONF, API_VERSION='v9'))
+
+    def test_member_list(self):
+        members = self.gws.get_effective_members('u_fox_unittest')
+        ok_(isinstance(members, MemberList))
+        eq_(len(members), 4)
+        eq_(list(members.names()), ['javerage', 'fox', 'imf', 'pass'])
+        eq_(members[0], GroupMember('javerage', 'uwnetid'))
+        eq_(members[-1].name, 'pass')
+        ok_('imf' in members)
+        ok_(GroupMember('imf', 'uwnetid') in members)
+        ok_(GroupMember('imf', 'eppn') not in members)
+        ok_('nobody' not in members)
+
+        direct = self.gws.get_members('u_fox_unittest')
+        eq_(list((members - direct).names()), ['javerage'])
+        eq_(list((direct & members).names()), ['fox', 'imf', 'pass'])
+        extra = [GroupMember('x315.cac.washington.edu', 'dns'), GroupMember('fox', 'uwnetid')]
+        eq_(list((direct | extra).pairs()),
+            [('fox', 'uwnetid'), ('imf', 'uwnetid'), ('pass', 'uwnetid'), ('x315.cac.washington.edu', 'dns')])
+        eq_(MemberList(direct), direct)
+        eq_(direct[1:], [GroupMember('imf', 'uwnetid'), GroupMember('pass', 'uwnetid')])
+
+    def test_member_list_untyped(self):
+        members = MemberList.from_pairs([('b', 'uwnetid'), ('a', None), ('a', 'uwnetid')])
+        ok_('a' in members)
+        ok_(GroupMember('a', None) in members)
+        ok_(GroupMember('a', '') in members)
+        eq_(members[1], GroupMember('a', ''))
+        eq_(list(members.sorted_pairs()), [('a', ''), ('a', 'uwnetid'), ('b', 'uwnetid')])
+        eq_(list((members - [GroupMember('a', None)]).pairs()), [('a', 'uwnetid'), ('b', 'uwnetid')])
+
+    def test_sync_membership(self):
+        notfound = ('<gws><notfoundmembers><notfoundmember>newbie</notfoundmember></notfoundmembers></gws>')
+        base = '/group_sws/v2/group/u_fox_unittest/member'
+        routes = {base + '/javerage,newbie,g:u_fox_sub': (200, notfound),
+                  base + '/pass': (200, '<gws/>')}
+        with StandInServer('gws', settings.GWS_CONF, routes=routes) as server:
+            gws = GWS(dict(settings.GWS_CONF, RUN_MODE='Live', HOST=server.url))
+            desired = ['fox', 'imf', 'javerage', 'newbie', GroupMember('u_fox_sub', 'group')]
+            summary = gws.sync_membership('u_fox_unittest', desired, threshold=10)
+            eq_(list(summary['added'].names()), ['javerage', 'newbie', 'u_fox_sub'])
+            eq_(list(summary['removed'].names()), ['pass'])
+            eq_(summary['notfound'], ['newbie'])
+            ok_(not summary['full'])
+            eq_([(method, path) for method, path, headers in server.requests[1:]],
+                [('PUT', base + '/javerage,newbie,g:u_fox_sub'), ('DELETE', base + '/pass')])
+            eq_(summary['bytes_sent'], len(base + '/javerage,newbie,g:u_fox_sub') + len(base + '/pass'))
+
+            # nothing to change: nothing sent
+            del server.requests[:]
+            summary = gws.sync_membership('u_fox_unittest', ['pass', 'imf', 'fox'])
+            eq_((len(summary['added']), len(summary['removed']), summary['bytes_sent']), (0, 0, 0))
+            eq_(len(server.requests), 1)
+
+            # over the threshold: the whole list
+            del server.requests[:]
+            summary = gws.sync_membership('u_fox_unittest', desired, threshold=2)
+            ok_(summary['full'])
+            method, path, headers = server.requests[-1]
+            eq_((method, path), ('PUT', base))
+            eq_(summary['bytes_sent'], len(base) + int(headers['Content-Length']))
+        live.clear_pools()
+
+    def test_put_members_chunked(self):
+        conf = dict(settings.GWS_CONF, RUN_MODE='Live', MAX_URL_LENGTH=100, MAX_POOL_SIZE=4, RETRIES=0)
+        members = ['user%02d' % i for i in range(40)]
+        urls = GWS(conf)._members_urls('u_fox_unittest', members)
+        ok_(len(urls) > 2)
+        ok_(all(len(url) <= 100 for url in urls))
+        eq_(','.join(url.rsplit('/', 1)[1] for url in urls), ','.join(members))
+
+        def notfound(url):
+            ids = [i for i in url.rsplit('/', 1)[1].split(',') if i.endswith('7')]
+            return (200, '<gws><notfoundmembers>%s</notfoundmembers></gws>' %
+                    ''.join('<notfoundmember>%s</notfoundmember>' % i for i in ids))
+        routes = dict((url, notfound(url)) for url in urls)
+        with StandInServer('gws', settings.GWS_CONF, routes=routes, delay=0.2) as server:
+            gws = GWS(dict(conf, HOST=server.url))
+            started = time.time()
+            eq_(sorted(gws.put_members('u_fox_unittest', members)), ['user07', 'user17', 'user27', 'user37'])
+            # the chunks went at once, not one after another
+            ok_(time.time() - started < 0.2 * len(urls) - 0.1)
+            eq_(sorted(path for method, path, headers in server.requests), sorted(urls))
+            ok_(gws.delete_members('u_fox_unittest', members))
+            eq_([method for method, path, headers in server.requests[len(urls):]], ['DELETE'] * len(urls))
+
+            routes[urls[2]] = (500, 'oops')
+            assert_raises(DataFailureException, gws.put_members, 'u_fox_unittest', members)
+        live.clear_pools()
@@ -0,0 +1,425 @@
+import ssl
+import threading
+import time
+from nose.tools import *
+from urllib3.exceptions import EmptyPoolError, MaxRetryError
+
+from resttools.dao_implementation import live, circuit, retry, hedge, adaptive
+from resttools.nws import NWS
+from resttools import metrics
+from resttools.exceptions import CircuitBreakerOpen, ConcurrencyLimited, DataFailureException, PoolSaturated
+from resttools.irws import IRWS
+from resttools.test.server import StandInServer
+from resttools.dao_implementation.irws import Live as IRWSLive
+from resttools.dao_implementation.gws import Live as GWSLive
+from resttools.dao_implementation.ntfyws import Live as NtfywsLive
+from resttools.dao_implementation import balancer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+def _flaky(failures, status=503, headers=None):
+    """A route that fails the first failures times, then serves the mock data."""
+    calls = []
+
+    def route(handler):
+        calls.append(handler.path)
+        if len(calls) <= failures:
+            return status, headers or {}, 'try again'
+    return route
+
+
+def _slow_first(seconds):
+    """A route that stalls the first request, then serves the mock data."""
+    calls = []
+
+    def route(handler):
+        calls.append(handler.path)
+        if len(calls) == 1:
+            time.sleep(seconds)
+    return route
+
+
+class _FullPool(object):
+    """A pool with no connection to give."""
+    timeout = 1.0
+
+    def urlopen(self, *args, **kwargs):
+        raise EmptyPoolError(self, 'full')
+
+
+class Live_Test():
+
+    def setup(self):
+        live.clear_pools()
+        circuit.clear_breakers()
+        hedge.clear_hedgers()
+        adaptive.clear_concurrency_limiters()
+
+    def test_pool_shared_per_host(self):
+        conf = dict(settings.IRWS_CONF, RUN_MODE='Live')
+        p1 = IRWSLive(conf)._get_pool()
+        p2 = IRWSLive(conf)._get_pool()
+        ok_(p1 is p2)
+        eq_(len(live.get_pools()), 1)
+
+    def test_pool_per_host_and_identity(self):
+        dev = dict(settings.IRWS_CONF, RUN_MODE='Live')
+        prod = dict(dev, HOST='https://mango.u.washington.edu:646')
+        other_cert = dict(dev, CERT_FILE='/tmp/other.crt', KEY_FILE='/tmp/other.key')
+        pools = [IRWSLive(c)._get_pool() for c in (dev, prod, other_cert)]
+        eq_(len(set(id(p) for p in pools)), 3)
+        eq_(pools[1].host, 'mango.u.washington.edu')
+        ok_(live.pool_key(prod['HOST'], verify_https=False) in live.get_pools())
+
+    def test_pool_built_once_under_race(self):
+        conf = dict(settings.GWS_CONF, RUN_MODE='Live')
+        pools = []
+        start = threading.Event()
+
+        def worker():
+            start.wait()
+            pools.append(GWSLive(conf)._get_pool())
+
+        threads = [threading.Thread(target=worker) for i in range(20)]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+        eq_(len(set(id(p) for p in pools)), 1)
+        eq_(len(live.get_pools()), 1)
+
+    def test_timeouts_per_endpoint(self):
+        conf = dict(settings.IRWS_CONF, RUN_MODE='Live', CONNECT_TIMEOUT=1.0, READ_TIMEOUT=4.0,
+                    TIMEOUTS=[(r'/qna/', 0.5, 2.0)])
+        dao = IRWSLive(conf)
+        timeout = dao._get_timeout('/registry-dev/v2/qna/1/user1q/check?ans=x')
+        eq_((timeout.connect_timeout, timeout.read_timeout), (0.5, 2.0))
+        timeout = dao._get_timeout('/registry-dev/v2/person?uwnetid=x')
+        eq_((timeout.connect_timeout, timeout.read_timeout), (1.0, 4.0))
+        timeout = IRWSLive(dict(settings.IRWS_CONF))._get_timeout('/')
+        eq_((timeout.connect_timeout, timeout.read_timeout), (15.0, 15.0))
+
+    def test_read_timeout(self):
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.5) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, READ_TIMEOUT=0.05, RETRIES=0)
+            started = time.time()
+            assert_raises(MaxRetryError, IRWS(conf).get_person, netid='wdspud867')
+            ok_(time.time() - started < 0.5)
+
+    def test_circuit_breaker(self):
+        routes = {'/registry-dev/v2/person': (500, 'down')}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRIES=0,
+                        CIRCUIT_BREAKER={'MIN_REQUESTS': 4, 'WINDOW': 4, 'RESET_TIMEOUT': 0.2,
+                                         'HALF_OPEN_PROBES': 1})
+            irws = IRWS(conf)
+            for i in range(4):
+                assert_raises(DataFailureException, irws.get_person, netid='wdspud867')
+            breaker = circuit.get_breakers()[('irws', server.url)]
+            eq_(breaker.state, circuit.OPEN)
+            eq_(breaker.rates(), (1.0, 0.0))
+            sent = len(server.requests)
+            assert_raises(CircuitBreakerOpen, irws.get_person, netid='wdspud867')
+            eq_(len(server.requests), sent)
+
+            # half-open: a failed probe re-opens, a good one closes
+            time.sleep(0.25)
+            assert_raises(DataFailureException, irws.get_person, netid='wdspud867')
+            eq_(breaker.state, circuit.OPEN)
+            del routes['/registry-dev/v2/person']
+            time.sleep(0.25)
+            eq_(irws.get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(breaker.state, circuit.CLOSED)
+
+    def test_half_open_probe_not_sent(self):
+        breaker = circuit.CircuitBreaker('irws', 'h', half_open_probes=1)
+        breaker._set_state(circuit.HALF_OPEN)
+        for i in range(3):
+            assert_raises(PoolSaturated, live.get_live_url, _FullPool(), 'GET', 'h', '/p', {}, breaker=breaker)
+        # the probe was never sent, so its slot is free again
+        eq_(breaker.state, circuit.HALF_OPEN)
+        breaker.before('/p')
+        assert_raises(CircuitBreakerOpen, breaker.before, '/p')
+
+    def test_retry_idempotent(self):
+        routes = {'/registry-dev/v2/person': _flaky(2)}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRY_BACKOFF=0.01)
+            retries = metrics.get_counter('retries', 'irws')
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(len(server.requests), 3)
+            eq_(metrics.get_counter('retries', 'irws') - retries, 2)
+
+    def test_retry_gives_up(self):
+        routes = {'/registry-dev/v2/person': _flaky(10)}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRY_BACKOFF=0.01,
+                        RETRIES={'GET': 2})
+            assert_raises(DataFailureException, IRWS(conf).get_person, netid='wdspud867')
+            eq_(len(server.requests), 3)
+
+    def test_retry_after(self):
+        routes = {'/registry-dev/v2/person': _flaky(1, headers={'Retry-After': '120'})}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRY_AFTER_MAX=0.2)
+            started = time.time()
+            IRWS(conf).get_person(netid='wdspud867')
+            ok_(time.time() - started >= 0.2)
+
+    def test_post_not_resent(self):
+        routes = {'/nws/v1/uwnetid/joe/password': _flaky(10)}
+        with StandInServer('nws', settings.NWS_CONF, routes=routes) as server:
+            conf = dict(settings.NWS_CONF, RUN_MODE='Live', HOST=server.url, RETRY_BACKOFF=0.01)
+            assert_raises(DataFailureException, NWS(conf).set_netid_pw, 'joe', 'pw', 'auth')
+            eq_(len(server.requests), 1)
+
+    def test_post_retried_when_not_connected(self):
+        conf = dict(settings.NWS_CONF, RUN_MODE='Live', HOST='http://127.0.0.1:1', RETRY_BACKOFF=0.01)
+        retries = metrics.get_counter('retries', 'nws')
+        assert_raises(MaxRetryError, NWS(conf).set_netid_pw, 'joe', 'pw', 'auth')
+        eq_(metrics.get_counter('retries', 'nws') - retries, 3)
+
+    def test_retry_budget(self):
+        saved = retry.budget
+        retry.configure_budget(ratio=0, min_tokens=1)
+        try:
+            routes = {'/registry-dev/v2/person': _flaky(10)}
+            with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+                conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRY_BACKOFF=0.01)
+                denied = metrics.get_counter('retries_denied', 'irws')
+                irws = IRWS(conf)
+                assert_raises(DataFailureException, irws.get_person, netid='wdspud867')
+                assert_raises(DataFailureException, irws.get_person, netid='wdspud867')
+                eq_(len(server.requests), 3)
+                eq_(metrics.get_counter('retries_denied', 'irws') - denied, 2)
+        finally:
+            retry.budget = saved
+
+    def test_compression(self):
+        with StandInServer('irws', settings.IRWS_CONF, compress=True) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, COMPRESSION=True)
+            wire = metrics.get_counter('bytes_wire', 'irws')
+            body = metrics.get_counter('bytes_body', 'irws')
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(server.requests[0][2].get('Accept-Encoding'), live.ACCEPT_ENCODING)
+            wire = metrics.get_counter('bytes_wire', 'irws') - wire
+            body = metrics.get_counter('bytes_body', 'irws') - body
+            ok_(0 < wire < body)
+
+    def test_compression_off(self):
+        with StandInServer('irws', settings.IRWS_CONF, compress=True) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url)
+            wire = metrics.get_counter('bytes_wire', 'irws')
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            ok_('gzip' not in (server.requests[0][2].get('Accept-Encoding') or ''))
+            eq_(metrics.get_counter('bytes_wire', 'irws'), wire)
+
+    def test_ssl_context(self):
+        conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST='https://mango.u.washington.edu:646')
+        pool = IRWSLive(conf)._get_pool()
+        eq_(pool.conn_kw['ssl_context'].minimum_version, ssl.TLSVersion.TLSv1_2)
+        live.clear_pools()
+        pool = IRWSLive(dict(conf, TLS_MIN_VERSION='TLSv1.3'))._get_pool()
+        eq_(pool.conn_kw['ssl_context'].minimum_version, ssl.TLSVersion.TLSv1_3)
+        live.clear_pools()
+        context = live.make_ssl_context(min_version='TLSv1.3')
+        ok_(IRWSLive(dict(conf, SSL_CONTEXT=context))._get_pool().conn_kw['ssl_context'] is context)
+
+    def test_ssl_context_built_once(self):
+        conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST='https://mango.u.washington.edu:646')
+        built = []
+        make = live.make_ssl_context
+        live.make_ssl_context = lambda *args: built.append(args) or make(*args)
+        try:
+            dao = IRWSLive(conf)
+            for i in range(3):
+                dao._get_pool()
+        finally:
+            live.make_ssl_context = make
+        eq_(len(built), 1)
+
+    def test_ssl_context_urllib3_1(self):
+        # urllib3 1.26's create_urllib3_context takes no ssl_minimum_version
+        create = live.create_urllib3_context
+
+        def create_1(ssl_version=None, cert_reqs=None, options=None, ciphers=None):
+            return create(ssl_version, cert_reqs, options, ciphers)
+        live.create_urllib3_context = create_1
+        try:
+            context = live.make_ssl_context(min_version='TLSv1.3')
+        finally:
+            live.create_urllib3_context = create
+        eq_(context.minimum_version, ssl.TLSVersion.TLSv1_3)
+
+    def test_ssl_context_without_tls_version(self):
+        # what Python 2.7 and 3.6 see
+        class OldSSL(object):
+            def __getattr__(self, name):
+                if name == 'TLSVersion':
+                    raise AttributeError(name)
+                return getattr(ssl, name)
+        live.ssl = OldSSL()
+        try:
+            context = live.make_ssl_context(min_version='TLSv1.3')
+        finally:
+            live.ssl = ssl
+        no_old = ssl.OP_NO_TLSv1 | ssl.OP_NO_TLSv1_1 | ssl.OP_NO_TLSv1_2
+        eq_(context.options & no_old, no_old)
+        eq_(context.verify_mode, ssl.CERT_REQUIRED)
+
+    def test_warm_up(self):
+        with StandInServer('irws', settings.IRWS_CONF) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=3)
+            eq_(IRWS(dict(settings.IRWS_CONF)).dao.warm_up(), 0)
+            dao = IRWSLive(conf)
+            eq_(dao.warm_up(), 3)
+            pool = dao._get_pool()
+            eq_(pool.num_connections, 3)
+            # already open: nothing new to connect
+            eq_(dao.warm_up(2), 2)
+            eq_(pool.num_connections, 3)
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(pool.num_connections, 3)
+
+    def test_probe(self):
+        with StandInServer('irws', settings.IRWS_CONF) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url)
+            result = IRWSLive(conf).probe('/registry-dev/v2/person?uwnetid=wdspud867')
+            eq_(result['status'], 200)
+            ok_(result['connect'] >= 0 and result['request'] >= 0)
+            eq_(IRWS(conf).dao.probe('/nowhere')['status'], 404)
+
+    def test_pool_saturated(self):
+        metrics.reset()
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.5) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=1,
+                        POOL_TIMEOUT=0.05, CIRCUIT_BREAKER=True, SINGLE_FLIGHT=False)
+            saturated = metrics.get_counter('pool_saturated', 'irws')
+            busy = threading.Thread(target=IRWS(conf).get_person, kwargs={'netid': 'wdspud867'})
+            busy.start()
+            time.sleep(0.1)
+            started = time.time()
+            assert_raises(PoolSaturated, IRWS(conf).get_person, netid='wdspud867')
+            ok_(time.time() - started < 0.4)
+            busy.join()
+            eq_(len(server.requests), 1)
+            eq_(metrics.get_counter('pool_saturated', 'irws') - saturated, 1)
+            eq_(circuit.get_breaker('irws', server.url, True).rates()[0], 0)
+            in_use = metrics.get_histogram('pool_in_use', 'irws')
+            eq_(in_use['max'], 1)
+            ok_(metrics.get_histogram('pool_wait', 'irws')['max'] >= 0.05)
+
+    def test_ntfyws_service_name(self):
+        balancer.clear_balancers()
+        metrics.reset()
+        routes = {'/notify': (200, '{}')}
+        with StandInServer('ntfyws', settings.NTFYWS_CONF, routes=routes) as one, \
+                StandInServer('ntfyws', settings.NTFYWS_CONF, routes=routes) as two:
+            dao = NtfywsLive(dict(settings.NTFYWS_CONF, HOST=[one.url, two.url]))
+            eq_(dao.postURL('/notify', {}, '{}').status, 200)
+            eq_(list(balancer.get_balancers().keys()), [('notification', (one.url, two.url))])
+            eq_(sum(h['outstanding'] for h in dao._balancer.status().values()), 0)
+            ok_(metrics.get_histogram('pool_in_use', 'notification')['count'] >= 1)
+            eq_(metrics.get_histogram('pool_in_use', None), None)
+
+    def test_histogram(self):
+        h = metrics.Histogram(buckets=(1, 10))
+        for value in (0.5, 1, 5, 50):
+            h.observe(value)
+        snap = h.snapshot()
+        eq_(snap['buckets'], [(1, 2), (10, 1), (None, 1)])
+        eq_((snap['count'], snap['sum'], snap['min'], snap['max']), (4, 56.5, 0.5, 50))
+
+    def test_hedge_delay(self):
+        hedger = hedge.Hedger('irws', percentile=90, min_samples=10, window=10)
+        eq_(hedger.delay(), None)
+        for i in range(10):
+            hedger._latencies.append(i / 100.0)
+        eq_(hedger.delay(), 0.09)
+        hedger.close()
+
+    def test_hedge_delay_from_start(self):
+        hedger = hedge.Hedger('irws', delay=0.05, max_ratio=1.0, max_workers=1)
+        hedges = metrics.get_counter('hedges', 'irws')
+        # the only worker is busy: queued time is not hedge time
+        hedger._executor.submit(time.sleep, 0.2)
+        eq_(hedger.call(lambda: time.sleep(0.01) or 'ok'), 'ok')
+        eq_(metrics.get_counter('hedges', 'irws') - hedges, 0)
+        hedger.close()
+        eq_(hedge.get_hedger('irws', 'h', True, 4)._max_workers, 8)
+        eq_(hedge.get_hedger('nws', 'h', {'MAX_WORKERS': 3}, 4)._max_workers, 3)
+
+    def test_hedged_get(self):
+        routes = {'/registry-dev/v2/person': _slow_first(0.5)}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url,
+                        HEDGE={'DELAY': 0.05, 'MAX_RATIO': 1.0})
+            hedges = metrics.get_counter('hedges', 'irws')
+            wins = metrics.get_counter('hedge_wins', 'irws')
+            started = time.time()
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            ok_(time.time() - started < 0.4)
+            eq_(len(server.requests), 2)
+            eq_(metrics.get_counter('hedges', 'irws') - hedges, 1)
+            eq_(metrics.get_counter('hedge_wins', 'irws') - wins, 1)
+
+    def test_hedge_budget(self):
+        routes = {'/registry-dev/v2/person': _slow_first(0.2)}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url,
+                        HEDGE={'DELAY': 0.05, 'MAX_RATIO': 0})
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            eq_(len(server.requests), 1)
+
+    def test_adaptive_limit(self):
+        limiter = adaptive.AdaptiveLimiter('irws', initial_limit=4, min_limit=2, max_limit=6)
+
+        def window(latency, success=True):
+            for i in range(limiter.limit):
+                limiter.acquire('/')
+                limiter.release(latency, success)
+
+        window(0.01)
+        eq_(limiter.limit, 5)
+        window(0.05)   # five times the no-load latency
+        eq_(limiter.limit, 4)
+        window(0.01)
+        eq_(limiter.limit, 5)
+        window(0.01, success=False)
+        eq_(limiter.limit, 4)
+        for i in range(10):
+            window(0.01, success=False)
+        eq_(limiter.limit, 2)
+        window(5.0, success=None)
+        eq_(limiter.limit, 2)
+        for i in range(10):
+            window(0.01)
+        eq_(limiter.limit, 6)
+        eq_(limiter.in_flight, 0)
+
+    def test_adaptive_queue_timeout(self):
+        limiter = adaptive.AdaptiveLimiter('irws', initial_limit=1, max_limit=1, queue_timeout=0.05)
+        limiter.acquire('/')
+        assert_raises(ConcurrencyLimited, limiter.acquire, '/')
+        limiter.release(0.01)
+        limiter.acquire('/')
+
+    def test_adaptive_live(self):
+        routes = {'/registry-dev/v2/person': _flaky(10)}
+        with StandInServer('irws', settings.IRWS_CONF, routes=routes) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, RETRIES=0,
+                        MAX_POOL_SIZE=4, ADAPTIVE_CONCURRENCY={'MIN_LIMIT': 2})
+            dao = IRWSLive(conf)
+            eq_(dao.concurrency_limit(), 4)
+            irws = IRWS(conf)
+            for i in range(10):
+                assert_raises(DataFailureException, irws.get_person, netid='wdspud867')
+                time.sleep(0.01)
+            eq_(dao.concurrency_limit(), 2)
+            eq_(adaptive.get_concurrency_limiters()[('irws', server.url)].in_flight, 0)
+        eq_(IRWSLive(settings.IRWS_CONF).concurrency_limit(), None)
@@ -0,0 +1,105 @@
+import threading
+import time
+from nose.tools import *
+
+from resttools import metrics, priority
+from resttools.priority import Priority, PriorityGate
+from resttools.irws import IRWS
+from resttools.gws import GWS
+from resttools.dao_implementation import live
+from resttools.test.server import StandInServer
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+def _start(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    return thread
+
+
+class Priority_Test():
+
+    def setup(self):
+        priority.clear_gates()
+
+    def test_context(self):
+        eq_(priority.current(), 'interactive')
+        with Priority('background'):
+            eq_(priority.current(), 'background')
+            with Priority(None):
+                eq_(priority.current(), 'background')
+            func = priority.bind(priority.current)
+        eq_(priority.current(), 'interactive')
+        seen = []
+        thread = _start(lambda: seen.append(func()))
+        thread.join()
+        eq_(seen, ['background'])
+        assert_raises(ValueError, Priority, 'urgent')
+
+    def test_reserved(self):
+        gate = PriorityGate('irws', 2, reserved=1)
+        gate.acquire('/', 'background')
+        waiter = _start(gate.acquire, '/', 'background')
+        time.sleep(0.05)
+        eq_(gate.status()['waiting']['background'], 1)
+        gate.acquire('/', 'interactive')
+        eq_(gate.status()['in_use'], 2)
+        gate.release()
+        gate.release()
+        waiter.join()
+        eq_(gate.status(), {'in_use': 1, 'waiting': {'interactive': 0, 'background': 0}})
+
+    def test_weighted(self):
+        gate = PriorityGate('irws', 1, reserved=0, weights={'interactive': 2, 'background': 1})
+        gate.acquire('/')
+        order = []
+
+        def take(p):
+            gate.acquire('/', p)
+            order.append(p)
+
+        threads = []
+        for p in ('background', 'background', 'interactive', 'interactive', 'interactive', 'interactive'):
+            threads.append(_start(take, p))
+            time.sleep(0.01)
+        for i in range(6):
+            gate.release()
+            time.sleep(0.02)
+        for t in threads:
+            t.join()
+        eq_(order, ['interactive', 'background', 'interactive', 'interactive', 'background', 'interactive'])
+
+    def test_interactive_first(self):
+        with StandInServer('irws', settings.IRWS_CONF, delay=0.2) as server:
+            conf = dict(settings.IRWS_CONF, RUN_MODE='Live', HOST=server.url, MAX_POOL_SIZE=2,
+                        SINGLE_FLIGHT=False, PRIORITY_ADMISSION=True)
+            batch = IRWS(conf, priority='background')
+            queued = (metrics.get_histogram('queue_time_background', 'irws') or {}).get('count', 0)
+            threads = [_start(lambda: batch.get_person(netid='wdspud867')) for i in range(3)]
+            time.sleep(0.05)
+            started = time.time()
+            eq_(IRWS(conf).get_person(netid='wdspud867').lname, 'Daywork')
+            ok_(time.time() - started < 0.35)
+            for t in threads:
+                t.join()
+            eq_(metrics.get_histogram('queue_time_background', 'irws')['count'] - queued, 3)
+            ok_(metrics.get_histogram('queue_time_interactive', 'irws')['count'] >= 1)
+        live.clear_pools()
+
+    def test_stream_holds_slot(self):
+        with StandInServer('gws', settings.GWS_CONF) as server:
+            gws = GWS(dict(settings.GWS_CONF, RUN_MODE='Live', HOST=server.url, PRIORITY_ADMISSION=True))
+            members = gws.iter_effective_members('u_fox_unittest')
+            next(members)
+            gate = gws.dao._getDAO()._gate
+            # headers read, body still streaming
+            eq_(gate.status()['in_use'], 1)
+            members.close()
+            eq_(gate.status()['in_use'], 0)
+            eq_(len(list(gws.iter_effective_members('u_fox_unittest'))), 4)
+            eq_(gate.status()['in_use'], 0)
+        live.clear_pools()
@@ -0,0 +1,72 @@
+import threading
+import time
+from nose.tools import *
+
+from resttools import metrics, ratelimit
+from resttools.exceptions import RateLimited
+from resttools.irws import IRWS
+from resttools.ratelimit import TokenBucket, RateLimiter
+
+import resttools.test.test_settings as settings
+import logging.config
+logging.config.dictConfig(settings.LOGGING)
+logger = logging.getLogger(__name__)
+
+
+class RateLimit_Test():
+
+    def setup(self):
+        ratelimit.clear_limiters()
+
+    def test_bucket_burst(self):
+        bucket = TokenBucket(1, burst=3)
+        for i in range(3):
+            ok_(bucket.acquire(blocking=False))
+        ok_(not bucket.acquire(blocking=False))
+        ok_(not bucket.acquire(timeout=0.5))
+
+    def test_bucket_paces_threads(self):
+        bucket = TokenBucket(50, burst=1)
+        started = time.time()
+        threads = [threading.Thread(target=bucket.acquire) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ok_(time.time() - started >= 0.09)
+
+    def test_endpoint_limits(self):
+        limiter = RateLimiter('irws', rate=1000, limits=[(r'/qna/', 1, 1)], block=False)
+        eq_(limiter.reserve('/qna/1'), 0)
+        assert_raises(RateLimited, limiter.reserve, '/qna/2')
+        eq_(limiter.reserve('/person/1'), 0)
+
+    def test_refused_request_keeps_no_tokens(self):
+        limiter = RateLimiter('irws', rate=1, burst=1, limits=[(r'/qna/', 1000, 10)], block=False)
+        eq_(limiter.reserve('/person/1'), 0)
+        # the service bucket refuses, so the /qna/ token goes back
+        for i in range(20):
+            assert_raises(RateLimited, limiter.reserve, '/qna/1')
+        eq_(limiter._limits[0][1]._tokens, 10)
+
+    def test_dao_paced(self):
+        conf = dict(settings.IRWS_CONF, RATE_LIMIT=20, RATE_LIMIT_BURST=1)
+        irws = IRWS(conf)
+        waits = (metrics.get_histogram('rate_limit_wait', 'irws') or {}).get('count', 0)
+        started = time.time()
+        for i in range(5):
+            irws.get_person(netid='wdspud867')
+        ok_(time.time() - started >= 0.19)
+        eq_(metrics.get_histogram('rate_limit_wait', 'irws')['count'] - waits, 5)
+        ok_(IRWS(conf).dao._limiter is irws.dao._limiter)
+
+    def test_dao_non_blocking(self):
+        conf = dict(settings.IRWS_CONF, RATE_LIMIT=0.1, RATE_LIMIT_BLOCK=False)
+        irws = IRWS(conf)
+        limited = metrics.get_counter('rate_limited', 'irws')
+        irws.get_person(netid='wdspud867')
+        assert_raises(RateLimited, irws.get_person, netid='wdspud867')
+        eq_(metrics.get_counter('rate_limited', 'irws') - limited, 1)
+
+    def test_off(self):
+        eq_(IRWS(settings.IRWS_CONF).dao._limiter, None)
@@ -0,0 +1,130 @@
+"""
+A local stand-in for the upstream web services, for exercising the live
+DAOs.  Requests are answered from the File DAO mock data of a service,
+or from explicit routes; latency and failures can be changed while the
+server runs.  With compress=True, bodies are gzipped for clients that
+accept it.  capacity caps the requests served at once, so that extra
+concurrency queues at the server as it would upstream.
+"""
+import gzip
+import io
+import socket
+import sys
+import threading
+import time
+from six.moves import BaseHTTPServer, socketserver
+
+from resttools.dao_implementation.mock import get_mockdata_url
+
+
+class StandInServer(object):
+
+    def __init__(self, service='irws', conf=None, routes=None, delay=0.0, compress=False, capacity=None):
+        self.service = service
+        self.conf = conf or {}
+        self.routes = routes or {}
+        self.delay = delay
+        self.compress = compress
+        self._capacity = threading.BoundedSemaphore(capacity) if capacity else None
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+    def start(self):
+        self._httpd = _Server(('127.0.0.1', 0), _Handler)
+        self._httpd.stand_in = self
+        thread = threading.Thread(target=self._httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def record(self, handler):
+        with self._lock:
+            self.requests.append((handler.command, handler.path, dict(handler.headers)))
+
+    def respond(self, handler):
+        """
+        Returns (status, headers, body) for the request.  A route value
+        is (status, body), (status, headers, body) or a callable taking
+        the handler and returning one of those.
+        """
+        route = self.routes.get(handler.path)
+        if route is None:
+            route = self.routes.get(handler.path.split('?')[0])
+        if callable(route):
+            route = route(handler)
+        if route is not None:
+            if len(route) == 2:
+                return route[0], {}, route[1]
+            return route
+        mock = get_mockdata_url(self.service, self.conf, handler.path, dict(handler.headers))
+        return mock.status, {}, mock.data or ''
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that time out hang up on us; that's expected
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # headers and body go out in separate writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _serve(self):
+        stand_in = self.server.stand_in
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else None
+        stand_in.record(self)
+        if stand_in._capacity is not None:
+            with stand_in._capacity:
+                status, headers, body = self._work(stand_in)
+        else:
+            status, headers, body = self._work(stand_in)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        headers = dict(headers)
+        if stand_in.compress and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as gz:
+                gz.write(body)
+            body = buf.getvalue()
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _work(self, stand_in):
+        if stand_in.delay:
+            time.sleep(stand_in.delay)
+        return stand_in.respond(self)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _serve
+
+    def log_message(self, format, *args):
+        pass
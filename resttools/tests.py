@@ -1,5 +1,6 @@
 # various nose tests
 
+import sys
 from nose.tools import *
 
 import resttools.test.test_settings as settings
@@ -7,3 +8,15 @@ import resttools.test.test_settings as settings
 from resttools.test.irws import IRWS_Test
 from resttools.test.nws import NWS_Test
 from resttools.test.gws import GWS_Test
+from resttools.test.live import Live_Test
+from resttools.test.dao import DAO_Test
+from resttools.test.cache import Cache_Test
+from resttools.test.balancer import Balancer_Test
+from resttools.test.ratelimit import RateLimit_Test
+from resttools.test.deadline import Deadline_Test
+from resttools.test.priority import Priority_Test
+from resttools.test.forksafe import ForkSafe_Test
+
+# async def and asyncio.run need 3.7
+if sys.version_info >= (3, 7):
+    from resttools.test.aio import AIO_Test
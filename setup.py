@@ -20,5 +20,7 @@ setup(name='uw-iam-resttools',
       license='Apache License, Version 2.0',
       packages=find_packages(),
       include_package_data=True,
-      install_requires=['lxml', 'python-dateutil', 'urllib3', 'jinja2', 'six']
+      install_requires=['lxml', 'python-dateutil', 'urllib3', 'jinja2', 'six',
+                        'futures; python_version < "3"'],
+      extras_require={'async': ['aiohttp']}
       )